@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from core.models import FaqItem
+from core.models import FaqItem, CandidateProgress, CandidateArchive
 
 
 class FaqItemAdmin(admin.ModelAdmin):
@@ -8,4 +8,23 @@ class FaqItemAdmin(admin.ModelAdmin):
     list_display = ('question', 'answer', 'created_at', 'updated_at')
 
 
+class CandidateProgressAdmin(admin.ModelAdmin):
+    """Candidate Progress Admin"""
+    list_display = ('user', 'exam_status', 'documented_categories', 'documentation_finished', 'student_card_finished',
+                    'updated_at')
+    list_filter = ('exam_status', 'documentation_finished', 'student_card_finished')
+    search_fields = ('user__username',)
+    list_select_related = ('user',)
+
+
+class CandidateArchiveAdmin(admin.ModelAdmin):
+    """Candidate Archive Admin"""
+    list_display = ('user', 'version', 'built_version', 'updated_at')
+    search_fields = ('user__username',)
+    list_select_related = ('user',)
+    readonly_fields = ('user', 'version', 'built_version', 'file', 'missing')
+
+
 admin.site.register(FaqItem, FaqItemAdmin)
+admin.site.register(CandidateProgress, CandidateProgressAdmin)
+admin.site.register(CandidateArchive, CandidateArchiveAdmin)
@@ -0,0 +1,108 @@
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+from django.core.management.base import BaseCommand
+
+from utils.email import build_email
+from utils.lists import chunks
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """
+    Answers just enough SMTP to accept any email, every reply waits the latency of the server
+    """
+    def reply(self, line):
+        time.sleep(self.server.latency)
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.server.count('connections')
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            command = line[:4].upper()
+            if not line or command == b'QUIT':
+                if line:
+                    self.reply('221 Bye')
+                return
+
+            if command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.count('messages')
+            elif command not in (b'HELO', b'EHLO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self.reply('502 Command not implemented')
+                continue
+
+            self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP server that only counts the connections and emails it receives
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.latency = latency
+        self.counts = {'connections': 0, 'messages': 0}
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+
+class Command(BaseCommand):
+    help = 'Measures the emails per second sent to a local SMTP stand-in, with a connection per email (the celery ' \
+           'tasks with a chunk size of 1) and with a connection per chunk of CELERY_EMAIL_CHUNK_SIZE emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--chunk-size', type=int, default=settings.CELERY_EMAIL_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=4, help='chunks sent at the same time, like the celery '
+                                                                   'worker concurrency')
+        parser.add_argument('--latency', type=float, default=5, help='milliseconds the server takes to reply')
+
+    def handle(self, *args, **options):
+        messages = [build_email('Registro a Plataforma Diagnóstico', 'email/welcome.html', {
+            'name': 'Aspirante {}'.format(i),
+            'email': 'aspirante{}@example.com'.format(i),
+            'username': 'aspirante{}'.format(i),
+            'password': 'contraseña',
+            'host': settings.CONFIGURED_HOST,
+        }, ['aspirante{}@example.com'.format(i)]) for i in range(options['messages'])]
+        for message in messages:
+            message.from_email = message.from_email or 'benchmark@example.com'
+
+        server = SMTPStandIn(latency=options['latency'] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for name, chunk_size in (('connection per email', 1),
+                                     ('connection per chunk of {}'.format(options['chunk_size']),
+                                      options['chunk_size'])):
+                self.run(name, server, messages, chunk_size, options['workers'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def run(self, name, server, messages, chunk_size, workers):
+        def send(chunk):
+            backend = EmailBackend(host=server.server_address[0], port=server.server_address[1], username='',
+                                   password='', use_tls=False, use_ssl=False, fail_silently=False)
+            return backend.send_messages(chunk)
+
+        server.counts = {'connections': 0, 'messages': 0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sent = sum(executor.map(send, chunks(messages, chunk_size)))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write('{}: {} email(s) through {} connection(s) in {:.2f} s, {:.0f} emails/s'.format(
+            name, sent, server.counts['connections'], elapsed, sent / elapsed))
@@ -0,0 +1,72 @@
+import io
+import os
+import time
+import tracemalloc
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from django.core.management.base import BaseCommand
+
+from utils.streaming import iterate_zip
+
+
+class RandomFile(io.RawIOBase):
+    """
+    File of random bytes that are only generated as they are read
+    """
+    def __init__(self, size):
+        super().__init__()
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = min(len(b), self.remaining)
+        b[:size] = os.urandom(size)
+        self.remaining -= size
+        return size
+
+
+class Command(BaseCommand):
+    help = 'Measures the peak memory used to build the candidate files zip for an increasing number of candidates, ' \
+           'streaming it in chunks and building it in memory like the old admin action did.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, nargs='+', default=[10, 50, 200])
+        parser.add_argument('--files', type=int, default=4, help='files per candidate')
+        parser.add_argument('--size', type=int, default=100, help='kilobytes per file')
+
+    def handle(self, *args, **options):
+        self.stdout.write('candidates, zip MB, streaming peak MB, in memory peak MB, streaming s, in memory s')
+        for candidates in options['candidates']:
+            names = ['files/candidate{}/documento{}.pdf'.format(candidate, i)
+                     for candidate in range(candidates) for i in range(options['files'])]
+            size = options['size'] * 1024
+
+            stream_peak, stream_time, zip_size = self.measure(self.stream, names, size)
+            memory_peak, memory_time, _ = self.measure(self.in_memory, names, size)
+            self.stdout.write('{}, {:.1f}, {:.1f}, {:.1f}, {:.2f}, {:.2f}'.format(
+                candidates, zip_size / 2 ** 20, stream_peak / 2 ** 20, memory_peak / 2 ** 20, stream_time,
+                memory_time))
+
+    def measure(self, build, names, size):
+        tracemalloc.start()
+        start = time.perf_counter()
+        zip_size = build(names, size)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, elapsed, zip_size
+
+    def stream(self, names, size):
+        """Writes the zip chunks as they come, to nowhere"""
+        return sum(len(data) for data in iterate_zip((name, lambda: RandomFile(size)) for name in names))
+
+    def in_memory(self, names, size):
+        """Builds the whole zip in memory, deflating every file"""
+        response = io.BytesIO()
+        with ZipFile(response, 'w', ZIP_DEFLATED) as zip_file:
+            for name in names:
+                with RandomFile(size) as file:
+                    zip_file.writestr(name, file.read())
+        return len(response.getvalue())
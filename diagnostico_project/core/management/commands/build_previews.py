@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.services import build_preview
+
+
+class Command(BaseCommand):
+    help = 'Builds the previews of the documents that have none, e.g. the documents uploaded before the previews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='build every preview again, e.g. after installing '
+                                                                 'the pdf renderer')
+
+    def handle(self, *args, **options):
+        documents = Document.objects.exclude(file='').order_by('pk')
+        if not options['force']:
+            documents = documents.filter(preview='')
+
+        count = sum(build_preview(document, force=options['force']) for document in documents.iterator())
+        self.stdout.write('Built {} preview(s)'.format(count))
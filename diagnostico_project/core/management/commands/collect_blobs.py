@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from utils.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = 'Deletes the blobs of the content addressed storage that no file links to anymore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=60 * 60,
+                            help='seconds since the last file of a blob was deleted, so a blob about to be linked '
+                                 'again is kept')
+
+    def handle(self, *args, **options):
+        deleted, freed = content_addressed_storage.collect_blobs(options['min_age'])
+        self.stdout.write('Deleted {} blob(s), freed {:.1f} MB'.format(deleted, freed / 2 ** 20))
@@ -0,0 +1,26 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = 'Converts the files uploaded before the content addressed storage, each file becomes a link to the blob of ' \
+           'its content so the files with the same content are stored once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directories', nargs='*', default=['files', 'support'],
+                            help='directories of MEDIA_ROOT to convert')
+
+    def handle(self, *args, **options):
+        count, freed = 0, 0
+        for directory in options['directories']:
+            for path, _, file_names in os.walk(content_addressed_storage.path(directory)):
+                for file_name in file_names:
+                    name = os.path.relpath(os.path.join(path, file_name), settings.MEDIA_ROOT)
+                    freed += content_addressed_storage.deduplicate(name)
+                    count += 1
+
+        self.stdout.write('Converted {} file(s), freed {:.1f} MB'.format(count, freed / 2 ** 20))
@@ -0,0 +1,25 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.services import rebuild_progress, PROGRESS_PARTS
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored progress of the candidates from their results, documents and student cards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true',
+                            help='only the candidates without a progress row, e.g. after a bulk import')
+        parser.add_argument('--parts', nargs='+', choices=sorted(PROGRESS_PARTS), default=sorted(PROGRESS_PARTS))
+
+    def handle(self, *args, **options):
+        candidates = get_user_model().objects.order_by('pk')
+        if options['missing']:
+            candidates = candidates.filter(progress__isnull=True)
+
+        start = time.perf_counter()
+        count = rebuild_progress(list(candidates.values_list('pk', flat=True)), parts=options['parts'])
+        self.stdout.write('Rebuilt the progress of {} candidate(s) in {:.2f} s'.format(count,
+                                                                                      time.perf_counter() - start))
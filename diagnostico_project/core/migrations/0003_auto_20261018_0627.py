@@ -0,0 +1,48 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_auto_20190720_2023'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disabled', models.BooleanField(default=False)),
+                ('exam_status', models.IntegerField(blank=True, default=None, null=True)),
+                ('documented_categories', models.PositiveIntegerField(default=0)),
+                ('documentation_finished', models.BooleanField(default=False)),
+                ('student_card_finished', models.BooleanField(default=False)),
+                ('exam_updated_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('documents_updated_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('student_card_updated_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Candidate progress',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='candidateprogress',
+            index=models.Index(fields=['exam_status'], name='core_candid_exam_st_e4798e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprogress',
+            index=models.Index(fields=['documentation_finished'], name='core_candid_documen_ec7cc7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprogress',
+            index=models.Index(fields=['student_card_finished'], name='core_candid_student_0e59fe_idx'),
+        ),
+    ]
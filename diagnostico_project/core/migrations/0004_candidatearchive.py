@@ -0,0 +1,34 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:37
+
+import core.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_auto_20261018_0627'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disabled', models.BooleanField(default=False)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('built_version', models.PositiveIntegerField(blank=True, default=None, null=True)),
+                ('file', models.FileField(blank=True, max_length=255, null=True, upload_to=core.models.get_archive_upload_path)),
+                ('missing', models.TextField(blank=True, default='[]')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
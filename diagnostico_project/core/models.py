@@ -1,6 +1,17 @@
+import json
+import os
+import uuid
+
+from django.contrib.auth import get_user_model
 from django.db import models
 
 from core.managers import CoreBaseManager
+from exam.models import FINISHED, TIME_UP
+
+
+def get_archive_upload_path(instance, filename):
+    """Returns the upload path of the candidate archives, the random folder keeps the files from being guessed"""
+    return os.path.join('archives', uuid.uuid4().hex, filename)
 
 
 class CoreBaseModel(models.Model):
@@ -29,3 +40,60 @@ class FaqItem(CoreBaseModel):
 
     class Meta:
         ordering = ('id', 'question', 'created_at')
+
+
+class CandidateProgress(CoreBaseModel):
+    """
+    Candidate Progress. One row per candidate with the state of each step of the admission: the latest exam result,
+    how many document categories are covered and whether the student card is complete. It's kept current by the
+    signals in core.signals and read by the dashboard and the admin instead of checking every step on each request.
+    If it gets out of sync it can be rebuilt with the rebuild_progress command.
+    """
+    user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='progress')
+    exam_status = models.IntegerField(null=True, blank=True, default=None)
+    documented_categories = models.PositiveIntegerField(default=0)
+    documentation_finished = models.BooleanField(default=False)
+    student_card_finished = models.BooleanField(default=False)
+    exam_updated_at = models.DateTimeField(null=True, blank=True, default=None)
+    documents_updated_at = models.DateTimeField(null=True, blank=True, default=None)
+    student_card_updated_at = models.DateTimeField(null=True, blank=True, default=None)
+
+    @property
+    def exam_finished(self):
+        """The latest result was submitted, on time or not"""
+        return self.exam_status in (FINISHED, TIME_UP)
+
+    def __str__(self):
+        return '{}'.format(self.user)
+
+    class Meta:
+        verbose_name_plural = 'Candidate progress'
+        indexes = [
+            models.Index(fields=['exam_status']),
+            models.Index(fields=['documentation_finished']),
+            models.Index(fields=['student_card_finished']),
+        ]
+
+
+class CandidateArchive(CoreBaseModel):
+    """
+    Candidate Archive. A zip with the uploaded files of a candidate, the downloads of the candidate files copy it
+    instead of reading every file again. Each change to the documents or the student card of the candidate increments
+    the version (see core.signals), and the zip is only used while it was built from the current version.
+    """
+    user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='archive')
+    version = models.PositiveIntegerField(default=0)
+    built_version = models.PositiveIntegerField(null=True, blank=True, default=None)
+    file = models.FileField(upload_to=get_archive_upload_path, blank=True, null=True, max_length=255)
+    missing = models.TextField(default='[]', blank=True)
+
+    def is_fresh(self):
+        """The zip has the current files of the candidate"""
+        return bool(self.file) and self.built_version == self.version
+
+    def get_missing(self):
+        """Returns the names of the files that weren't found when the zip was built"""
+        return json.loads(self.missing or '[]')
+
+    def __str__(self):
+        return '{}'.format(self.user)
@@ -0,0 +1,193 @@
+import json
+import tempfile
+from functools import partial
+from itertools import chain
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import CandidateProgress, CandidateArchive
+from documents.models import Document
+from student_card.models import CardInfo
+from utils.lists import chunks, list_remove_duplicates
+from utils.services import annotate_exam_status, annotate_documented_categories, annotate_student_card_finished
+from utils.streaming import STREAM_CHUNK_SIZE, iterate_zip
+
+EXAM = 'exam'
+DOCUMENTS = 'documents'
+STUDENT_CARD = 'student_card'
+
+# how each part of the progress is computed, and the fields it fills
+PROGRESS_PARTS = {
+    EXAM: (annotate_exam_status, ('exam_status',)),
+    DOCUMENTS: (annotate_documented_categories, ('documented_categories', 'documentation_finished')),
+    STUDENT_CARD: (annotate_student_card_finished, ('student_card_finished',)),
+}
+
+
+def _annotate(queryset, parts):
+    """Annotates a candidate queryset with the given parts, returns the queryset and the annotated fields"""
+    fields = []
+    for part in parts:
+        annotate, part_fields = PROGRESS_PARTS[part]
+        queryset = annotate(queryset)
+        fields += part_fields
+    return queryset, fields
+
+
+def rebuild_progress(user_ids=None, parts=tuple(PROGRESS_PARTS), chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Computes the progress of the candidates and stores it, creating the missing rows. The candidates are processed in
+    chunks: one query computes the progress of the whole chunk, one loads the stored rows and the changes are written
+    in bulk.
+    :param user_ids: ids of the candidates, every candidate if None
+    :param parts: the parts of the progress to compute
+    :param chunk_size: candidates per chunk
+    :return: number of candidates processed
+    """
+    if user_ids is None:
+        user_ids = list(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+
+    now = timezone.now()
+    updated_fields = []
+    for part in parts:
+        updated_fields += list(PROGRESS_PARTS[part][1]) + ['{}_updated_at'.format(part)]
+
+    for chunk in chunks(list(user_ids), chunk_size):
+        queryset, fields = _annotate(get_user_model().objects.filter(pk__in=chunk), parts)
+        stored = {progress.user_id: progress for progress in CandidateProgress.objects.filter(user_id__in=chunk)}
+
+        to_create, to_update = [], []
+        for values in queryset.values('pk', *fields):
+            progress = stored.get(values['pk'])
+            if progress is None:
+                progress = CandidateProgress(user_id=values['pk'])
+                to_create.append(progress)
+            else:
+                to_update.append(progress)
+
+            for field in fields:
+                setattr(progress, field, values[field])
+            for part in parts:
+                setattr(progress, '{}_updated_at'.format(part), now)
+            progress.updated_at = now
+
+        with transaction.atomic():
+            # a row created meanwhile by another refresh has the same values
+            CandidateProgress.objects.bulk_create(to_create, ignore_conflicts=True)
+            CandidateProgress.objects.bulk_update(to_update, updated_fields + ['updated_at'])
+
+    return len(user_ids)
+
+
+def schedule_progress_refresh(user_id, part):
+    """
+    Refreshes a part of the progress of a candidate once the current transaction is committed, so it's computed from
+    the committed data and only after everything the request changed
+    :param user_id: id of the candidate
+    :param part: EXAM, DOCUMENTS or STUDENT_CARD
+    """
+    transaction.on_commit(lambda: rebuild_progress([user_id], parts=(part,)))
+
+
+def schedule_progress_rebuild(parts):
+    """
+    Recomputes some parts of the progress of every candidate on the worker, once the current transaction is committed.
+    Used by the changes that affect every candidate, so the request that made them doesn't wait for it.
+    :param parts: the parts of the progress to compute
+    """
+    from core.tasks import rebuild_all_progress  # the tasks module imports this one
+
+    transaction.on_commit(lambda: rebuild_all_progress.delay(list(parts)))
+
+
+def get_progress(user):
+    """
+    Returns the progress of a candidate, computing it if it was never stored
+    :param user: user instance
+    :return: CandidateProgress
+    """
+    progress = CandidateProgress.objects.filter(user_id=user.id).first()
+    if progress is None:
+        rebuild_progress([user.id])
+        progress = CandidateProgress.objects.get(user_id=user.id)
+
+    return progress
+
+
+def get_candidate_files(ids):
+    """
+    Returns the names in the storage of the documents and student card photos of some candidates, with one query each
+    :param ids: ids of the candidates
+    :return: dict of candidate id -> list of names
+    """
+    files = {}
+    documents = Document.objects.filter(user_id__in=ids).exclude(file='') \
+        .order_by('category__name', 'created_at').values_list('user_id', 'file')
+    photos = CardInfo.objects.filter(user_id__in=ids).exclude(photo='').exclude(photo__isnull=True) \
+        .order_by('created_at').values_list('user_id', 'photo')
+
+    for user_id, name in chain(documents, photos):
+        files.setdefault(user_id, []).append(name)
+    return {user_id: list_remove_duplicates(names) for user_id, names in files.items()}
+
+
+def build_archive(user_id):
+    """
+    Builds the zip with the current files of a candidate and stores it as the candidate archive. It's built from the
+    version read before the files, so a change made meanwhile leaves it stale instead of being lost.
+    :param user_id: id of the candidate
+    :return: the updated CandidateArchive
+    """
+    archive = CandidateArchive.objects.select_related('user').get_or_create(user_id=user_id)[0]
+    version = archive.version
+    old_file = archive.file.name if archive.file else None
+    missing = []
+
+    def entries():
+        for name in get_candidate_files([user_id]).get(user_id, []):
+            if default_storage.exists(name):
+                yield name, partial(default_storage.open, name, 'rb')
+            else:
+                missing.append(name)
+
+    with tempfile.TemporaryFile() as file:
+        for data in iterate_zip(entries()):
+            file.write(data)
+        file.seek(0)
+        archive.file.save('{}.zip'.format(archive.user.username), File(file), save=False)
+
+    archive.built_version = version
+    archive.missing = json.dumps(missing)
+    CandidateArchive.objects.filter(pk=archive.pk).update(file=archive.file.name, built_version=version,
+                                                          missing=archive.missing, updated_at=timezone.now())
+    if old_file:
+        default_storage.delete(old_file)
+
+    return archive
+
+
+def schedule_archive(user_id):
+    """
+    Rebuilds the archive of a candidate once the current transaction is committed, creating it if the candidate never
+    had one. The downloads call it when they find the archive missing or stale.
+    :param user_id: id of the candidate
+    """
+    CandidateArchive.objects.get_or_create(user_id=user_id)
+    invalidate_archive(user_id)
+
+
+def invalidate_archive(user_id):
+    """
+    Marks the archive of a candidate as stale and rebuilds it once the current transaction is committed. Only the
+    candidates whose files were downloaded before have an archive, the rest get it on their first download.
+    :param user_id: id of the candidate
+    """
+    from core.tasks import refresh_archive  # the tasks module imports this one
+
+    if CandidateArchive.objects.filter(user_id=user_id).update(version=F('version') + 1):
+        transaction.on_commit(lambda: refresh_archive.delay(user_id))
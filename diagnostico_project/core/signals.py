@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import CandidateArchive
+from core.services import schedule_progress_refresh, schedule_progress_rebuild, rebuild_progress, invalidate_archive, \
+    EXAM, DOCUMENTS, STUDENT_CARD
+from documents.models import Category, Document
+from exam.models import Result
+from student_card.models import CardInfo
+
+
+@receiver(post_save, sender=get_user_model())
+def candidate_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: rebuild_progress([instance.id]))
+
+
+@receiver([post_save, post_delete], sender=Result)
+def result_changed(sender, instance, **kwargs):
+    schedule_progress_refresh(instance.user_id, EXAM)
+
+
+@receiver([post_save, post_delete], sender=Document)
+def document_changed(sender, instance, **kwargs):
+    schedule_progress_refresh(instance.user_id, DOCUMENTS)
+    invalidate_archive(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # every candidate is checked against the categories
+    schedule_progress_rebuild((DOCUMENTS,))
+
+
+@receiver([post_save, post_delete], sender=CardInfo)
+def card_info_changed(sender, instance, **kwargs):
+    schedule_progress_refresh(instance.user_id, STUDENT_CARD)
+    invalidate_archive(instance.user_id)
+
+
+@receiver(post_delete, sender=CandidateArchive)
+def archive_deleted(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
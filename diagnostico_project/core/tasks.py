@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from core.models import CandidateArchive
+from core.services import build_archive, rebuild_progress
+
+
+@shared_task
+def refresh_archive(user_id):
+    """Rebuilds the archive of a candidate if it's stale"""
+    archive = CandidateArchive.objects.filter(user_id=user_id).first()
+    if archive and not archive.is_fresh():
+        build_archive(user_id)
+
+
+@shared_task
+def rebuild_all_progress(parts):
+    """Recomputes some parts of the progress of every candidate"""
+    rebuild_progress(parts=tuple(parts))
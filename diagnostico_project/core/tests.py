@@ -1,6 +1,20 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-from core.models import FaqItem
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.models import FaqItem, CandidateProgress
+from core.services import DOCUMENTS
+from core.tasks import rebuild_all_progress
+from documents.models import Category, Document
+from exam.models import Result, ANSWERING, FINISHED
+from student_card.models import CardInfo
+from utils.email import EmailTask, get_retry_countdown, send_mail, get_staff_emails
 
 
 class CoreFaqTests(TestCase):
@@ -21,3 +35,115 @@ class CoreFaqTests(TestCase):
         fi3.save()
 
         self.assertEquals(FaqItem.objects.count(), 2)
+
+
+class CandidateProgressTests(TransactionTestCase):
+    def setUp(self):
+        # the progress of every candidate is rebuilt by the worker, run it right away instead
+        patcher = mock.patch('core.tasks.rebuild_all_progress.delay', side_effect=rebuild_all_progress)
+        self.rebuild_all_progress = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(username='candidate', password='secret')
+        self.category = Category.objects.create(name='Acta')
+
+    def get_progress(self):
+        return CandidateProgress.objects.get(user=self.user)
+
+    @mock.patch('documents.tasks.build_document_preview.delay')
+    def test_progress_is_kept_current(self, build_document_preview):
+        # a new candidate starts with an empty progress
+        progress = self.get_progress()
+        self.assertIsNone(progress.exam_status)
+        self.assertFalse(progress.documentation_finished)
+        self.assertFalse(progress.student_card_finished)
+
+        result = Result.objects.create(user=self.user, status=ANSWERING)
+        self.assertEquals(self.get_progress().exam_status, ANSWERING)
+        result.status = FINISHED
+        result.save()
+        self.assertTrue(self.get_progress().exam_finished)
+
+        document = Document.objects.create(user=self.user, category=self.category, file='files/candidate/acta.pdf')
+        self.assertEquals(self.get_progress().documented_categories, 1)
+        build_document_preview.assert_called_once_with(document.id)
+        self.assertTrue(self.get_progress().documentation_finished)
+
+        # a new category has to be covered too, every candidate is rebuilt by the worker
+        self.rebuild_all_progress.reset_mock()
+        category = Category.objects.create(name='Foto')
+        self.rebuild_all_progress.assert_called_once_with([DOCUMENTS])
+        self.assertFalse(self.get_progress().documentation_finished)
+        category.delete()
+        self.assertTrue(self.get_progress().documentation_finished)
+        document.delete()
+        self.assertFalse(self.get_progress().documentation_finished)
+
+        card = CardInfo.objects.create(user=self.user, photo='files/candidate/foto/photo.jpg',
+                                       emergency_contact_name='Juan')
+        self.assertFalse(self.get_progress().student_card_finished)
+        card.emergency_phone_number = '6621234567'
+        card.save()
+        self.assertTrue(self.get_progress().student_card_finished)
+
+    def test_dashboard(self):
+        self.client.login(username='candidate', password='secret')
+        Result.objects.create(user=self.user, status=FINISHED)
+        CandidateProgress.objects.all().delete()
+
+        # the progress is computed once if missing, then read with a single query
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertTrue(response.context['exam'])
+        self.assertFalse(response.context['documents'])
+        with self.assertNumQueries(3):
+            self.client.get(reverse('core:dashboard'))
+
+    def test_rebuild_progress_command(self):
+        Result.objects.create(user=self.user, status=FINISHED)
+        CandidateProgress.objects.update(exam_status=None)
+        other = get_user_model().objects.create_user(username='other')
+        CandidateProgress.objects.filter(user=other).delete()
+
+        call_command('rebuild_progress', '--missing', stdout=io.StringIO())
+        self.assertIsNone(self.get_progress().exam_status)
+        self.assertTrue(CandidateProgress.objects.filter(user=other).exists())
+
+        call_command('rebuild_progress', stdout=io.StringIO())
+        self.assertEquals(self.get_progress().exam_status, FINISHED)
+
+
+class EmailTest(TestCase):
+    def test_send_mail(self):
+        send_mail('Asunto', 'email/welcome.html', {'name': 'Ana'}, ['ana@ues.mx', 'ana@ues.mx']).result()
+        self.assertEquals(len(mail.outbox), 1)
+        self.assertEquals(mail.outbox[0].to, ['ana@ues.mx'])
+        self.assertIn('Ana', mail.outbox[0].body)
+
+    def test_staff_emails(self):
+        get_user_model().objects.create_user(username='staff', email='staff@ues.mx', is_staff=True)
+        get_user_model().objects.create_user(username='no_email', is_staff=True)
+        get_user_model().objects.create_user(username='candidate', email='candidate@ues.mx')
+        self.assertEquals(get_staff_emails(), ['staff@ues.mx'])
+
+    def test_retry_backoff(self):
+        backoff, backoff_max = settings.EMAIL_RETRY_BACKOFF, settings.EMAIL_RETRY_BACKOFF_MAX
+        for retries in range(10):
+            countdown = min(backoff * 2 ** retries, backoff_max)
+            self.assertTrue(countdown / 2 <= get_retry_countdown(retries) <= countdown)
+        self.assertEquals(EmailTask.max_retries, settings.EMAIL_MAX_RETRIES)
+
+    def test_benchmark_email(self):
+        out = io.StringIO()
+        call_command('benchmark_email', '--messages', '10', '--chunk-size', '5', '--latency', '0', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('10 email(s) through 10 connection(s)', lines[0])
+        self.assertIn('10 email(s) through 2 connection(s)', lines[1])
+
+
+class BenchmarkZipTest(TestCase):
+    def test_benchmark_zip(self):
+        out = io.StringIO()
+        call_command('benchmark_zip', '--candidates', '1', '2', '--files', '2', '--size', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEquals(len(lines), 3)
+        self.assertTrue(lines[2].startswith('2, '))
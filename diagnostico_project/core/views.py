@@ -4,7 +4,7 @@ from django.views import View
 from django.views.generic import TemplateView, ListView
 
 from core.models import FaqItem
-from utils.services import exam_is_finished, documentation_is_finished, student_card_is_finished
+from core.services import get_progress
 
 
 class HomeView(TemplateView):
@@ -36,10 +36,11 @@ class DashboardView(LoginRequiredMixin, View):
     next, etc.
     """
     def get(self, request, *args, **kwargs):
+        progress = get_progress(request.user)
         return render(request, 'core_dashboard.html', {
-            'exam': exam_is_finished(request.user),
-            'documents': documentation_is_finished(request.user),
-            'student_card': student_card_is_finished(request.user)
+            'exam': progress.exam_finished,
+            'documents': progress.documentation_finished,
+            'student_card': progress.student_card_finished
         })
 
 
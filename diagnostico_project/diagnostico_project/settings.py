@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'support.apps.SupportConfig',
     'documents.apps.DocumentsConfig',
     'student_card.apps.StudentCardConfig',
+    'jobs.apps.JobsConfig',
 
     # extras
     'core.templatetags.core_extras',
@@ -126,6 +127,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Kept in files under the project, which the django and worker containers mount, so every process of both sees
+# the same entries and a dropped entry is dropped for all of them. CACHE_BACKEND and CACHE_LOCATION point to
+# another backend (e.g. memcached)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -172,6 +186,21 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/diagnostico/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# the files uploaded to these apps are checked while they are received, see utils.uploads.CheckedUploadHandler
+FILE_UPLOAD_HANDLERS = [
+    'utils.uploads.CheckedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# directory of MEDIA_ROOT with the content of the deduplicated files, see utils.storage.ContentAddressedStorage
+CONTENT_STORE_DIR = 'blobs'
+
+UPLOAD_RULES = {
+    'documents': {'max_size': 5 * 1024 * 1024, 'types': ('pdf', 'jpeg')},
+    'student_card': {'max_size': 2 * 1024 * 1024, 'types': ('jpeg',)},
+    'support': {'max_size': 5 * 1024 * 1024, 'types': ('pdf', 'jpeg', 'png')},
+}
+
 # Custom user model
 AUTH_USER_MODEL = 'users.Candidate'
 
@@ -189,10 +218,23 @@ if not DEBUG:
                                                             os.getenv('RABBITMQ_DEFAULT_PASS'))
 
 CELERY_RESULT_BACKEND = 'django-db'
-CELERY_EMAIL_CHUNK_SIZE = 1
+
+# emails sent by each celery task through one SMTP connection
+CELERY_EMAIL_CHUNK_SIZE = int(os.getenv('EMAIL_CHUNK_SIZE', 50))
+
+# threads that hand the emails to the backend out of the request
+EMAIL_SEND_WORKERS = int(os.getenv('EMAIL_SEND_WORKERS', 4))
+
+# a failed email is retried up to EMAIL_MAX_RETRIES times, waiting up to EMAIL_RETRY_BACKOFF * 2 ** retry seconds
+# (at most EMAIL_RETRY_BACKOFF_MAX)
+EMAIL_MAX_RETRIES = int(os.getenv('EMAIL_MAX_RETRIES', 5))
+EMAIL_RETRY_BACKOFF = int(os.getenv('EMAIL_RETRY_BACKOFF', 10))
+EMAIL_RETRY_BACKOFF_MAX = int(os.getenv('EMAIL_RETRY_BACKOFF_MAX', 600))
+
 CELERY_EMAIL_TASK_CONFIG = {
     'name': 'djcelery_email_send',
     'ignore_result': False,
+    'base': 'utils.email.EmailTask',
 }
 # CELERY_EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # console
 CELERY_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'  # smtp
@@ -221,3 +263,13 @@ MATHJAX_CONFIG_DATA = {
 
 # custom settings
 CONFIGURED_HOST = os.getenv('CONFIGURED_HOST')
+
+# seconds the exam settings and the current exam are cached, the most a change takes to be seen by a container
+# that doesn't share the cache
+EXAM_SETTINGS_CACHE_TIMEOUT = int(os.getenv('EXAM_SETTINGS_CACHE_TIMEOUT', 30))
+
+# seconds a photo uploaded to the student card is kept waiting to be cropped
+STUDENT_CARD_UPLOAD_TTL = int(os.getenv('STUDENT_CARD_UPLOAD_TTL', 60 * 60))
+
+# threads that hash the passwords when the credentials of the candidates are sent
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
 from documents.models import Category, Document
 
@@ -11,9 +12,16 @@ class CategoryAdmin(admin.ModelAdmin):
 
 class DocumentAdmin(admin.ModelAdmin):
     """Document Model Admin"""
-    list_display = ('id', 'file', 'category', 'user', 'comment', 'created_at')
+    list_display = ('id', 'get_preview', 'file', 'category', 'user', 'comment', 'created_at')
     search_fields = ('file',)
     list_filter = ('category__name', 'user__username')
+    list_select_related = ('category', 'user')
+
+    def get_preview(self, obj):
+        return format_html('<a href="{}" target="_blank"><img src="{}" alt="{}" height="60"></a>', obj.file.url,
+                           obj.get_preview_url(), obj)
+
+    get_preview.short_description = 'Preview'
 
 
 # Register admin
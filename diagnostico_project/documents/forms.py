@@ -1,9 +1,10 @@
 from django import forms
 
 from documents.models import Document
+from utils.uploads import UploadErrorsFormMixin
 
 
-class DocumentForm(forms.ModelForm):
+class DocumentForm(UploadErrorsFormMixin, forms.ModelForm):
     """
     Document Form. Uploads a document
     """
@@ -12,7 +13,7 @@ class DocumentForm(forms.ModelForm):
     def clean(self):
         cleaned_data = super().clean()
         file = cleaned_data.get('file')
-        if len(file) > self.max_upload_limit:
+        if file and len(file) > self.max_upload_limit:
             self.add_error('file', 'El archivo debe de ocupar menos de 5Mb')
 
     class Meta:
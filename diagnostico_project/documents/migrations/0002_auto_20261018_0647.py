@@ -0,0 +1,20 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:47
+
+from django.db import migrations, models
+import documents.models
+import utils.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=utils.storage.ContentAddressedStorage(), upload_to=documents.models.get_upload_path, validators=[documents.models.validate_file_type]),
+        ),
+    ]
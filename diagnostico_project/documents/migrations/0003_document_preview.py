@@ -0,0 +1,19 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:49
+
+from django.db import migrations, models
+import documents.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_auto_20261018_0647'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='preview',
+            field=models.ImageField(blank=True, max_length=255, upload_to=documents.models.get_preview_upload_path),
+        ),
+    ]
@@ -3,10 +3,12 @@ import os
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.templatetags.static import static
 from django.urls import reverse
 from django.utils.text import slugify
 
 from documents.managers import BaseManager
+from utils.storage import content_addressed_storage
 
 
 def get_upload_path(instance, filename):
@@ -14,6 +16,11 @@ def get_upload_path(instance, filename):
     return os.path.join('files', '{}'.format(instance.user.username), slugify(instance.category), filename)
 
 
+def get_preview_upload_path(instance, filename):
+    """Returns the path of the preview of a document, next to the rest of the previews of the user"""
+    return os.path.join('previews', '{}'.format(instance.user.username), filename)
+
+
 def validate_file_type(value):
     """Check if the file to upload is a pdf or a jpeg"""
     if not value.name.endswith('.pdf') and not value.name.endswith('.jpg') and not value.name.endswith('.jpeg'):
@@ -59,13 +66,25 @@ class Document(BaseModel):
     """
     Document Model. Represents a document uploaded by a user, and each document belongs to a certain category.
     """
-    file = models.FileField(upload_to=get_upload_path, validators=[validate_file_type])
+    file = models.FileField(upload_to=get_upload_path, validators=[validate_file_type],
+                            storage=content_addressed_storage)
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     comment = models.CharField(blank=True, default='', max_length=255)
+    preview = models.ImageField(blank=True, upload_to=get_preview_upload_path, max_length=255)
 
     def __str__(self):
         return 'id: {}'.format(self.id)
 
+    def get_preview_url(self):
+        """
+        Returns the url of the preview. It changes each time the preview is built, so the preview is cached for long;
+        before it's built it's the placeholder
+        """
+        if not self.preview:
+            return static('img/placeholder150.jpg')
+
+        return '{}?v={}'.format(reverse('documents:preview', args=[self.id]), int(self.updated_at.timestamp()))
+
     class Meta:
         ordering = ('disabled', 'user', 'category', 'created_at')
@@ -0,0 +1,99 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.db import transaction
+from django.utils import timezone
+
+from documents.models import Document
+from utils.images import thumbnail_image, placeholder_image, to_jpeg
+
+logger = logging.getLogger(__name__)
+
+# size the previews of the documents fit in
+PREVIEW_SIZE = (150, 200)
+
+# renders the first page of a pdf, from poppler-utils
+PDF_RENDERER = 'pdftoppm'
+
+# seconds a pdf can take to render
+PDF_RENDER_TIMEOUT = 30
+
+
+def render_pdf_page(path, size):
+    """
+    Renders the first page of a pdf with PDF_RENDERER
+    :param path: path of the pdf
+    :param size: (width, height) the page has to cover
+    :return: RGB image, None if there's no renderer or the pdf can't be rendered
+    """
+    if not shutil.which(PDF_RENDERER):
+        return None
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'page')
+        try:
+            subprocess.run([PDF_RENDERER, '-jpeg', '-f', '1', '-l', '1', '-singlefile', '-scale-to', str(max(size)),
+                            path, output], check=True, timeout=PDF_RENDER_TIMEOUT, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            logger.warning('Could not render the first page of %s', path)
+            return None
+
+        with open(output + '.jpg', 'rb') as file:
+            return thumbnail_image(file, size)
+
+
+def get_preview_name(document):
+    """Returns the name of the preview of a document, it comes from the name of its file"""
+    return '{}-{}.jpg'.format(document.id, os.path.basename(document.file.name))
+
+
+def build_preview(document, force=False):
+    """
+    Builds the preview of a document: a thumbnail of the image, or of the first page of the pdf, and a placeholder with
+    the type of the file if it can't be rendered. It's saved without the save signals, the document itself didn't
+    change.
+    :param document: Document
+    :param force: build it even if the preview of the current file was built
+    :return: True if it was built
+    """
+    name = get_preview_name(document)
+    if not force and document.preview and os.path.basename(document.preview.name) == name:
+        return False
+
+    extension = os.path.splitext(document.file.name)[1].lower()
+    image = None
+    if extension == '.pdf':
+        image = render_pdf_page(document.file.path, PREVIEW_SIZE)
+    elif extension in ('.jpg', '.jpeg'):
+        try:
+            with document.file.open('rb') as file:
+                image = thumbnail_image(file, PREVIEW_SIZE)
+        except Exception:
+            logger.warning('Could not read the image of document %s', document.id)
+
+    if image is None:
+        image = placeholder_image(PREVIEW_SIZE, extension.lstrip('.').upper() or '?')
+
+    # the new preview keeps the name
+    if document.preview:
+        document.preview.delete(save=False)
+    document.preview.save(name, to_jpeg(image), save=False)
+    document.updated_at = timezone.now()
+    Document._base_manager.filter(pk=document.pk).update(preview=document.preview.name, updated_at=document.updated_at)
+
+    return True
+
+
+def schedule_preview(document):
+    """
+    Builds the preview of a document on the worker once the current transaction is committed
+    :param document: Document
+    """
+    from documents.tasks import build_document_preview  # the tasks module imports this one
+
+    if document.file:
+        transaction.on_commit(lambda: build_document_preview.delay(document.id))
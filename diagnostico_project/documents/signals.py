@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from documents.models import Document
+from documents.services import schedule_preview
+
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_preview(instance)
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    if instance.preview:
+        instance.preview.delete(save=False)
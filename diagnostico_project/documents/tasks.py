@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from documents.models import Document
+from documents.services import build_preview
+
+
+@shared_task
+def build_document_preview(document_id):
+    """Builds the preview of a document"""
+    document = Document.objects.filter(pk=document_id).exclude(file='').first()
+    if document:
+        build_preview(document)
@@ -1,9 +1,24 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.messages import get_messages
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management import call_command
+from django.test import TestCase, RequestFactory, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.urls import reverse
+from PIL import Image
+from django.urls import reverse, resolve
 
 from documents.models import Category, Document
+from documents.services import PREVIEW_SIZE
+from documents.tasks import build_document_preview
+from utils.storage import content_addressed_storage
+from utils.uploads import get_upload_errors
 
 
 def _get_test_file():
@@ -147,3 +162,172 @@ class DocumentsViewsTest(DocumentsBaseTest):
         })
         self.assertRedirects(response, reverse('documents:home'))
         self.assertEquals(category.get_documents_by_user(self.user).count(), 2)
+
+
+class DocumentsUploadTest(DocumentsBaseTest):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='A name', description='A description')
+
+    def tearDown(self):
+        for document in Document.objects.all():
+            document.file.delete(save=False)
+
+    def get_request(self, file):
+        """Returns an upload request whose input counts the bytes read"""
+        request = RequestFactory().post(reverse('documents:home'), {'category': self.category.id, 'file': file})
+        environ = dict(request.environ, **{'wsgi.input': io.BytesIO(request.environ['wsgi.input'].read())})
+        request = WSGIRequest(environ)
+        request.resolver_match = resolve(reverse('documents:home'))
+        return request
+
+    def test_upload(self):
+        content = open('./static/img/placeholder150.jpg', 'rb').read()
+        request = self.get_request(SimpleUploadedFile('test_file.jpg', content, content_type='image/jpeg'))
+        self.assertEquals(request.FILES['file'].sha256, hashlib.sha256(content).hexdigest())
+
+        response = self.client.post(reverse('documents:home'), {
+            'category': self.category.id, 'file': SimpleUploadedFile('test_file.jpg', content)})
+        self.assertRedirects(response, reverse('documents:home'))
+        self.assertEquals(Document.objects.filter(user=self.user).count(), 1)
+
+    def test_wrong_content(self):
+        # the extension says jpeg, the content is a png
+        content = open('./static/img/ues-navbar-logo.png', 'rb').read()
+        response = self.client.post(reverse('documents:home'), {
+            'category': self.category.id, 'file': SimpleUploadedFile('test_file.jpg', content)})
+
+        self.assertRedirects(response, reverse('documents:home'))
+        self.assertFalse(Document.objects.exists())
+        self.assertEquals([str(message) for message in get_messages(response.wsgi_request)],
+                          ['El archivo debe ser un pdf o una imagen jpeg.'])
+
+    def test_too_big(self):
+        file = SimpleUploadedFile('test_file.pdf', b'%PDF-1.4\n' + b'0' * (6 * 1024 * 1024))
+        request = self.get_request(file)
+
+        # the upload stops once it crosses the limit, the rest of the request is never read
+        self.assertNotIn('file', request.FILES)
+        self.assertEquals(get_upload_errors(request), {'file': 'El archivo debe de ocupar menos de 5Mb'})
+        self.assertLess(request.environ['wsgi.input'].tell(), 5.5 * 1024 * 1024)
+
+    def test_other_apps(self):
+        # only the apps with rules are checked
+        request = RequestFactory().post('/', {'file': SimpleUploadedFile('notas.txt', b'some notes')})
+        request.resolver_match = None
+        self.assertEquals(request.FILES['file'].read(), b'some notes')
+        self.assertFalse(hasattr(request.FILES['file'], 'sha256'))
+
+
+class DocumentsStorageTest(DocumentsBaseTest):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='A name', description='A description')
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def get_blobs(self):
+        return [os.path.join(path, name) for path, _, names in os.walk(os.path.join(self.media_root, 'blobs'))
+                for name in names]
+
+    def test_same_content_stored_once(self):
+        first = Document.objects.create(file=_get_test_file(), user=self.user, category=self.category)
+        second = Document.objects.create(file=_get_test_file(), user=self.user, category=self.category)
+
+        # both documents keep their own name, with the same content on disk
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertTrue(os.path.samefile(first.file.path, second.file.path))
+        self.assertEquals(len(self.get_blobs()), 1)
+        self.assertEquals(os.stat(self.get_blobs()[0]).st_nlink, 3)
+
+        # the blob is only collected once nothing links to it
+        first.file.delete()
+        self.assertEquals(content_addressed_storage.collect_blobs(), (0, 0))
+        with second.file.open('rb') as file:
+            self.assertEquals(file.read(), _get_test_file().read())
+        second.file.delete()
+        self.assertEquals(content_addressed_storage.collect_blobs()[0], 1)
+        self.assertEquals(self.get_blobs(), [])
+
+    def test_uploads_with_a_hash(self):
+        content = open('./static/img/placeholder150.jpg', 'rb').read()
+        Document.objects.create(file=_get_test_file(), user=self.user, category=self.category)
+
+        # an upload hashed by the upload handler is linked without writing it again
+        file = SimpleUploadedFile('test_file.jpg', content)
+        file.sha256 = hashlib.sha256(content).hexdigest()
+        file.chunks = None  # reading it would fail
+        document = Document.objects.create(file=file, user=self.user, category=self.category)
+        self.assertEquals(os.stat(document.file.path).st_nlink, 3)
+
+    def test_deduplicate_media(self):
+        directory = os.path.join(self.media_root, 'files', self.user.username)
+        os.makedirs(directory)
+        for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+            with open(os.path.join(directory, name), 'wb') as file:
+                file.write(b'%PDF-1.4 same' if name != 'c.pdf' else b'%PDF-1.4 other')
+
+        call_command('deduplicate_media', stdout=io.StringIO())
+        self.assertTrue(os.path.samefile(os.path.join(directory, 'a.pdf'), os.path.join(directory, 'b.pdf')))
+        self.assertEquals(len(self.get_blobs()), 2)
+        with open(os.path.join(directory, 'b.pdf'), 'rb') as file:
+            self.assertEquals(file.read(), b'%PDF-1.4 same')
+
+        # converting again changes nothing
+        call_command('deduplicate_media', stdout=io.StringIO())
+        self.assertEquals(len(self.get_blobs()), 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentsPreviewTest(DocumentsBaseTest):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='A name', description='A description')
+
+    def tearDown(self):
+        shutil.rmtree(content_addressed_storage.location, ignore_errors=True)
+
+    def test_image_preview(self):
+        document = Document.objects.create(file=SimpleUploadedFile('test_file.jpg', _get_test_file().read()),
+                                           user=self.user, category=self.category)
+        self.assertTrue(document.get_preview_url().endswith('placeholder150.jpg'))
+
+        build_document_preview(document.id)
+        document.refresh_from_db()
+        with document.preview.open('rb') as file:
+            image = Image.open(file)
+            self.assertLessEqual(image.size[0], PREVIEW_SIZE[0])
+            self.assertLessEqual(image.size[1], PREVIEW_SIZE[1])
+
+        # the preview is cached for long, its url changes with it
+        response = self.client.get(document.get_preview_url())
+        self.assertEquals(response['Content-Type'], 'image/jpeg')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+
+        # saving the document again doesn't build it again
+        name = document.preview.name
+        document.save()
+        build_document_preview(document.id)
+        document.refresh_from_db()
+        self.assertEquals(document.preview.name, name)
+
+        get_user_model().objects.create_user(username='other', password='secret')
+        self.client.login(username='other', password='secret')
+        self.assertEquals(self.client.get(document.get_preview_url()).status_code, 403)
+
+    def test_pdf_placeholder(self):
+        document = Document.objects.create(file=SimpleUploadedFile('test_file.pdf', b'%PDF-1.4 not really a pdf'),
+                                           user=self.user, category=self.category)
+
+        # without a renderer the preview is a placeholder of the same size
+        with mock.patch('documents.services.PDF_RENDERER', 'not-a-pdf-renderer'):
+            build_document_preview(document.id)
+        document.refresh_from_db()
+        with document.preview.open('rb') as file:
+            self.assertEquals(Image.open(file).size, PREVIEW_SIZE)
@@ -1,9 +1,10 @@
 from django.urls import path
 
-from documents.views import DocumentsHomeView, DocumentsDeleteView
+from documents.views import DocumentsHomeView, DocumentsDeleteView, DocumentPreviewView
 
 app_name = 'documents'
 urlpatterns = [
     path('', DocumentsHomeView.as_view(), name='home'),
     path('delete', DocumentsDeleteView.as_view(), name='delete'),
+    path('<int:pk>/preview', DocumentPreviewView.as_view(), name='preview'),
 ]
@@ -1,14 +1,17 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
 from django.shortcuts import render, redirect
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.views.generic import ListView
 from django.views.generic.base import View
 from django.views.generic.edit import FormMixin
 
 from documents.forms import DocumentForm
 from documents.models import Document, Category
+from utils.uploads import get_upload_errors
 
 
 def _get_exception_message(e):
@@ -47,7 +50,7 @@ class DocumentsHomeView(LoginRequiredMixin, FormMixin, ListView):
 
     def post(self, request, *args, **kwargs):
         """Handles the file upload"""
-        form = DocumentForm(request.POST, request.FILES)
+        form = DocumentForm(request.POST, request.FILES, upload_errors=get_upload_errors(request))
         if form.is_valid():
             file = form.save(commit=False)
             file.user = request.user
@@ -56,7 +59,7 @@ class DocumentsHomeView(LoginRequiredMixin, FormMixin, ListView):
                              .format(form.files['file']))
             return self.form_valid(form)
         else:
-            for error in form.errors['file']:
+            for error in form.errors.get('file', []):
                 messages.error(request, error)
             return redirect('documents:home')
 
@@ -95,3 +98,22 @@ class DocumentsDeleteView(View):
             raise PermissionDenied
 
         return super().dispatch(request, *args, **kwargs)
+
+
+class DocumentPreviewView(LoginRequiredMixin, View):
+    """
+    Document Preview View. Serves the preview of a document to its owner and to the staff. Its url changes each time
+    the preview is built, so it's cached for a year.
+    """
+    cache_timeout = 365 * 24 * 60 * 60
+
+    def get(self, request, pk, *args, **kwargs):
+        document = Document.objects.filter(pk=pk).exclude(preview='').first()
+        if document is None:
+            raise Http404
+        if not request.user.is_staff and document.user_id != request.user.id:
+            raise PermissionDenied
+
+        response = FileResponse(document.preview.open('rb'), content_type='image/jpeg')
+        patch_cache_control(response, private=True, max_age=self.cache_timeout, immutable=True)
+        return response
@@ -1,10 +1,11 @@
-import csv
-from datetime import datetime
-
 from django.contrib import admin
-from django.http import HttpResponse
+from django.shortcuts import redirect
 
-from exam.models import Settings, Extra, Exam, Subject, Section, Question, Answer, Response, Result
+from exam.models import Settings, Extra, Exam, Subject, Section, Question, Answer, Response, Result, Draft
+from exam.services import annotate_score
+from jobs.admin import job_enqueued_message
+from jobs.models import RESULTS_REPORT
+from jobs.services import enqueue_job
 
 
 class ResponseInLine(admin.TabularInline):
@@ -110,11 +111,15 @@ class ResponseAdmin(admin.ModelAdmin):
 
 class ResultAdmin(admin.ModelAdmin):
     list_display = ('user', 'last_name', 'first_name', 'start_time',
-                    'end_time', 'deadline', 'time', 'score', 'total', 'status')
+                    'end_time', 'deadline', 'time', 'get_score', 'get_total', 'status')
     search_fields = ('user__username',)
     inlines = [ResponseInLine]
     actions = ['export_as_csv']
 
+    def get_queryset(self, request):
+        # score and total come from the stored score or from subqueries, never from a query per row
+        return annotate_score(super().get_queryset(request).select_related('user'))
+
     def last_name(self, obj):
         return obj.user.last_name
 
@@ -124,44 +129,31 @@ class ResultAdmin(admin.ModelAdmin):
     def exam(self, obj):
         return obj.get_exam()
 
-    def total(self, obj):
-        return obj.get_questions_count()
+    def get_total(self, obj):
+        return obj.questions_count
 
-    def score(self, obj):
-        return obj.get_correct_answers_count()
+    def get_score(self, obj):
+        return obj.correct_count
 
     def time(self, obj):
         return obj.get_total_time()
 
+    last_name.admin_order_field = 'user__last_name'
+    first_name.admin_order_field = 'user__first_name'
+    get_total.short_description = 'Total'
+    get_total.admin_order_field = 'questions_count'
+    get_score.short_description = 'Score'
+    get_score.admin_order_field = 'correct_count'
+
     def export_as_csv(self, request, queryset):
-        field_names = ['user', 'last_name', 'first_name', 'start_time', 'end_time', 'deadline', 'time', 'score',
-                       'total', 'status']
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename={} ({}).csv'.format('Reporte de resultados', str(datetime.utcnow()))
-        writer = csv.writer(response)
-        writer.writerow(field_names)
-
-        for obj in queryset:
-            row = []
-            for field in field_names:
-                if field == 'score':
-                    row.append(self.score(obj))
-                elif field == 'total':
-                    row.append(self.total(obj))
-                elif field == 'exam':
-                    row.append(self.exam(obj))
-                elif field == 'time':
-                    row.append(self.time(obj))
-                elif field == 'last_name':
-                    row.append(obj.user.last_name)
-                elif field == 'first_name':
-                    row.append(obj.user.first_name)
-                else:
-                    row.append(str(getattr(obj, field)))
-            writer.writerow(row)
-
-        return response
+        job = enqueue_job(RESULTS_REPORT, queryset, request.user)
+        self.message_user(request, job_enqueued_message(job))
+        return redirect('.')
+
+
+class DraftAdmin(admin.ModelAdmin):
+    list_display = ('result', 'created_at', 'updated_at')
+    search_fields = ('result__user__username',)
 
 
 class TimeRecordAdmin(admin.ModelAdmin):
@@ -177,3 +169,4 @@ admin.site.register(Question, QuestionAdmin)
 admin.site.register(Answer, AnswerAdmin)
 admin.site.register(Response, ResponseAdmin)
 admin.site.register(Result, ResultAdmin)
+admin.site.register(Draft, DraftAdmin)
@@ -0,0 +1,82 @@
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Placeholder rendered by exam_answering.html where the shared exam markup goes
+FRAGMENT_MARKER = mark_safe('<!--exam-fragment-->')
+
+# The exam markup for a snapshot version: the utf-8 html and the same bytes as a byte-aligned, non-final deflate stream
+# that can be spliced into any gzip response without compressing it again
+ExamFragment = namedtuple('ExamFragment', ('version', 'html', 'deflated'))
+
+_fragments = {}
+_fragments_lock = threading.Lock()
+
+
+def _deflate(data, finish=False):
+    """
+    Compresses data as a raw deflate stream. Unless finish is True, the stream is closed with a full flush: it ends on
+    a byte boundary and doesn't reference any previous data, so it can be followed by another independent stream.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if finish else zlib.Z_FULL_FLUSH)
+
+
+def build_exam_fragment(snapshot):
+    """
+    Renders the markup of the exam shared by every non-staff candidate
+    :param snapshot: ExamSnapshot
+    :return: ExamFragment
+    """
+    html = render_to_string('partials/exam_answering_partial_exam.html', {'snapshot': snapshot}).encode('utf-8')
+    return ExamFragment(version=snapshot.version, html=html, deflated=_deflate(html))
+
+
+def get_exam_fragment(snapshot):
+    """
+    Returns the rendered fragment for a snapshot, rendering it once per snapshot version
+    :param snapshot: ExamSnapshot
+    :return: ExamFragment
+    """
+    fragment = _fragments.get(snapshot.id)
+    if fragment is not None and fragment.version >= snapshot.version:
+        return fragment
+
+    with _fragments_lock:
+        fragment = _fragments.get(snapshot.id)
+        if fragment is None or fragment.version < snapshot.version:
+            fragment = build_exam_fragment(snapshot)
+            _fragments[snapshot.id] = fragment
+
+    return fragment
+
+
+def splice(prefix, fragment, suffix):
+    """
+    Joins the per-user prefix and suffix around the shared fragment
+    :return: bytes
+    """
+    return prefix + fragment.html + suffix
+
+
+def splice_gzip(prefix, fragment, suffix):
+    """
+    Builds a gzip member with the per-user prefix and suffix around the shared fragment. Only the prefix and suffix are
+    compressed, the fragment's deflate stream is copied as is.
+    :return: gzip compressed bytes
+    """
+    crc = zlib.crc32(suffix, zlib.crc32(fragment.html, zlib.crc32(prefix)))
+    size = len(prefix) + len(fragment.html) + len(suffix)
+
+    return b''.join((
+        b'\x1f\x8b\x08\x00', struct.pack('<I', int(time.time())), b'\x00\xff',
+        _deflate(prefix),
+        fragment.deflated,
+        _deflate(suffix, finish=True),
+        struct.pack('<II', crc & 0xffffffff, size & 0xffffffff),
+    ))
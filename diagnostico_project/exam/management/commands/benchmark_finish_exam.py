@@ -0,0 +1,90 @@
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from exam.models import Exam, Subject, Section, Question, Answer, Result, Response
+from exam.models import FINISHED
+from exam.services import finish_exam
+
+
+@transaction.atomic
+def legacy_finish_exam(request, result):
+    """The previous implementation: one savepoint, one select and one insert (plus a save) per answer"""
+    for key in request.POST.keys():
+        sid = transaction.savepoint()
+
+        try:
+            if key != 'csrfmiddlewaretoken':
+                if not key.isdigit():
+                    raise Exception
+
+                answer = Answer.objects.get(id=int(request.POST[key]))
+                response = Response.objects.create(result=result, answer=answer)
+                response.save()
+        except Exception:
+            transaction.savepoint_rollback(sid)
+            return False
+
+    result.status = FINISHED
+    result.end_time = timezone.now()
+    result.save()
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Compares the query count and latency of finish_exam against the previous per-answer implementation. ' \
+           'Everything is created inside a transaction that is rolled back at the end.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=120)
+        parser.add_argument('--answers', type=int, default=4, help='answers per question')
+        parser.add_argument('--runs', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            post = self.create_exam(options['questions'], options['answers'])
+            user = get_user_model().objects.create_user(username='benchmark-finish-exam')
+
+            for name, implementation in (('legacy', legacy_finish_exam), ('bulk', finish_exam)):
+                queries, elapsed = 0, 0.0
+                for _ in range(options['runs']):
+                    result = Result.objects.create(user=user, deadline=timezone.now() + timezone.timedelta(hours=2))
+                    request = SimpleNamespace(POST=post)
+
+                    with CaptureQueriesContext(connection) as context:
+                        start = time.perf_counter()
+                        if not implementation(request, result):
+                            raise RuntimeError('{} rejected the submission'.format(name))
+                        elapsed += time.perf_counter() - start
+                    queries += len(context.captured_queries)
+
+                self.stdout.write('{:>6}: {:>5} queries, {:>8.2f} ms per submission ({} questions)'.format(
+                    name, queries // options['runs'], elapsed * 1000 / options['runs'], options['questions']))
+
+            transaction.set_rollback(True)
+
+    def create_exam(self, questions_count, answers_count):
+        """Creates an exam with one subject and section, returns a form post answering every question"""
+        exam = Exam.objects.create(title='Benchmark')
+        subject = Subject.objects.create(exam=exam, title='Benchmark')
+        section = Section.objects.create(subject=subject, title='Benchmark')
+        questions = Question.objects.bulk_create([Question(section=section, text=str(i))
+                                                  for i in range(questions_count)])
+        if not questions[0].pk:
+            questions = list(Question.objects.filter(section=section).order_by('id'))
+
+        Answer.objects.bulk_create([Answer(question=question, text=str(i), is_correct=i == 0)
+                                    for question in questions for i in range(answers_count)])
+
+        post = QueryDict(mutable=True)
+        post['csrfmiddlewaretoken'] = 'benchmark'
+        for question_id, answer_id in Answer.objects.filter(question__section=section, is_correct=True) \
+                .values_list('question_id', 'id'):
+            post[str(question_id)] = str(answer_id)
+        return post
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0013_auto_20190803_1403'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Draft',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disabled', models.BooleanField(default=False)),
+                ('answers', models.TextField(blank=True, default='{}')),
+                ('result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='exam.Result')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
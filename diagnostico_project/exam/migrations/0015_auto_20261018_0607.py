@@ -0,0 +1,31 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0014_auto_20261018_0605'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Score',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disabled', models.BooleanField(default=False)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('breakdown', models.TextField(blank=True, default='{}')),
+                ('exam', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='exam.Exam')),
+                ('result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='exam.Result')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:09
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_result_exam(apps, schema_editor):
+    """Stores on every existing result the exam of its last response, with a single update"""
+    Result = apps.get_model('exam', 'Result')
+    Response = apps.get_model('exam', 'Response')
+
+    last_response_exam = Response.objects.filter(result_id=OuterRef('pk')) \
+        .order_by('-id') \
+        .values('answer__question__section__subject__exam_id')[:1]
+    Result.objects.filter(exam__isnull=True).update(exam_id=Subquery(last_response_exam))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0015_auto_20261018_0607'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='exam',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='exam.Exam'),
+        ),
+        migrations.RunPython(backfill_result_exam, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+import json
+
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -144,6 +147,7 @@ class Result(BaseModel):
     )
 
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, on_delete=models.SET_NULL, null=True, blank=True, default=None)
     status = models.IntegerField(default=ANSWERING, choices=STATUS_CHOICES, blank=False, null=False)
     start_time = models.DateTimeField(null=True, auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True, default=None)
@@ -157,19 +161,28 @@ class Result(BaseModel):
             .filter(result_id=self.id)\
             .last()
 
-    @property
-    def exam(self):
-        if not self.last_response:
-            return None
+    def get_exam(self):
+        """
+        Returns the related exam object. The results created before the exam was recorded on them got it from their
+        responses in a migration, the ones still without it fall back to their last response (looked up once per
+        instance, never stored).
+        """
+        if self.exam_id is not None:
+            return self.exam
 
-        return self.last_response.answer.question.section.subject.exam
+        if not hasattr(self, '_response_exam'):
+            last_response = self.last_response
+            self._response_exam = last_response.answer.question.section.subject.exam if last_response else None
 
-    def get_exam(self):
-        """Returns the related exam object"""
-        if not self.last_response:
-            return None
+        return self._response_exam
 
-        return self.exam
+    def get_exam_id(self):
+        """Returns the id of the related exam without loading it"""
+        if self.exam_id is not None:
+            return self.exam_id
+
+        exam = self.get_exam()
+        return exam.id if exam else None
 
     @property
     def responses(self):
@@ -179,7 +192,8 @@ class Result(BaseModel):
 
     @property
     def questions(self):
-        return Question.objects.select_related('section', 'section__subject').filter(section__subject__exam_id=self.exam.id)
+        return Question.objects.select_related('section', 'section__subject') \
+            .filter(section__subject__exam_id=self.get_exam_id())
 
     def get_correct_answers_count(self):
         """Returns the number of correct answers"""
@@ -197,20 +211,20 @@ class Result(BaseModel):
 
     def get_questions_count(self):
         """Returns the number of questions"""
-        if not self.exam:
+        if not self.get_exam_id():
             return 0
 
         return self.questions.count()
 
     def get_questions_count_by_subject(self, subject_id):
         """Returns the number of questions by subject"""
-        if not self.exam:
+        if not self.get_exam_id():
             return 0
         return self.questions.filter(section__subject__id=subject_id).count()
 
     def get_questions_count_by_section(self, section_id):
         """Returns the number of questions by section"""
-        if not self.exam:
+        if not self.get_exam_id():
             return 0
         return self.questions.filter(section_id=section_id).count()
 
@@ -260,3 +274,64 @@ class Response(BaseModel):
 
     class Meta:
         ordering = ('result', '-answer__question__id')
+
+
+class Draft(BaseModel):
+    """
+    The draft model. While a candidate is answering, the page saves the chosen answers in small batches, so nothing is
+    lost if the connection drops. They are stored compactly as a json object of question id -> answer id, and turned
+    into responses when the exam is submitted.
+    """
+    result = models.OneToOneField(Result, on_delete=models.CASCADE)
+    answers = models.TextField(default='{}', blank=True, null=False)
+
+    def get_answers(self):
+        """Returns a dict of question id -> answer id"""
+        return {int(question_id): answer_id for question_id, answer_id in json.loads(self.answers or '{}').items()}
+
+    def merge_answers(self, answers):
+        """
+        Merges the answers into the draft, newer answers replace the older ones for the same question
+        :return: True if the draft changed
+        """
+        merged = self.get_answers()
+        merged.update(answers)
+        serialized = json.dumps(merged, separators=(',', ':'), sort_keys=True)
+
+        if serialized == self.answers:
+            return False
+
+        self.answers = serialized
+        return True
+
+    def __str__(self):
+        return 'Draft {}'.format(self.result_id)
+
+
+class Score(BaseModel):
+    """
+    The score model. A summary of a result, computed once when the exam is finished: the number of correct answers and
+    questions in total and by subject and section. The breakdown is stored as json, like
+    {"subjects": {"<id>": [correct, total]}, "sections": {"<id>": [correct, total]}}. Scores are deleted whenever the
+    questions or answers of their exam change, and computed again the next time they are read.
+    """
+    result = models.OneToOneField(Result, on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, null=True, blank=True, on_delete=models.CASCADE)
+    correct = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    breakdown = models.TextField(default='{}', blank=True, null=False)
+
+    @cached_property
+    def parsed_breakdown(self):
+        return json.loads(self.breakdown or '{}')
+
+    def get_subject_counts(self, subject_id):
+        """Returns (correct, total) for a subject"""
+        return tuple(self.parsed_breakdown.get('subjects', {}).get(str(subject_id), (0, 0)))
+
+    def get_section_counts(self, section_id):
+        """Returns (correct, total) for a section"""
+        return tuple(self.parsed_breakdown.get('sections', {}).get(str(section_id), (0, 0)))
+
+    def __str__(self):
+        return '{} / {} ({})'.format(self.correct, self.total, self.result_id)
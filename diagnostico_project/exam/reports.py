@@ -0,0 +1,45 @@
+from itertools import chain
+
+from exam.models import Result
+from exam.services import annotate_score
+from utils.streaming import STREAM_CHUNK_SIZE, iterate_in_chunks, write_csv
+
+RESULTS_FIELD_NAMES = ['user', 'last_name', 'first_name', 'start_time', 'end_time', 'deadline', 'time', 'score',
+                       'total', 'status']
+
+
+def get_results_row(result):
+    """
+    Returns the csv row of a result annotated with annotate_score
+    :param result: result instance
+    :return: list
+    """
+    row = []
+    for field in RESULTS_FIELD_NAMES:
+        if field == 'score':
+            row.append(result.correct_count)
+        elif field == 'total':
+            row.append(result.questions_count)
+        elif field == 'time':
+            row.append(result.get_total_time())
+        elif field == 'last_name':
+            row.append(result.user.last_name)
+        elif field == 'first_name':
+            row.append(result.user.first_name)
+        else:
+            row.append(str(getattr(result, field)))
+    return row
+
+
+def write_results_report(ids, file, progress=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Writes the results csv report
+    :param ids: ids of the results
+    :param file: binary file object
+    :param progress: optional function called with the rows written so far
+    :param chunk_size: rows loaded per query
+    :return: number of rows written
+    """
+    results = iterate_in_chunks(annotate_score(Result.objects.select_related('user')), ids, chunk_size)
+    rows = (get_results_row(result) for result in results)
+    return write_csv(file, chain([RESULTS_FIELD_NAMES], rows), progress, chunk_size)
@@ -1,9 +1,21 @@
-from django.db import transaction
+import json
+import logging
+from collections import Counter
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import transaction, DatabaseError
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from exam.models import Result, Settings, Exam, Response, Answer
+from exam.models import Result, Settings, Exam, Response, Answer, Draft, Question, Score
 from exam.models import ANSWERING, TIME_UP, FINISHED
 
+logger = logging.getLogger(__name__)
+
+SETTINGS_CACHE_KEY = 'exam:settings'
+
 
 class DefaultSettings():
     """
@@ -16,15 +28,28 @@ class DefaultSettings():
 
 def get_settings():
     """
-    Get the settings
+    Get the settings. They are cached until a Settings or Exam row changes (see exam.signals), or for
+    EXAM_SETTINGS_CACHE_TIMEOUT seconds, so a change is picked up even by a container with its own cache.
     :return:
     """
-    settings = Settings.objects.last()
-    if settings:
-        return settings
+    settings = cache.get(SETTINGS_CACHE_KEY)
+    if settings is None:
+        settings = Settings.objects.select_related('current_exam').last()
+        if not settings:
+            # use the hardcoded default settings
+            settings = DefaultSettings()
 
-    # return the hardcoded default settings
-    return DefaultSettings()
+        cache.set(SETTINGS_CACHE_KEY, settings, django_settings.EXAM_SETTINGS_CACHE_TIMEOUT)
+
+    return settings
+
+
+def clear_settings_cache():
+    """
+    Drops the cached settings and current exam
+    :return:
+    """
+    cache.delete(SETTINGS_CACHE_KEY)
 
 
 def generate_deadline(start_time):
@@ -46,6 +71,7 @@ def generate_result_for_user(user):
         now = timezone.now()
         result = Result.objects.create(
             user=user,
+            exam=get_default_exam(),
             start_time=now,
             end_time=None,
             deadline=generate_deadline(now)
@@ -58,49 +84,117 @@ def generate_result_for_user(user):
 
 def get_default_exam():
     """
-    Returns the default exam
+    Returns the default exam, which is loaded and cached along with the settings
     :return: exam object
     """
-    settings = get_settings()
-    exam = None
+    return get_settings().current_exam
 
-    if settings.current_exam:
-        exam = Exam.objects.get(pk=settings.current_exam.id)
 
-    return exam
+def parse_submitted_answers(post):
+    """
+    Reads the answers sent in the exam form, where each key is a question id and each value the chosen answer id
+    :param post: the post data
+    :return: dict of question id -> answer id, or None if any of the keys or values isn't an id
+    """
+    answers = {}
+    for key in post.keys():
+        if key == 'csrfmiddlewaretoken':
+            continue
+
+        if not isinstance(key, str) or not key.isdigit():
+            return None
+
+        try:
+            answers[int(key)] = int(post[key])
+        except (TypeError, ValueError):
+            return None
+
+    return answers
+
+
+def answers_belong_to_exam(snapshot, answers):
+    """
+    Checks the answers against the exam without querying the database
+    :param snapshot: ExamSnapshot of the exam being answered
+    :param answers: dict of question id -> answer id
+    :return: True if every answer exists and belongs to its question
+    """
+    return all(snapshot.answer_questions.get(answer_id) == question_id for question_id, answer_id in answers.items())
+
+
+def get_draft_answers(result):
+    """
+    Returns the answers autosaved for a result
+    :param result: the result for the user
+    :return: dict of question id -> answer id
+    """
+    draft = Draft.objects.filter(result=result).first()
+    return draft.get_answers() if draft else {}
+
+
+def save_draft(result, answers):
+    """
+    Merges a batch of autosaved answers into the result's draft. The row is locked so concurrent batches can't lose each
+    other's answers, and it's only written if the batch changes something, so sending a batch twice is harmless.
+    :param result: the result for the user
+    :param answers: dict of question id -> answer id
+    :return: the draft
+    """
+    with transaction.atomic():
+        draft = Draft.objects.select_for_update().get_or_create(result=result)[0]
+        if draft.merge_answers(answers):
+            draft.save(update_fields=['answers', 'updated_at'])
+
+    return draft
 
 
 @transaction.atomic
 def finish_exam(request, result):
     """
-    Finishes the exam by creating a response object of each answer sent and changing the result status to finished
+    Finishes the exam by creating a response object of each answer sent and changing the result status to finished.
+    The answers autosaved while answering are finalized too, unless the form sent a newer one for the same question.
+    Every answer is checked against the answer key with one query and all the responses are inserted at once, if any of
+    the submitted answers is wrong nothing is saved. Autosaved answers that no longer match the answer key (an answer
+    that was deleted or moved since) are dropped. The score is counted from the same answer key and stored with the
+    status.
     :param request: the post request the user sent
     :param result: the result for the user
     :return: True if no errors, False if there was an error
     """
-    for key in request.POST.keys():
-        sid = transaction.savepoint()
+    submitted = parse_submitted_answers(request.POST)
+    if submitted is None:
+        return False
 
-        try:
-            if key != 'csrfmiddlewaretoken':
-                if not key.isdigit():
-                    raise Exception
+    draft = get_draft_answers(result)
+    answer_key = Answer.objects.filter(id__in=set(draft.values()) | set(submitted.values()))
+    if result.exam_id:
+        answer_key = answer_key.filter(question__section__subject__exam_id=result.exam_id)
+    answer_key = {row[0]: row[1:] for row in answer_key.values_list('id', 'question_id', 'is_correct',
+                                                                     'question__section_id',
+                                                                     'question__section__subject__exam_id')}
 
-                answer_id = int(request.POST[key])
-                answer = Answer.objects.get(id=answer_id)
+    # stop everything if a submitted answer is not found or doesn't belong to its question
+    for question_id, answer_id in submitted.items():
+        if answer_key.get(answer_id, (None,))[0] != question_id:
+            return False
 
-                # stop everything if an answer is not found
-                if not answer:
-                    raise Exception
+    answers = {}
+    for question_id, answer_id in draft.items():
+        if question_id in submitted:
+            continue
+        if answer_key.get(answer_id, (None,))[0] != question_id:
+            logger.warning('Dropped the autosaved answer %s to question %s of result %s', answer_id, question_id,
+                           result.id)
+            continue
+        answers[question_id] = answer_id
+    answers.update(submitted)
 
-                response = Response.objects.create(result=result, answer=answer)
-                response.save()
-        except Exception:
-            # if anything wrong happens, make a rollback
-            transaction.savepoint_rollback(sid)
-
-            # and return False
-            return False
+    try:
+        with transaction.atomic():
+            Response.objects.bulk_create([Response(result=result, answer_id=answer_id)
+                                          for answer_id in answers.values()])
+    except DatabaseError:
+        return False
 
     # update the result status to finished
     if not result.is_past_deadline():
@@ -108,7 +202,153 @@ def finish_exam(request, result):
     else:
         result.status = TIME_UP
     result.end_time = timezone.now()
-    result.save()
+    result.save(update_fields=['status', 'end_time', 'updated_at'])
+
+    # the score is computed once, every page and report reads it from now on
+    exam_id = result.exam_id or next((answer_key[answer_id][3] for answer_id in answers.values()), None)
+    correct = Counter(answer_key[answer_id][2] for answer_id in answers.values() if answer_key[answer_id][1])
+    # a score computed while answering (e.g. by a report) is replaced
+    store_score(result, build_score(result, exam_id, [dict(row, correct=correct[row['section_id']])
+                                                      for row in get_section_totals(exam_id)]))
 
     # no errors! :D
     return True
+
+
+def get_section_totals(exam_id):
+    """
+    Counts the questions of an exam by section
+    :param exam_id: id of the exam
+    :return: list of dicts with section_id, subject_id and total
+    """
+    if not exam_id:
+        return []
+
+    return list(Question.objects.filter(section__subject__exam_id=exam_id)
+                .order_by()
+                .values('section_id', subject_id=F('section__subject_id'))
+                .annotate(total=Count('id')))
+
+
+def get_result_breakdown(result):
+    """
+    Counts the correct answers and the questions of a result by section with one grouped query, the correct answers
+    come from a subquery correlated on the section
+    :param result: the result for the user
+    :return: list of dicts with section_id, subject_id, correct and total
+    """
+    exam_id = result.get_exam_id()
+    if not exam_id:
+        return []
+
+    correct = Response.objects.filter(result_id=result.id,
+                                      answer__is_correct=True,
+                                      answer__question__section_id=OuterRef('section_id')) \
+        .order_by() \
+        .values('answer__question__section_id') \
+        .annotate(count=Count('id')) \
+        .values('count')
+
+    return list(Question.objects.filter(section__subject__exam_id=exam_id)
+                .order_by()
+                .values('section_id', subject_id=F('section__subject_id'))
+                .annotate(total=Count('id'), correct=Coalesce(Subquery(correct, output_field=IntegerField()), 0)))
+
+
+def compute_score(result):
+    """
+    Adds up the breakdown of a result, in total and by subject and section
+    :param result: the result for the user
+    :return: unsaved Score instance
+    """
+    return build_score(result, result.get_exam_id(), get_result_breakdown(result))
+
+
+def build_score(result, exam_id, breakdown):
+    """
+    Adds up a breakdown by section, in total and by subject
+    :param result: the result for the user
+    :param exam_id: id of the exam of the result
+    :param breakdown: list of dicts with section_id, subject_id, correct and total
+    :return: unsaved Score instance
+    """
+    subjects, sections = {}, {}
+    for row in breakdown:
+        subject = subjects.setdefault(str(row['subject_id']), [0, 0])
+        subject[0] += row['correct']
+        subject[1] += row['total']
+        sections[str(row['section_id'])] = [row['correct'], row['total']]
+
+    return Score(result=result,
+                 exam_id=exam_id,
+                 correct=sum(counts[0] for counts in sections.values()),
+                 total=sum(counts[1] for counts in sections.values()),
+                 breakdown=json.dumps({'subjects': subjects, 'sections': sections}, separators=(',', ':')))
+
+
+def annotate_score(queryset):
+    """
+    Annotates a Result queryset with correct_count and questions_count. The stored score is used when there is one,
+    else they are counted by subqueries, so a whole page of results is scored in the same query that loads it.
+    :param queryset: Result queryset
+    :return: annotated queryset
+    """
+    live_correct = Response.objects.filter(result_id=OuterRef('pk'), answer__is_correct=True) \
+        .order_by() \
+        .values('result_id') \
+        .annotate(count=Count('id')) \
+        .values('count')
+    live_total = Question.objects.filter(section__subject__exam_id=OuterRef('exam_id')) \
+        .order_by() \
+        .values('section__subject__exam_id') \
+        .annotate(count=Count('id')) \
+        .values('count')
+
+    return queryset.annotate(
+        correct_count=Coalesce(F('score__correct'), Subquery(live_correct, output_field=IntegerField()), 0),
+        questions_count=Coalesce(F('score__total'), Subquery(live_total, output_field=IntegerField()), 0),
+    )
+
+
+def save_score(result):
+    """
+    Computes and stores the score of a result
+    :param result: the result for the user
+    :return: the saved Score
+    """
+    return store_score(result, compute_score(result))
+
+
+def store_score(result, score):
+    """
+    Stores a computed score, replacing the one the result already had
+    :param result: the result for the user
+    :param score: unsaved Score
+    :return: the saved Score
+    """
+    score, created = Score.objects.update_or_create(result=result, defaults={
+        'exam_id': score.exam_id,
+        'correct': score.correct,
+        'total': score.total,
+        'breakdown': score.breakdown,
+    })
+    result.score = score
+    return score
+
+
+def get_score(result):
+    """
+    Returns the stored score of a result. If it was never computed, or was dropped because the exam changed, it's
+    computed again and stored once the result is no longer being answered.
+    :param result: the result for the user
+    :return: Score
+    """
+    try:
+        return result.score
+    except Score.DoesNotExist:
+        pass
+
+    if result.status == ANSWERING:
+        return compute_score(result)
+
+    return save_score(result)
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from exam.models import Settings, Exam, Extra, Subject, Section, Question, Answer, Score
+from exam.services import clear_settings_cache
+
+
+def touch_exams(**lookup):
+    """
+    Bumps the updated_at of the exams matching the lookup, so every cached copy of their content gets rebuilt
+    :param lookup: filter kwargs for the Exam queryset
+    :return: list with the ids of the exams
+    """
+    exam_ids = list(Exam.objects.filter(**lookup).values_list('id', flat=True))
+    Exam.objects.filter(id__in=exam_ids).update(updated_at=timezone.now())
+
+    # the cached current exam carries the old updated_at
+    clear_settings_cache()
+    return exam_ids
+
+
+def invalidate_scores(exam_ids):
+    """Drops the scores computed with the previous questions and answer keys of the exams"""
+    Score.objects.filter(exam_id__in=exam_ids).delete()
+
+
+@receiver([post_save, post_delete], sender=Settings)
+@receiver([post_save, post_delete], sender=Exam)
+def settings_changed(sender, instance, **kwargs):
+    clear_settings_cache()
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def subject_changed(sender, instance, **kwargs):
+    invalidate_scores(touch_exams(id=instance.exam_id))
+
+
+@receiver([post_save, post_delete], sender=Section)
+def section_changed(sender, instance, **kwargs):
+    invalidate_scores(touch_exams(subject__id=instance.subject_id))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    invalidate_scores(touch_exams(subject__section__id=instance.section_id))
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    invalidate_scores(touch_exams(subject__section__question__id=instance.question_id))
+
+
+@receiver([post_save, post_delete], sender=Extra)
+def extra_changed(sender, instance, **kwargs):
+    touch_exams(subject__section__extra_id=instance.id)
@@ -0,0 +1,109 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.db.models import Prefetch
+
+from exam.models import Subject, Section, Question, Answer
+
+# Immutable, render-ready copies of the exam tree. The templates only read attributes from them, so they can be
+# shared by every request served by the worker. answer_questions maps each answer id to the id of its question.
+ExamSnapshot = namedtuple('ExamSnapshot', ('id', 'title', 'description', 'version', 'subjects', 'answer_questions'))
+SubjectSnapshot = namedtuple('SubjectSnapshot', ('id', 'title', 'sections'))
+SectionSnapshot = namedtuple('SectionSnapshot', ('id', 'title', 'instructions', 'extra', 'questions'))
+ExtraSnapshot = namedtuple('ExtraSnapshot', ('id', 'title', 'text', 'image_url'))
+QuestionSnapshot = namedtuple('QuestionSnapshot', ('id', 'text', 'image_url', 'answers'))
+AnswerSnapshot = namedtuple('AnswerSnapshot', ('id', 'text', 'image_url', 'is_correct'))
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def _image_url(image):
+    """Returns the url of an image field or an empty string"""
+    return image.url if image else ''
+
+
+def build_exam_snapshot(exam):
+    """
+    Loads the whole exam tree (subjects, sections, extras, questions and answers) with a fixed number of queries
+    :param exam: exam instance
+    :return: ExamSnapshot
+    """
+    queryset = Subject.objects.filter(exam_id=exam.id).order_by('id').prefetch_related(
+        Prefetch('section_set', queryset=Section.objects.select_related('extra').order_by('id')),
+        Prefetch('section_set__question_set', queryset=Question.objects.order_by('id')),
+        Prefetch('section_set__question_set__answer_set', queryset=Answer.objects.order_by('id')),
+    )
+
+    subjects = tuple(
+        SubjectSnapshot(
+            id=subject.id,
+            title=subject.title,
+            sections=tuple(
+                SectionSnapshot(
+                    id=section.id,
+                    title=section.title,
+                    instructions=section.instructions,
+                    extra=ExtraSnapshot(
+                        id=section.extra.id,
+                        title=section.extra.title,
+                        text=section.extra.text,
+                        image_url=_image_url(section.extra.image),
+                    ) if section.extra else None,
+                    questions=tuple(
+                        QuestionSnapshot(
+                            id=question.id,
+                            text=question.text,
+                            image_url=_image_url(question.image),
+                            answers=tuple(
+                                AnswerSnapshot(
+                                    id=answer.id,
+                                    text=answer.text,
+                                    image_url=_image_url(answer.image),
+                                    is_correct=answer.is_correct,
+                                ) for answer in question.answer_set.all()
+                            ),
+                        ) for question in section.question_set.all()
+                    ),
+                ) for section in subject.section_set.all()
+            ),
+        ) for subject in queryset
+    )
+
+    return ExamSnapshot(
+        id=exam.id,
+        title=exam.title,
+        description=exam.description,
+        version=exam.updated_at,
+        subjects=subjects,
+        answer_questions=MappingProxyType({
+            answer.id: question.id
+            for subject in subjects for section in subject.sections
+            for question in section.questions for answer in question.answers
+        }),
+    )
+
+
+def get_exam_snapshot(exam):
+    """
+    Returns the snapshot of an exam, building it only when the exam has changed since the last build. The version of a
+    snapshot is the exam's updated_at, which is touched every time its content is edited (see exam.signals).
+    :param exam: exam instance
+    :return: ExamSnapshot or None
+    """
+    if exam is None:
+        return None
+
+    snapshot = _snapshots.get(exam.id)
+    if snapshot is not None and snapshot.version >= exam.updated_at:
+        return snapshot
+
+    with _snapshots_lock:
+        # another thread may have built it while we were waiting
+        snapshot = _snapshots.get(exam.id)
+        if snapshot is None or snapshot.version < exam.updated_at:
+            snapshot = build_exam_snapshot(exam)
+            _snapshots[exam.id] = snapshot
+
+    return snapshot
@@ -4,24 +4,30 @@ from roman import toRoman
 register = template.Library()
 
 
+def _get_score(result):
+    # this module is listed in INSTALLED_APPS, so the models can't be imported before the apps are loaded
+    from exam.services import get_score
+    return get_score(result)
+
+
 @register.simple_tag
 def get_subject_correct(result, subject_id):
-    return result.get_correct_answers_count_by_subject(subject_id)
+    return _get_score(result).get_subject_counts(subject_id)[0]
 
 
 @register.simple_tag
 def get_subject_total(result, subject_id):
-    return result.get_questions_count_by_subject(subject_id)
+    return _get_score(result).get_subject_counts(subject_id)[1]
 
 
 @register.simple_tag
 def get_section_correct(result, section_id):
-    return result.get_correct_answers_count_by_section(section_id)
+    return _get_score(result).get_section_counts(section_id)[0]
 
 
 @register.simple_tag
 def get_section_total(result, section_id):
-    return result.get_questions_count_by_section(section_id)
+    return _get_score(result).get_section_counts(section_id)[1]
 
 
 @register.simple_tag
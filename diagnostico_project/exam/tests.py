@@ -1,17 +1,30 @@
+import gzip
+import re
 from datetime import timedelta
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from exam.models import Exam, Subject, Section, Extra, Question, Answer, Result, Response, Settings
+from exam.models import Exam, Subject, Section, Extra, Question, Answer, Result, Response, Settings, Draft, Score
 from exam.models import ANSWERING, TIME_UP, FINISHED
-from exam.services import generate_result_for_user, get_settings, get_default_exam, finish_exam
+from exam.services import generate_result_for_user, get_settings, get_default_exam, finish_exam, compute_score, \
+    get_result_breakdown, get_score, save_score, annotate_score, save_draft
+from exam.fragments import get_exam_fragment
+from exam.snapshot import build_exam_snapshot, get_exam_snapshot
+from jobs.models import Job, RESULTS_REPORT
+from jobs.services import run_job
 
 
 class BaseExamTest(TestCase):
     def setUp(self):
+        # the settings cache outlives the rolled back rows of previous tests
+        cache.clear()
+
         # create exams:
         self.test_exam = Exam.objects.create(title='Test exam', description='An exam created of development purposes')
         self.exam = Exam.objects.create(title='Real exam', description='An exam that will be answered by candidates')
@@ -240,9 +253,30 @@ class ExamModelMethodsTest(BaseExamTest):
         self.assertEquals(self.result.get_correct_answers_count(), 3)
         self.assertEquals(self.result.get_questions_count(), 3)
 
+    def test_result_get_exam(self):
+        result = Result.objects.create(user=self.user, exam=self.exam)
+        result = Result.objects.select_related('exam').get(pk=result.id)
+        with self.assertNumQueries(0):
+            self.assertEquals(result.get_exam(), self.exam)
+            self.assertEquals(result.get_exam_id(), self.exam.id)
+
+        # without responses there is nothing to get it from
+        self.assertIsNone(Result.objects.create(user=self.user).get_exam())
+
+    def test_result_get_exam_from_responses(self):
+        # results created before the exam was recorded get it from their responses, once, without writing it
+        with self.assertNumQueries(1):
+            self.assertEquals(self.result.get_exam(), self.exam)
+        self.assertIsNone(Result.objects.get(pk=self.result.id).exam_id)
+
+        with self.assertNumQueries(0):
+            self.assertEquals(self.result.get_exam(), self.exam)
+            self.assertEquals(self.result.get_exam_id(), self.exam.id)
+
 
 class ExamViewsTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             username='testuser',
             email='ramon.parra@ues.mx',
@@ -522,6 +556,7 @@ class ExamViewsLoadedExamTest(BaseExamTest):
 
 class ExamServicesTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             username='testuser',
             email='ramon.parra@ues.mx',
@@ -571,6 +606,7 @@ class ExamServicesTest(TestCase):
         self.assertIsNotNone(result.start_time)
         self.assertIsNotNone(result.deadline)
         self.assertIsNone(result.end_time)
+        self.assertEquals(result.exam, get_default_exam())
 
         self.assertEquals(result.status, ANSWERING)
 
@@ -583,6 +619,7 @@ class ExamServicesTest(TestCase):
 
 class ExamServicesNoConfigTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             username='testuser',
             email='ramon.parra@ues.mx',
@@ -614,6 +651,30 @@ class ExamServicesNoConfigTest(TestCase):
         self.assertIs(exam2.id, default_exam.id)
         self.assertIsNotNone(exam1.id, default_exam.id)
 
+    def test_settings_cache(self):
+        exam = Exam.objects.create(title='Exam 1', description='Test exam 1')
+        settings = Settings.objects.create(current_exam=exam, minutes_to_finish=60)
+
+        # the exam is loaded with the settings, in one query
+        with self.assertNumQueries(1):
+            self.assertEquals(get_default_exam(), exam)
+        with self.assertNumQueries(0):
+            self.assertEquals(get_settings().minutes_to_finish, 60)
+            self.assertEquals(get_default_exam(), exam)
+
+        # saving the settings drops the cached copy
+        settings.minutes_to_finish = 90
+        settings.save()
+        self.assertEquals(get_settings().minutes_to_finish, 90)
+
+        # so does saving an exam, or touching it when its content changes
+        exam.title = 'Exam 1 (v2)'
+        exam.save()
+        self.assertEquals(get_default_exam().title, 'Exam 1 (v2)')
+
+        Subject.objects.create(exam=exam, title='Math')
+        self.assertEquals(get_default_exam().updated_at, Exam.objects.get(pk=exam.id).updated_at)
+
 
 class ExamServicesLoadedExamTest(BaseExamTest):
     class MockRequest:
@@ -678,6 +739,59 @@ class ExamServicesLoadedExamTest(BaseExamTest):
         # and it also should not create the only correct response (as it should be an atomic operation)
         self.assertEquals(result4.response_set.all().count(), 0)
 
+        # an answer sent for another question should fail too
+        result5 = Result.objects.create(user=self.user)
+        request = self.MockRequest({
+            str(self.q1.id): str(self.q1a4.id),
+            str(self.q2.id): str(self.q3a2.id),
+        })
+        finish_ok = finish_exam(request, result5)
+        self.assertFalse(finish_ok)
+        self.assertEquals(result5.response_set.all().count(), 0)
+
+        # and so should an answer of another exam, once the result knows its exam
+        other_question = Question.objects.create(section=Section.objects.create(subject=Subject.objects.create(
+            exam=self.test_exam, title='Other')), text='Other')
+        other_answer = Answer.objects.create(question=other_question, text='Other', is_correct=True)
+        result6 = Result.objects.create(user=self.user, exam=self.exam)
+        request = self.MockRequest({str(other_question.id): str(other_answer.id)})
+        self.assertFalse(finish_exam(request, result6))
+        self.assertEquals(result6.response_set.all().count(), 0)
+
+    def test_finish_exam_query_count(self):
+        result = Result.objects.create(user=self.user, exam=self.exam)
+        request = self.MockRequest({
+            'csrfmiddlewaretoken': 'token',
+            str(self.q1.id): str(self.q1a4.id),
+            str(self.q2.id): str(self.q2a2.id),
+            str(self.q3.id): str(self.q3a1.id)
+        })
+
+        # the draft and answer key lookups, one insert, the status update, the question count, the score lookup and
+        # insert and the (save)points around them
+        with self.assertNumQueries(15):
+            self.assertTrue(finish_exam(request, result))
+
+        self.assertEquals(result.response_set.count(), 3)
+        self.assertEquals(result.get_correct_answers_count(), 2)
+        self.assertEquals(Result.objects.get(pk=result.id).status, FINISHED)
+
+    def test_finish_exam_existing_score(self):
+        result = Result.objects.create(user=self.user, exam=self.exam)
+        # stored before the exam was finished, e.g. by a report
+        self.assertEquals(save_score(result).correct, 0)
+        result = Result.objects.get(pk=result.id)
+
+        request = self.MockRequest({
+            str(self.q1.id): str(self.q1a4.id),
+            str(self.q2.id): str(self.q2a2.id),
+        })
+        self.assertTrue(finish_exam(request, result))
+
+        # the score is replaced by the finished one
+        self.assertEquals(Score.objects.filter(result=result).count(), 1)
+        self.assertEquals(Result.objects.get(pk=result.id).score.correct, result.get_correct_answers_count())
+
     def test_finish_exam_deadline(self):
         result = Result.objects.create(user=self.user)
         result.deadline = timezone.now() - timedelta(hours=1)
@@ -700,3 +814,328 @@ class ExamServicesLoadedExamTest(BaseExamTest):
 
         # but it should also save all the responses (just in case!)
         self.assertEquals(result.response_set.count(), 3)
+
+
+class ExamSnapshotTest(BaseExamTest):
+    def test_build_exam_snapshot(self):
+        # the whole tree is loaded with a fixed number of queries: subjects, sections (+ extras), questions, answers
+        with self.assertNumQueries(4):
+            snapshot = build_exam_snapshot(self.exam)
+
+        self.assertEquals(snapshot.id, self.exam.id)
+        self.assertEquals([s.title for s in snapshot.subjects], ['Math', 'Spanish'])
+
+        math, spanish = snapshot.subjects
+        self.assertEquals([s.id for s in math.sections], [self.section_arithmetic.id, self.section_series.id])
+        self.assertEquals(spanish.sections[0].questions[0].id, self.q3.id)
+
+        question = math.sections[0].questions[0]
+        self.assertEquals([a.id for a in question.answers], [self.q1a1.id, self.q1a2.id, self.q1a3.id, self.q1a4.id])
+        self.assertTrue(question.answers[3].is_correct)
+
+    def test_get_exam_snapshot_is_shared(self):
+        exam = Exam.objects.get(pk=self.exam.id)
+        snapshot = get_exam_snapshot(exam)
+
+        # a second request for the same version should not touch the database
+        with self.assertNumQueries(0):
+            self.assertIs(get_exam_snapshot(exam), snapshot)
+
+        self.assertIsNone(get_exam_snapshot(None))
+
+    def test_get_exam_snapshot_rebuilds_on_change(self):
+        snapshot = get_exam_snapshot(Exam.objects.get(pk=self.exam.id))
+
+        # editing an answer touches the exam, so the next request gets a new snapshot
+        self.q1a1.text = '5'
+        self.q1a1.save()
+
+        exam = Exam.objects.get(pk=self.exam.id)
+        self.assertGreater(exam.updated_at, snapshot.version)
+
+        new_snapshot = get_exam_snapshot(exam)
+        self.assertIsNot(new_snapshot, snapshot)
+        self.assertEquals(new_snapshot.subjects[0].sections[0].questions[0].answers[0].text, '5')
+
+        # and deleting a question removes it from the snapshot
+        self.q3.delete()
+        new_snapshot = get_exam_snapshot(Exam.objects.get(pk=self.exam.id))
+        self.assertEquals(len(new_snapshot.subjects[1].sections[0].questions), 0)
+
+    def test_answering_view_uses_snapshot(self):
+        self.client.login(username=self.user.username, password='secret')
+        Settings.objects.create(current_exam=self.exam)
+        generate_result_for_user(self.user)
+
+        response = self.client.get(reverse('exam:answering'))
+        self.assertEquals(response.context['snapshot'].id, self.exam.id)
+        self.assertContains(response, 'name="{}" value="{}"'.format(self.q1.id, self.q1a4.id))
+        self.assertContains(response, self.extra_reading.text)
+
+
+class ExamAnsweringPageTest(BaseExamTest):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username=self.user.username, password='secret')
+        Settings.objects.create(current_exam=self.exam)
+        generate_result_for_user(self.user)
+
+    def _without_csrf_token(self, content):
+        return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]*"', b'', content)
+
+    def test_exam_fragment_is_rendered_once(self):
+        snapshot = get_exam_snapshot(Exam.objects.get(pk=self.exam.id))
+        fragment = get_exam_fragment(snapshot)
+
+        self.assertIs(get_exam_fragment(snapshot), fragment)
+        self.assertIn('name="{}" value="{}"'.format(self.q2.id, self.q2a2.id).encode('utf-8'), fragment.html)
+
+    def test_gzip_response_matches_plain_response(self):
+        plain = self.client.get(reverse('exam:answering'))
+        self.assertIsNone(plain.get('Content-Encoding'))
+        self.assertContains(plain, 'name="{}" value="{}"'.format(self.q1.id, self.q1a4.id))
+
+        compressed = self.client.get(reverse('exam:answering'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEquals(compressed['Content-Encoding'], 'gzip')
+        self.assertEquals(self._without_csrf_token(gzip.decompress(compressed.content)),
+                          self._without_csrf_token(plain.content))
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse('exam:answering'))
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        # reloading the page costs a 304
+        response = self.client.get(reverse('exam:answering'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 304)
+
+        # but a new exam version invalidates it
+        etag = response['ETag']
+        self.q1a1.text = '5'
+        self.q1a1.save()
+        response = self.client.get(reverse('exam:answering'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, '5')
+
+    def test_staff_page_is_not_shared(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse('exam:answering'))
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'fa-check"></i></span>')
+
+
+class ExamAutosaveTest(BaseExamTest):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username=self.user.username, password='secret')
+        Settings.objects.create(current_exam=self.exam)
+        self.result = generate_result_for_user(self.user)[1]
+
+    def test_autosave(self):
+        response = self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q1a1.id)})
+        self.assertEquals(response.json()['saved'], 1)
+
+        # saving the same batch again doesn't change anything
+        draft = Draft.objects.get(result=self.result)
+        response = self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q1a1.id)})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(Draft.objects.get(result=self.result).updated_at, draft.updated_at)
+
+        # newer answers replace the older ones and are merged with the rest
+        self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q1a4.id), str(self.q2.id): str(self.q2a2.id)})
+        response = self.client.get(reverse('exam:autosave'))
+        self.assertEquals(response.json()['answers'], {str(self.q1.id): self.q1a4.id, str(self.q2.id): self.q2a2.id})
+
+    def test_autosave_rejects_wrong_answers(self):
+        response = self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q2a2.id)})
+        self.assertEquals(response.status_code, 400)
+
+        response = self.client.post(reverse('exam:autosave'), {'a': 'b'})
+        self.assertEquals(response.status_code, 400)
+        self.assertFalse(Draft.objects.filter(result=self.result).exists())
+
+        # nothing can be saved after the deadline
+        self.result.deadline = timezone.now() - timedelta(minutes=1)
+        self.result.save()
+        response = self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q1a4.id)})
+        self.assertEquals(response.status_code, 409)
+
+    def test_finish_exam_finalizes_draft(self):
+        self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q1a4.id), str(self.q2.id): str(self.q2a1.id)})
+
+        # the final post only carries what changed since the last autosave
+        response = self.client.post(reverse('exam:answering'), {str(self.q2.id): str(self.q2a2.id)})
+        self.assertRedirects(response, reverse('exam:finished'))
+
+        self.assertEquals(sorted(self.result.response_set.values_list('answer_id', flat=True)),
+                          sorted([self.q1a4.id, self.q2a2.id]))
+        self.assertEquals(self.result.get_correct_answers_count(), 2)
+
+    def test_finish_exam_drops_stale_draft_answers(self):
+        self.client.post(reverse('exam:autosave'), {str(self.q1.id): str(self.q1a4.id), str(self.q2.id): str(self.q2a1.id)})
+
+        # the autosaved answer of q2 is deleted before the exam is submitted
+        self.q2a1.delete()
+        response = self.client.post(reverse('exam:answering'), {str(self.q3.id): str(self.q3a2.id)})
+        self.assertRedirects(response, reverse('exam:finished'))
+
+        self.assertEquals(sorted(self.result.response_set.values_list('answer_id', flat=True)),
+                          sorted([self.q1a4.id, self.q3a2.id]))
+        self.assertEquals(Score.objects.get(result=self.result).correct, 2)
+
+        # a wrong submitted answer still rejects everything
+        result = Result.objects.create(user=self.user, exam=self.exam)
+        save_draft(result, {self.q1.id: self.q1a4.id})
+        request = ExamServicesLoadedExamTest.MockRequest({str(self.q2.id): str(self.q3a2.id)})
+        self.assertFalse(finish_exam(request, result))
+        self.assertEquals(result.response_set.count(), 0)
+
+
+class ExamScoreTest(BaseExamTest):
+    def setUp(self):
+        super().setUp()
+        self.result = Result.objects.create(user=self.user, exam=self.exam, status=FINISHED)
+        Response.objects.create(result=self.result, answer=self.q1a4)
+        Response.objects.create(result=self.result, answer=self.q2a1)
+        Response.objects.create(result=self.result, answer=self.q3a2)
+
+    def test_compute_score(self):
+        score = compute_score(self.result)
+        self.assertEquals(score.correct, 2)
+        self.assertEquals(score.total, 3)
+        self.assertEquals(score.get_subject_counts(self.subject_math.id), (1, 2))
+        self.assertEquals(score.get_subject_counts(self.subject_spanish.id), (1, 1))
+        self.assertEquals(score.get_section_counts(self.section_series.id), (0, 1))
+        self.assertEquals(score.get_section_counts(self.section_reading.id), (1, 1))
+
+    def test_get_result_breakdown(self):
+        with self.assertNumQueries(1):
+            breakdown = {row['section_id']: row for row in get_result_breakdown(self.result)}
+
+        self.assertEquals(len(breakdown), 3)
+        self.assertEquals(breakdown[self.section_arithmetic.id]['correct'], 1)
+        self.assertEquals(breakdown[self.section_series.id]['correct'], 0)
+        self.assertEquals(breakdown[self.section_reading.id]['subject_id'], self.subject_spanish.id)
+        self.assertEquals(sum(row['total'] for row in breakdown.values()), 3)
+
+        # a result without exam has nothing to count
+        self.assertEquals(get_result_breakdown(Result.objects.create(user=self.user)), [])
+
+    def test_get_score_is_stored(self):
+        score = get_score(self.result)
+        self.assertIsNotNone(score.pk)
+
+        # once stored, reading it again is a single query
+        result = Result.objects.get(pk=self.result.id)
+        with self.assertNumQueries(1):
+            self.assertEquals(get_score(result).correct, 2)
+            self.assertEquals(get_score(result).get_subject_counts(self.subject_math.id), (1, 2))
+
+    def test_score_is_invalidated_when_answer_key_changes(self):
+        get_score(self.result)
+
+        # q2's correct answer is now the one the user chose
+        self.q2a1.is_correct = True
+        self.q2a1.save()
+        self.assertFalse(Score.objects.filter(result=self.result).exists())
+
+        result = Result.objects.get(pk=self.result.id)
+        self.assertEquals(get_score(result).correct, 3)
+
+        # a new question changes the total
+        Question.objects.create(section=self.section_reading, text='Another one')
+        result = Result.objects.get(pk=self.result.id)
+        self.assertEquals(get_score(result).total, 4)
+
+    def test_finish_exam_stores_score(self):
+        result = Result.objects.create(user=self.user)
+        request = ExamServicesLoadedExamTest.MockRequest({str(self.q1.id): str(self.q1a4.id)})
+        self.assertTrue(finish_exam(request, result))
+        score = Score.objects.get(result=result)
+        self.assertEquals(score.correct, 1)
+
+        # counted from the answer key, it matches what the responses add up to
+        expected = compute_score(Result.objects.get(pk=result.id))
+        self.assertEquals((score.exam_id, score.total, score.parsed_breakdown),
+                          (expected.exam_id, expected.total, expected.parsed_breakdown))
+
+    def test_results_view_uses_score(self):
+        self.client.login(username=self.user.username, password='secret')
+        save_score(self.result)
+
+        response = self.client.get(reverse('exam:results'))
+        self.assertContains(response, '2 / 3')
+        self.assertContains(response, '<strong>Math:</strong> 1 / 2')
+
+    def test_annotate_score(self):
+        # counted live until the score is stored
+        result = annotate_score(Result.objects.filter(pk=self.result.id)).get()
+        self.assertEquals((result.correct_count, result.questions_count), (2, 3))
+
+        Score.objects.create(result=self.result, exam=self.exam, correct=1, total=3)
+        result = annotate_score(Result.objects.filter(pk=self.result.id)).get()
+        self.assertEquals((result.correct_count, result.questions_count), (1, 3))
+
+    def test_result_admin_query_count(self):
+        get_user_model().objects.create_superuser(username='admin', email='admin@ues.mx', password='secret')
+        self.client.login(username='admin', password='secret')
+        url = reverse('admin:exam_result_changelist')
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+
+        for i in range(10):
+            user = get_user_model().objects.create_user(username='candidate{}'.format(i), password='secret')
+            result = Result.objects.create(user=user, exam=self.exam, status=FINISHED)
+            Response.objects.create(result=result, answer=self.q1a4)
+
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url + '?o=-8')  # sorted by score, after the checkbox column
+        self.assertEquals(response.context['cl'].result_count, 11)
+        self.assertEquals(response.context['cl'].result_list[0].correct_count, 2)
+
+    def test_result_admin_export_as_csv(self):
+        get_user_model().objects.create_superuser(username='admin', email='admin@ues.mx', password='secret')
+        self.client.login(username='admin', password='secret')
+        user = get_user_model().objects.create_user(username='candidate', first_name='Ana', password='secret')
+        result = Result.objects.create(user=user, exam=self.exam, status=FINISHED)
+        Response.objects.create(result=result, answer=self.q1a4)
+
+        response = self.client.post(reverse('admin:exam_result_changelist'), {
+            'action': 'export_as_csv',
+            '_selected_action': [self.result.id, result.id],
+        })
+        self.assertRedirects(response, reverse('admin:exam_result_changelist'), fetch_redirect_response=False)
+
+        # the export is left to the worker
+        job = Job.objects.get(kind=RESULTS_REPORT)
+        self.assertEquals(job.rows_total, 2)
+        run_job(job)
+        with job.file.open('rb') as file:
+            lines = file.read().decode('utf-8').splitlines()
+        job.file.delete(save=False)
+
+        self.assertEquals(lines[0], 'user,last_name,first_name,start_time,end_time,deadline,time,score,total,status')
+        self.assertEquals(len(lines), 3)
+        self.assertIn('candidate,,Ana,', lines[1] + lines[2])
+        self.assertTrue(any(line.endswith(',1,3,{}'.format(FINISHED)) for line in lines[1:]))
+
+    def test_results_view_query_count(self):
+        self.client.login(username=self.user.username, password='secret')
+        save_score(self.result)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('exam:results'))
+
+        # more subjects don't add queries
+        for i in range(5):
+            subject = Subject.objects.create(exam=self.exam, title='Subject {}'.format(i))
+            Question.objects.create(section=Section.objects.create(subject=subject, title='Section'), text='Question')
+
+        save_score(self.result)
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(reverse('exam:results'))
+        self.assertContains(response, '<strong>Subject 4:</strong> 0 / 1')
@@ -1,5 +1,6 @@
 from django.urls import path
-from exam.views import ExamHomeView, ExamErrorView, ExamTimeUpView, ExamResultsView, ExamFinishedView, ExamAnsweringView
+from exam.views import ExamHomeView, ExamErrorView, ExamTimeUpView, ExamResultsView, ExamFinishedView, ExamAnsweringView, \
+    ExamAutosaveView
 
 app_name = 'exam'
 urlpatterns = [
@@ -9,4 +10,5 @@ urlpatterns = [
     path('results', ExamResultsView.as_view(), name='results'),
     path('finished', ExamFinishedView.as_view(), name='finished'),
     path('answering', ExamAnsweringView.as_view(), name='answering'),
+    path('autosave', ExamAutosaveView.as_view(), name='autosave'),
 ]
@@ -1,13 +1,26 @@
+import hashlib
+import re
+from calendar import timegm
+
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.messages import get_messages
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from django.views import View
 
 from exam.forms import NewExamForm
 from exam.email import send_email_results
+from exam.fragments import FRAGMENT_MARKER, get_exam_fragment, splice, splice_gzip
 from exam.models import Result
 from exam.models import ANSWERING, TIME_UP, FINISHED
-from exam.services import generate_result_for_user, get_default_exam, finish_exam, get_settings, generate_deadline
+from exam.services import generate_result_for_user, get_default_exam, finish_exam, get_settings, generate_deadline, \
+    parse_submitted_answers, answers_belong_to_exam, get_draft_answers, save_draft, get_score
+from exam.snapshot import get_exam_snapshot
 
 
 class ExamBaseView(LoginRequiredMixin, View):
@@ -64,27 +77,82 @@ class ExamResultsView(ExamBaseView):
 
         # else show the results page
         return render(request, 'exam_results.html', {
-            'result': result
+            'result': result,
+            'score': get_score(result)
         })
 
 
 class ExamAnsweringView(ExamBaseView):
     """
-    Exam Answering View. It's the answers page of the exam.
+    Exam Answering View. It's the answers page of the exam. The exam markup is the same for every candidate, so it's
+    rendered and compressed once per exam version and spliced between the per-user parts of the page.
     """
+    accepts_gzip = re.compile(r'\bgzip\b')
+
     def get(self, request, *args, **kwargs):
         """Returns the current exam to the user"""
         result = self.get_user_result()
 
-        # only render if there is a result
-        if result and result.status == ANSWERING:
-            return render(request, 'exam_answering.html', {
-                'exam': get_default_exam(),
-                'result': result
-            })
+        # only render if there is a result, else it should redirect to home
+        if not result or result.status != ANSWERING:
+            return redirect('exam:home')
 
-        # else it should redirect to home
-        return redirect('exam:home')
+        exam = result.exam or get_default_exam()
+        snapshot = get_exam_snapshot(exam)
+        context = {
+            'exam': exam,
+            'snapshot': snapshot,
+            'result': result
+        }
+
+        # staff members can see the correct answers, so their page is never shared
+        if snapshot is None or request.user.is_staff:
+            return render(request, 'exam_answering.html', context)
+
+        # a page showing messages can't be revalidated, they are only displayed once
+        cacheable = len(get_messages(request)) == 0
+        etag = self.get_etag(snapshot, result)
+        last_modified = timegm(max(snapshot.version, result.updated_at).utctimetuple())
+
+        if cacheable:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return self.patch_validators(response, etag, last_modified)
+
+        context['exam_fragment'] = FRAGMENT_MARKER
+        page = render_to_string('exam_answering.html', context, request=request)
+        prefix, suffix = (part.encode('utf-8') for part in page.split(FRAGMENT_MARKER, 1))
+        fragment = get_exam_fragment(snapshot)
+
+        if self.accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response = HttpResponse(splice_gzip(prefix, fragment, suffix))
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(splice(prefix, fragment, suffix))
+        response['Content-Length'] = len(response.content)
+        patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+
+        if cacheable:
+            self.patch_validators(response, etag, last_modified)
+
+        return response
+
+    def patch_validators(self, response, etag, last_modified):
+        """Browsers should keep the page but revalidate it on every load"""
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_etag(self, snapshot, result):
+        """
+        The page only changes with the exam version, the result and the csrf cookie the form's token was made from
+        """
+        get_token(self.request)  # makes sure the cookie exists before the page is rendered
+        key = '{}:{}:{}:{}:{}'.format(snapshot.id, snapshot.version.timestamp(), result.id,
+                                      result.deadline.timestamp() if result.deadline else '',
+                                      self.request.META.get('CSRF_COOKIE', ''))
+        return 'W/"{}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
 
     def post(self, request, *args, **kwargs):
         """Submits the exam"""
@@ -110,6 +178,34 @@ class ExamAnsweringView(ExamBaseView):
         return redirect('exam:finished')
 
 
+class ExamAutosaveView(ExamBaseView):
+    """
+    Exam Autosave View. While the candidate answers, the answering page posts the answers chosen since its last call,
+    so they are kept if the connection drops and the final submission only has to finalize them.
+    """
+    def get(self, request, *args, **kwargs):
+        """Returns the answers saved so far, so the page can restore them after a reload"""
+        result = self.get_user_result()
+        if not result or result.status != ANSWERING:
+            return JsonResponse({'answers': {}}, status=409)
+
+        return JsonResponse({'answers': get_draft_answers(result)})
+
+    def post(self, request, *args, **kwargs):
+        """Merges a batch of answers into the draft"""
+        result = self.get_user_result()
+        if not result or result.status != ANSWERING or result.is_past_deadline():
+            return JsonResponse({'saved': 0}, status=409)
+
+        answers = parse_submitted_answers(request.POST)
+        snapshot = get_exam_snapshot(result.exam or get_default_exam())
+        if not answers or snapshot is None or not answers_belong_to_exam(snapshot, answers):
+            return JsonResponse({'saved': 0}, status=400)
+
+        save_draft(result, answers)
+        return JsonResponse({'saved': len(answers)})
+
+
 class ExamFinishedView(ExamBaseView):
     """
     Exam Finished View. It should inform the user that the exam was submitted correctly.
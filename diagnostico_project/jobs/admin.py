@@ -0,0 +1,70 @@
+import os
+
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from jobs.models import Job, DONE
+from jobs.services import resume_job
+
+
+def job_enqueued_message(job):
+    """Returns the message shown after an admin action creates a job"""
+    return format_html('Se está generando "{}" en segundo plano, podrás descargarlo desde la <a href="{}">lista de '
+                       'trabajos</a> cuando termine', job.get_kind_display(), reverse('admin:jobs_job_changelist'))
+
+
+class JobAdmin(admin.ModelAdmin):
+    """Job Admin"""
+    list_display = ('id', 'kind', 'status', 'get_progress', 'rows_done', 'summary', 'get_duration', 'user',
+                    'created_at', 'download')
+    list_filter = ('kind', 'status')
+    search_fields = ('user__username',)
+    readonly_fields = ('kind', 'status', 'user', 'rows_total', 'rows_done', 'summary', 'file', 'error', 'started_at',
+                       'finished_at')
+    exclude = ('params',)
+    actions = ['resume_jobs']
+
+    def has_add_permission(self, request):
+        # jobs are created by the admin actions
+        return False
+
+    def get_progress(self, obj):
+        return '{}%'.format(obj.get_progress())
+
+    def get_duration(self, obj):
+        return obj.get_duration()
+
+    def download(self, obj):
+        if obj.status != DONE or not obj.file:
+            return '-'
+
+        return format_html('<a href="{}">Descargar</a>', reverse('admin:jobs_job_download', args=[obj.id]))
+
+    def resume_jobs(self, request, queryset):
+        resumed = sum(resume_job(job) for job in queryset)
+        self.message_user(request, 'Se reanudaron {} trabajo(s), solo se reanudan los envíos que fallaron o se '
+                                   'detuvieron'.format(resumed))
+
+    resume_jobs.short_description = 'Reanudar los trabajos seleccionados'
+    get_progress.short_description = 'Progress'
+    get_duration.short_description = 'Duration'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        my_urls = [
+            path('<int:job_id>/download/', self.admin_site.admin_view(self.download_file), name='jobs_job_download'),
+        ]
+        return my_urls + urls
+
+    def download_file(self, request, job_id):
+        """Sends the file of a job, only to the staff that can see the jobs"""
+        job = Job.objects.filter(pk=job_id, status=DONE).first()
+        if not job or not job.file or not self.has_view_permission(request, job):
+            raise Http404
+
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name))
+
+
+admin.site.register(Job, JobAdmin)
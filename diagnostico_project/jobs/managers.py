@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class JobsBaseManager(models.Manager):
+    """
+    Base manager.
+    """
+    def get_queryset(self):
+        """
+        Replace the default query set with a new one that filters any disabled item.
+        :return: queryset with everything where disabled=False is true
+        """
+        return super().get_queryset().filter(disabled=False)
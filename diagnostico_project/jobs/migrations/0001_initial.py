@@ -0,0 +1,40 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import jobs.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disabled', models.BooleanField(default=False)),
+                ('kind', models.CharField(choices=[('general_report', 'Reporte general'), ('results_report', 'Reporte de resultados'), ('candidate_files', 'Archivos de aspirantes')], max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'Generando'), ('done', 'Terminado'), ('failed', 'Error')], default='pending', max_length=20)),
+                ('params', models.TextField(blank=True, default='{}')),
+                ('rows_total', models.PositiveIntegerField(default=0)),
+                ('rows_done', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, max_length=255, null=True, upload_to=jobs.models.get_upload_path)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, default=None, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.13 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='summary',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('general_report', 'Reporte general'), ('results_report', 'Reporte de resultados'), ('candidate_files', 'Archivos de aspirantes'), ('candidate_import', 'Importación de aspirantes')], max_length=50),
+        ),
+    ]
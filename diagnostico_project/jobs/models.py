@@ -0,0 +1,100 @@
+import json
+import os
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+from jobs.managers import JobsBaseManager
+
+# status:
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# kinds:
+GENERAL_REPORT = 'general_report'
+RESULTS_REPORT = 'results_report'
+CANDIDATE_FILES = 'candidate_files'
+CANDIDATE_IMPORT = 'candidate_import'
+CANDIDATE_CREDENTIALS = 'candidate_credentials'
+
+
+def get_upload_path(instance, filename):
+    """Returns the upload path for this app, the random folder keeps the files from being guessed"""
+    return os.path.join('jobs', uuid.uuid4().hex, filename)
+
+
+class JobsBaseModel(models.Model):
+    """
+    Jobs Base Model.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    disabled = models.BooleanField(default=False)
+
+    objects = JobsBaseManager()
+
+    class Meta:
+        abstract = True
+
+
+class Job(JobsBaseModel):
+    """
+    Job Model. A report or an export requested from the admin, which is generated by the celery worker instead of the
+    request. It keeps the ids of the objects (or the uploaded file) to process, its progress and the generated file,
+    along with the rows and the time it took so the cost of each report can be followed over time.
+    """
+    STATUS_CHOICES = (
+        (PENDING, 'Pendiente'),
+        (RUNNING, 'Generando'),
+        (DONE, 'Terminado'),
+        (FAILED, 'Error'),
+    )
+    KIND_CHOICES = (
+        (GENERAL_REPORT, 'Reporte general'),
+        (RESULTS_REPORT, 'Reporte de resultados'),
+        (CANDIDATE_FILES, 'Archivos de aspirantes'),
+        (CANDIDATE_IMPORT, 'Importación de aspirantes'),
+        (CANDIDATE_CREDENTIALS, 'Envío de contraseñas'),
+    )
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    user = models.ForeignKey(get_user_model(), null=True, blank=True, on_delete=models.SET_NULL)
+    params = models.TextField(default='{}', blank=True)
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to=get_upload_path, blank=True, null=True, max_length=255)
+    summary = models.CharField(max_length=255, default='', blank=True)
+    error = models.TextField(default='', blank=True)
+    started_at = models.DateTimeField(null=True, blank=True, default=None)
+    finished_at = models.DateTimeField(null=True, blank=True, default=None)
+
+    def get_params(self):
+        """Returns the params as a dict"""
+        return json.loads(self.params or '{}')
+
+    def get_progress(self):
+        """Returns the percentage of rows done"""
+        if self.status == DONE:
+            return 100
+
+        if not self.rows_total:
+            return 0
+
+        return min(100, self.rows_done * 100 // self.rows_total)
+
+    def get_duration(self):
+        """Returns how long the job took, None if it hasn't finished"""
+        if not self.started_at or not self.finished_at:
+            return None
+
+        return self.finished_at - self.started_at
+
+    def __str__(self):
+        return '{} ({})'.format(self.get_kind_display(), self.pk)
+
+    class Meta:
+        ordering = ('-created_at',)
@@ -0,0 +1,140 @@
+import json
+import logging
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from jobs.models import Job, GENERAL_REPORT, RESULTS_REPORT, CANDIDATE_FILES, CANDIDATE_IMPORT, CANDIDATE_CREDENTIALS
+from jobs.models import PENDING, RUNNING, DONE, FAILED
+from jobs.models import get_upload_path
+
+logger = logging.getLogger(__name__)
+
+# function that writes the file of each kind of job and the extension of the file. Each function receives the params of
+# the job as keyword arguments (the list of ids, or the path of the uploaded file), the binary file to write to and a
+# progress function, and returns the number of rows it wrote, or the number of rows and a summary of the job.
+JOB_WRITERS = {
+    GENERAL_REPORT: ('users.reports.write_general_report', 'csv'),
+    RESULTS_REPORT: ('exam.reports.write_results_report', 'csv'),
+    CANDIDATE_FILES: ('users.reports.write_candidate_files', 'zip'),
+    CANDIDATE_IMPORT: ('users.imports.write_import_report', 'csv'),
+    CANDIDATE_CREDENTIALS: ('users.credentials.write_credentials_report', 'csv'),
+}
+
+# kinds whose writer processes the ids in order and can start from the ones done by a previous run, it receives the
+# number of ids done as the start keyword argument
+RESUMABLE_JOBS = (CANDIDATE_CREDENTIALS,)
+
+# a running job whose progress hasn't changed in this long is considered stopped
+STALLED_AFTER = timezone.timedelta(minutes=10)
+
+
+def enqueue_job(kind, queryset, user=None):
+    """
+    Creates a job for the objects of a queryset and sends it to the worker once the current transaction is committed
+    :param kind: one of the kinds in JOB_WRITERS
+    :param queryset: the objects to process, in the order they should be written
+    :param user: the user that requested it
+    :return: the created job
+    """
+    from jobs.tasks import process_job  # the tasks module imports this one
+
+    ids = list(queryset.values_list('pk', flat=True))
+    job = Job.objects.create(kind=kind, user=user, rows_total=len(ids), params=json.dumps({'ids': ids}))
+    transaction.on_commit(lambda: process_job.delay(job.id))
+    return job
+
+
+def enqueue_file_job(kind, file, user=None):
+    """
+    Creates a job for an uploaded file, the file is saved to the storage so the worker can read it
+    :param kind: one of the kinds in JOB_WRITERS
+    :param file: the uploaded file
+    :param user: the user that uploaded it
+    :return: the created job
+    """
+    from jobs.tasks import process_job  # the tasks module imports this one
+
+    path = default_storage.save(get_upload_path(None, file.name), file)
+    job = Job.objects.create(kind=kind, user=user, params=json.dumps({'path': path}))
+    transaction.on_commit(lambda: process_job.delay(job.id))
+    return job
+
+
+def can_resume(job):
+    """
+    Checks if a job can be sent to the worker again: it has to be resumable and have failed or stopped
+    :param job: the job
+    :return: bool
+    """
+    if job.kind not in RESUMABLE_JOBS:
+        return False
+
+    return job.status == FAILED or (job.status == RUNNING and job.updated_at < timezone.now() - STALLED_AFTER)
+
+
+def resume_job(job):
+    """
+    Sends a job that failed or stopped to the worker again, it continues after the last rows it recorded as done
+    :param job: the job
+    :return: True if it was resumed
+    """
+    from jobs.tasks import process_job  # the tasks module imports this one
+
+    if not can_resume(job):
+        return False
+
+    job.status = PENDING
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    transaction.on_commit(lambda: process_job.delay(job.id))
+    return True
+
+
+def run_job(job):
+    """
+    Writes the file of a job to a temporary file and saves it to the storage, recording the progress and the status
+    :param job: the job to run
+    :return: the updated job
+    """
+    path, extension = JOB_WRITERS[job.kind]
+    writer = import_string(path)
+
+    job.status = RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at', 'updated_at'])
+
+    def progress(rows):
+        Job.objects.filter(pk=job.pk).update(rows_done=rows, updated_at=timezone.now())
+
+    params = job.get_params()
+    if job.kind in RESUMABLE_JOBS:
+        params['start'] = job.rows_done
+
+    try:
+        with tempfile.TemporaryFile() as file:
+            rows = writer(file=file, progress=progress, **params)
+            if isinstance(rows, tuple):
+                rows, job.summary = rows
+            job.rows_done = rows
+            file.seek(0)
+            job.file.save('{} ({}).{}'.format(job.get_kind_display(), job.started_at.strftime('%Y-%m-%d %H%M%S'),
+                                              extension), File(file), save=False)
+        job.status = DONE
+    except Exception as e:
+        logger.exception('Job %s failed', job.pk)
+        job.status = FAILED
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        # the rows recorded by the progress are what a resumed job skips, so they are kept as they are
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        job.refresh_from_db(fields=['rows_done'])
+        return job
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from jobs.models import Job, PENDING
+from jobs.services import run_job
+
+
+@shared_task
+def process_job(job_id):
+    """Runs a pending job"""
+    job = Job.objects.filter(pk=job_id, status=PENDING).first()
+    if job:
+        run_job(job)
@@ -0,0 +1,92 @@
+import io
+from zipfile import ZipFile
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.urls import reverse
+
+from documents.models import Category, Document
+from exam.models import Exam, Result
+from jobs.models import Job, RESULTS_REPORT, CANDIDATE_FILES, PENDING, DONE, FAILED
+from jobs.services import enqueue_job, run_job
+from jobs.tasks import process_job
+
+
+class JobsTest(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(username='admin', email='admin@ues.mx',
+                                                               password='secret')
+        self.candidate = get_user_model().objects.create_user(username='candidate', nombre='Ana')
+        self.client.login(username='admin', password='secret')
+        self.result = Result.objects.create(user=self.candidate, exam=Exam.objects.create(title='Exam'))
+        self.files = []
+
+    def tearDown(self):
+        for job in Job.objects.exclude(file=''):
+            job.file.delete(save=False)
+        for name in self.files:
+            default_storage.delete(name)
+
+    def test_enqueue_job(self):
+        job = enqueue_job(RESULTS_REPORT, Result.objects.filter(pk=self.result.pk), self.admin)
+        self.assertEquals(job.status, PENDING)
+        self.assertEquals(job.rows_total, 1)
+        self.assertEquals(job.get_params(), {'ids': [self.result.pk]})
+        self.assertEquals(job.get_progress(), 0)
+        self.assertIsNone(job.get_duration())
+
+    def test_process_job(self):
+        job = enqueue_job(RESULTS_REPORT, Result.objects.filter(pk=self.result.pk), self.admin)
+        process_job(job.id)
+
+        job = Job.objects.get(pk=job.id)
+        self.assertEquals(job.status, DONE)
+        self.assertEquals(job.rows_done, 1)
+        self.assertEquals(job.get_progress(), 100)
+        self.assertIsNotNone(job.get_duration())
+        self.assertTrue(job.file.name.endswith('.csv'))
+        with job.file.open('rb') as file:
+            self.assertIn(b'candidate,', file.read())
+
+        # a job only runs once
+        process_job(job.id)
+        self.assertEquals(Job.objects.get(pk=job.id).finished_at, job.finished_at)
+
+    def test_failed_job(self):
+        job = Job.objects.create(kind=RESULTS_REPORT, params='{"ids": "not a list"}')
+        run_job(job)
+
+        job = Job.objects.get(pk=job.id)
+        self.assertEquals(job.status, FAILED)
+        self.assertNotEquals(job.error, '')
+        self.assertFalse(job.file)
+
+    def test_candidate_files_job(self):
+        self.files.append(default_storage.save('files/candidate/acta/acta.pdf', ContentFile(b'%PDF-1.4')))
+        Document.objects.create(user=self.candidate, category=Category.objects.create(name='Acta'),
+                                file=self.files[0])
+        job = run_job(enqueue_job(CANDIDATE_FILES, get_user_model().objects.filter(pk=self.candidate.pk)))
+
+        self.assertEquals(job.status, DONE)
+        with job.file.open('rb') as file:
+            names = ZipFile(io.BytesIO(file.read())).namelist()
+        self.assertEquals(names, [self.files[0], 'faltantes.csv'])
+
+    def test_job_admin(self):
+        job = run_job(enqueue_job(RESULTS_REPORT, Result.objects.all(), self.admin))
+        download_url = reverse('admin:jobs_job_download', args=[job.id])
+
+        response = self.client.get(reverse('admin:jobs_job_changelist'))
+        self.assertContains(response, download_url)
+
+        response = self.client.get(download_url)
+        self.assertEquals(response.status_code, 200)
+        self.assertIn(b'user,last_name', b''.join(response.streaming_content))
+
+        # only staff can download it
+        self.client.logout()
+        self.client.force_login(self.candidate)
+        response = self.client.get(download_url)
+        self.assertNotEquals(response.status_code, 200)
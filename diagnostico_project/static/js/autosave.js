@@ -0,0 +1,38 @@
+function setAutosave(url) {
+    let pending = {};
+    let saving = false;
+
+    $('#examForm input[type=radio]').on('change', function() {
+        pending[this.name] = this.value;
+    });
+
+    // restore the answers saved before a reload, unless they were already changed
+    $.getJSON(url, function(data) {
+        $.each(data.answers, function(question, answer) {
+            if (!(question in pending)) {
+                $('#examForm input[name="' + question + '"][value="' + answer + '"]').prop('checked', true);
+            }
+        });
+    });
+
+    setInterval(function() {
+        if (saving || $.isEmptyObject(pending)) {
+            return;
+        }
+
+        let batch = pending;
+        pending = {};
+        saving = true;
+
+        $.post(url, $.extend({
+            csrfmiddlewaretoken: $('#examForm input[name=csrfmiddlewaretoken]').val()
+        }, batch)).fail(function(xhr) {
+            // keep the batch for the next try if it didn't reach the server, the answers chosen meanwhile win
+            if (xhr.status === 0 || xhr.status >= 500) {
+                pending = $.extend(batch, pending);
+            }
+        }).always(function() {
+            saving = false;
+        });
+    }, 10000);
+}
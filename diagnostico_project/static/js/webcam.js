@@ -40,10 +40,38 @@ function takePhoto() {
   canvas.height = video.videoHeight;
   canvas.getContext('2d').drawImage(video, 0, 0);
 
-  let imgString = canvas.toDataURL('image/webp');
-  img.src = imgString;
+  // the photo is uploaded once, the crop form only sends its token back
+  canvas.toBlob(function(blob) {
+    img.src = URL.createObjectURL(blob);
+    enableCropper();
+    uploadPhoto(blob);
+  }, 'image/jpeg', 0.95);
+}
 
-  $('#id_data').val(imgString);
+function uploadPhoto(blob) {
+  // the token goes in a header and before the file, a rejected upload stops reading the body at the file
+  let token = $('#takePhotoModal input[name=csrfmiddlewaretoken]').val();
+  let data = new FormData();
+  data.append('csrfmiddlewaretoken', token);
+  data.append('file', blob, 'webcam.jpg');
+
+  $('#id_token').val('');
+  $('#photoUploadError').hide().empty();
+  $.ajax({
+    url: $('.webcam-body').data('upload-url'),
+    type: 'POST',
+    headers: {'X-CSRFToken': token},
+    data: data,
+    processData: false,
+    contentType: false
+  }).done(function(response) {
+    $('#id_token').val(response.token);
+    $('#btnPhotoSubmit').attr('disabled', false);
+  }).fail(function(response) {
+    let errors = (response.responseJSON && response.responseJSON.errors) || ['No se pudo subir la foto, intenta de nuevo.'];
+    $('#photoUploadError').text(errors.join(' ')).show();
+    $('#btnPhotoSubmit').attr('disabled', true);
+  });
 }
 
 function handleSuccess(stream) {
@@ -89,6 +117,7 @@ function initModal() {
     $('#videoPreview').hide();
     $('#photoPreview').hide();
     $('#cameraError').hide();
+    $('#photoUploadError').hide();
 
     // default button
     $('#btnTakePhoto')
@@ -113,14 +142,12 @@ window.onload = function() {
       } else if (status === 'videoPreview') {
           takePhoto();
           stopVideoPreview();
-          enableCropper();
 
           $('#videoPreview').hide();
           $('#photoPreview').show();
           $('#btnTakePhoto')
               .html('<i class="fa fa-undo"></i>Volver a tomar')
               .attr('class', 'btn btn-outline-secondary mt-2');
-          $('#btnPhotoSubmit').attr('disabled', false);
 
           status = 'initial';
       }
@@ -1,13 +1,24 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
 # Register your models here.
 from student_card.models import CardInfo
 
 
 class CardInfoAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'photo', 'emergency_contact_name', 'emergency_phone_number', 'organ_donor', 'created_at')
-    list_filter = ('organ_donor',)
+    list_display = ('id', 'user', 'get_thumbnail', 'photo', 'photo_status', 'photo_processing_ms',
+                    'emergency_contact_name', 'emergency_phone_number', 'organ_donor', 'created_at')
+    list_filter = ('organ_donor', 'photo_status')
     search_fields = ('id',)
+    list_select_related = ('user',)
+
+    def get_thumbnail(self, obj):
+        if not obj.thumbnail:
+            return '-'
+
+        return format_html('<img src="{}" alt="{}">', obj.thumbnail.url, obj.user)
+
+    get_thumbnail.short_description = 'Thumbnail'
 
 
 admin.site.register(CardInfo, CardInfoAdmin)
@@ -1,12 +1,8 @@
-import base64
-import io
-import re
-
-from PIL import Image
 from django import forms
 from django.core.validators import RegexValidator
 
 from student_card.models import CardInfo
+from student_card.services import get_temporary_upload, queue_photo_crop
 
 
 class CardInfoForm(forms.ModelForm):
@@ -42,32 +38,33 @@ class StudentCardEmergencyForm(forms.Form):
 
 
 class PhotoCropForm(forms.Form):
+    """
+    Crops a photo uploaded before, the photo is referenced by the token of its temporary upload
+    """
     x = forms.FloatField(widget=forms.HiddenInput())
     y = forms.FloatField(widget=forms.HiddenInput())
-    width = forms.FloatField(widget=forms.HiddenInput())
-    height = forms.FloatField(widget=forms.HiddenInput())
-    data = forms.CharField(widget=forms.HiddenInput())
+    width = forms.FloatField(widget=forms.HiddenInput(), min_value=1)
+    height = forms.FloatField(widget=forms.HiddenInput(), min_value=1)
+    token = forms.CharField(widget=forms.HiddenInput(), max_length=64)
 
-    def save(self, user):
-        card_info = CardInfo.objects.get_or_create(user=user)[0]
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
 
+    def clean_token(self):
+        token = self.cleaned_data.get('token')
+        self.upload = get_temporary_upload(self.user, token) if self.user else None
+        if self.upload is None:
+            raise forms.ValidationError('La foto expiró, vuelve a subirla.')
+        return token
+
+    def save(self, user):
         x = self.cleaned_data.get('x')
         y = self.cleaned_data.get('y')
         w = self.cleaned_data.get('width')
         h = self.cleaned_data.get('height')
-        data = self.cleaned_data.get('data')
-
-        image_data = re.sub('^data:image/.+;base64,', '', data)
-        image = Image.open(io.BytesIO(base64.b64decode(image_data)))
-        cropped_image = image.crop((x, y, w + x, h + y))
-        resized_image = cropped_image.resize((200, 300), Image.ANTIALIAS)
-        blob = io.BytesIO()
-        resized_image.save(blob, 'JPEG')
-        card_info.photo.save(str(user.username) + '.jpg', blob)
-        card_info.save()
-        blob.close()
 
-        return card_info
+        return queue_photo_crop(self.upload, (x, y, w, h))
 
 
 class PhotoUploadForm(forms.Form):
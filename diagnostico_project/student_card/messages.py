@@ -3,6 +3,11 @@ def get_photo_upload_success_message():
     return 'Se actualizó la foto correctamente'
 
 
+def get_photo_processing_message():
+    """Photo sent to be processed"""
+    return 'Se está procesando la foto, aparecerá en unos segundos'
+
+
 def get_photo_upload_failure_message():
     """Photo upload failure"""
     return 'Hubo un error al actualizar la foto'
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import student_card.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('student_card', '0006_auto_20190514_0844'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemporaryUpload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disabled', models.BooleanField(default=False)),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(max_length=255, upload_to=student_card.models.get_temporary_upload_path)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:42
+
+from django.db import migrations, models
+import student_card.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_card', '0007_temporaryupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardinfo',
+            name='photo_processing_ms',
+            field=models.PositiveIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='cardinfo',
+            name='photo_status',
+            field=models.CharField(choices=[('processing', 'Procesando'), ('ready', 'Lista'), ('failed', 'Error')], default='ready', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='cardinfo',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to=student_card.models.get_thumbnail_upload_path),
+        ),
+        migrations.AddField(
+            model_name='temporaryupload',
+            name='crop',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:47
+
+from django.db import migrations, models
+import student_card.models
+import utils.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_card', '0008_auto_20261018_0642'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cardinfo',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=utils.storage.ContentAddressedStorage(), upload_to=student_card.models.get_upload_path),
+        ),
+    ]
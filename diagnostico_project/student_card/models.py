@@ -1,15 +1,35 @@
+import json
 import os
+import uuid
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from utils.storage import content_addressed_storage
+
 
 def get_upload_path(instance, filename):
     """Returns the upload path for this app"""
     return os.path.join('files', '{}'.format(instance.user.username), 'foto', filename)
 
 
+def get_thumbnail_upload_path(instance, filename):
+    """Returns the upload path of the photo thumbnails"""
+    return os.path.join('files', '{}'.format(instance.user.username), 'foto', 'miniatura', filename)
+
+
+def get_temporary_upload_path(instance, filename):
+    """Returns the upload path of the photos waiting to be cropped, the random folder keeps them from being guessed"""
+    return os.path.join('tmp', uuid.uuid4().hex, filename)
+
+
+# photo status:
+PHOTO_PROCESSING = 'processing'
+PHOTO_READY = 'ready'
+PHOTO_FAILED = 'failed'
+
+
 def validate_file_type(value):
     """Check if the file to upload is a pdf or a jpeg"""
     if not value.name.endswith('.jpg') and not value.name.endswith('.jpeg'):
@@ -47,7 +67,16 @@ class CardInfo(StudentCardBaseModel):
     Card Info.
     """
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
-    photo = models.ImageField(blank=True, null=True, upload_to=get_upload_path)
+    PHOTO_STATUS_CHOICES = (
+        (PHOTO_PROCESSING, 'Procesando'),
+        (PHOTO_READY, 'Lista'),
+        (PHOTO_FAILED, 'Error'),
+    )
+
+    photo = models.ImageField(blank=True, null=True, upload_to=get_upload_path, storage=content_addressed_storage)
+    thumbnail = models.ImageField(blank=True, null=True, upload_to=get_thumbnail_upload_path)
+    photo_status = models.CharField(max_length=20, choices=PHOTO_STATUS_CHOICES, default=PHOTO_READY)
+    photo_processing_ms = models.PositiveIntegerField(null=True, blank=True, default=None)
     emergency_contact_name = models.CharField(blank=True, null=True, max_length=255)
     emergency_phone_number = models.CharField(blank=True, null=True, max_length=255)
     organ_donor = models.BooleanField(blank=True, null=True, default=False)
@@ -58,3 +87,22 @@ class CardInfo(StudentCardBaseModel):
 
     class Meta:
         verbose_name_plural = 'Card info'
+
+
+class TemporaryUpload(StudentCardBaseModel):
+    """
+    Temporary Upload. A photo uploaded to be cropped, the crop form only sends its token and the crop rectangle, which
+    is kept here until the worker crops the photo. It's deleted once the photo is cropped or when it expires.
+    """
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    token = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=get_temporary_upload_path, max_length=255)
+    expires_at = models.DateTimeField(db_index=True)
+    crop = models.CharField(max_length=255, default='', blank=True)
+
+    def get_crop(self):
+        """Returns the crop rectangle as (x, y, width, height), None if it wasn't sent yet"""
+        return tuple(json.loads(self.crop)) if self.crop else None
+
+    def __str__(self):
+        return '{}'.format(self.token)
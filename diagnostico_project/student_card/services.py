@@ -0,0 +1,146 @@
+import json
+import logging
+import secrets
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from student_card.models import CardInfo, TemporaryUpload, PHOTO_PROCESSING, PHOTO_READY, PHOTO_FAILED
+from utils.images import crop_image, to_jpeg
+
+logger = logging.getLogger(__name__)
+
+# size of the photo of the student card and of its thumbnail in the admin
+PHOTO_SIZE = (200, 300)
+THUMBNAIL_SIZE = (40, 60)
+
+
+def delete_temporary_uploads(queryset):
+    """
+    Deletes some temporary uploads along with their files
+    :param queryset: TemporaryUpload queryset
+    :return: number of uploads deleted
+    """
+    count = 0
+    for upload in queryset:
+        upload.file.delete(save=False)
+        upload.delete()
+        count += 1
+    return count
+
+
+def delete_expired_uploads():
+    """
+    Deletes the temporary uploads that expired. The photos that were waiting for the worker are marked as failed.
+    :return: number of uploads deleted
+    """
+    expired = TemporaryUpload.objects.filter(expires_at__lte=timezone.now())
+    user_ids = list(expired.exclude(crop='').values_list('user_id', flat=True))
+    count = delete_temporary_uploads(expired)
+    if user_ids:
+        mark_photos_failed(user_ids)
+    return count
+
+
+def mark_photos_failed(user_ids):
+    """
+    Marks as failed the photos of the users that are still being processed but have no upload left for the worker,
+    because it expired or was deleted before the worker got to it
+    :param user_ids: ids of the users
+    :return: number of cards updated
+    """
+    queued = TemporaryUpload.objects.filter(user_id__in=user_ids, expires_at__gt=timezone.now()).exclude(crop='')
+    return CardInfo.objects.filter(user_id__in=user_ids, photo_status=PHOTO_PROCESSING) \
+        .exclude(user_id__in=queued.values('user_id')) \
+        .update(photo_status=PHOTO_FAILED, updated_at=timezone.now())
+
+
+def create_temporary_upload(user, file):
+    """
+    Stores a photo as it was uploaded until it's cropped. The previous uploads of the user that weren't sent to the
+    worker and the expired ones are deleted, and the new one is deleted by the worker once it expires.
+    :param user: user instance
+    :param file: the uploaded file
+    :return: the created TemporaryUpload
+    """
+    from student_card.tasks import expire_temporary_uploads  # the tasks module imports this one
+
+    delete_temporary_uploads(TemporaryUpload.objects.filter(user=user, crop=''))
+    delete_expired_uploads()
+
+    upload = TemporaryUpload(user=user, token=secrets.token_urlsafe(32),
+                             expires_at=timezone.now() + timezone.timedelta(seconds=settings.STUDENT_CARD_UPLOAD_TTL))
+    upload.file.save(file.name, file, save=False)
+    upload.save()
+
+    transaction.on_commit(lambda: expire_temporary_uploads.apply_async(countdown=settings.STUDENT_CARD_UPLOAD_TTL))
+    return upload
+
+
+def get_temporary_upload(user, token):
+    """
+    Returns the temporary upload of a user with the given token, if it hasn't expired
+    :param user: user instance
+    :param token: the token of the upload
+    :return: TemporaryUpload or None
+    """
+    return TemporaryUpload.objects.filter(user=user, token=token, expires_at__gt=timezone.now()).first()
+
+
+def queue_photo_crop(upload, box):
+    """
+    Sends a temporary upload to the worker to be cropped into the photo of the user's student card, which shows that
+    it's being processed meanwhile
+    :param upload: TemporaryUpload
+    :param box: (x, y, width, height) of the crop
+    :return: the CardInfo
+    """
+    from student_card.tasks import process_photo  # the tasks module imports this one
+
+    upload.crop = json.dumps(box)
+    # it has to wait for the worker, even if it was about to expire
+    upload.expires_at = timezone.now() + timezone.timedelta(seconds=settings.STUDENT_CARD_UPLOAD_TTL)
+    upload.save(update_fields=['crop', 'expires_at', 'updated_at'])
+
+    card_info = CardInfo.objects.get_or_create(user=upload.user)[0]
+    card_info.photo_status = PHOTO_PROCESSING
+    card_info.save(update_fields=['photo_status', 'updated_at'])
+
+    transaction.on_commit(lambda: process_photo.delay(upload.id, upload.user_id))
+    return card_info
+
+
+def process_temporary_upload(upload):
+    """
+    Crops a temporary upload into the photo of the user's student card and its thumbnail, records how long it took and
+    deletes the upload
+    :param upload: TemporaryUpload with its crop
+    :return: the updated CardInfo
+    """
+    card_info = CardInfo.objects.get_or_create(user=upload.user)[0]
+    start = time.perf_counter()
+
+    try:
+        with upload.file.open('rb') as file:
+            image = crop_image(file, upload.get_crop(), PHOTO_SIZE)
+
+        photo = to_jpeg(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        thumbnail = to_jpeg(image)
+    except Exception:
+        logger.exception('Could not process the photo of %s', upload.user)
+        card_info.photo_status = PHOTO_FAILED
+        card_info.save(update_fields=['photo_status', 'updated_at'])
+        delete_temporary_uploads([upload])
+        return card_info
+
+    card_info.photo.save(str(upload.user.username) + '.jpg', photo, save=False)
+    card_info.thumbnail.save(str(upload.user.username) + '.jpg', thumbnail, save=False)
+    card_info.photo_status = PHOTO_READY
+    card_info.photo_processing_ms = int((time.perf_counter() - start) * 1000)
+    card_info.save()
+
+    delete_temporary_uploads([upload])
+    return card_info
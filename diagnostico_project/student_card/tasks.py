@@ -0,0 +1,21 @@
+from celery import shared_task
+from django.utils import timezone
+
+from student_card.models import TemporaryUpload
+from student_card.services import delete_expired_uploads, process_temporary_upload, mark_photos_failed
+
+
+@shared_task
+def expire_temporary_uploads():
+    """Deletes the temporary uploads that expired"""
+    return delete_expired_uploads()
+
+
+@shared_task
+def process_photo(upload_id, user_id=None):
+    """Crops a photo the user sent to the student card, the photo fails if its upload is gone or expired"""
+    upload = TemporaryUpload.objects.filter(pk=upload_id, expires_at__gt=timezone.now()).exclude(crop='').first()
+    if upload:
+        process_temporary_upload(upload)
+    elif user_id:
+        mark_photos_failed([user_id])
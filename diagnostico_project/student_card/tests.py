@@ -1,3 +1,184 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from student_card.models import CardInfo, TemporaryUpload, PHOTO_PROCESSING, PHOTO_READY, PHOTO_FAILED
+from student_card.services import delete_expired_uploads, process_temporary_upload, THUMBNAIL_SIZE
+from student_card.tasks import process_photo
+from utils.images import crop_image
+
+
+def get_photo(name='foto.jpg', size=(400, 600)):
+    blob = io.BytesIO()
+    Image.new('RGB', size, 'white').save(blob, 'JPEG')
+    return SimpleUploadedFile(name, blob.getvalue(), content_type='image/jpeg')
+
+
+class StudentCardPhotoTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='candidate', password='secret')
+        self.client.login(username='candidate', password='secret')
+
+    def tearDown(self):
+        for upload in TemporaryUpload.objects.all():
+            upload.file.delete(save=False)
+        for card_info in CardInfo.objects.exclude(photo=''):
+            card_info.photo.delete(save=False)
+            card_info.thumbnail.delete(save=False)
+
+    def test_crop_by_reference(self):
+        response = self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        upload = TemporaryUpload.objects.get(user=self.user)
+
+        # the page references the photo instead of embedding it
+        self.assertEquals(response.context['image_url'], reverse('student_card:photo', args=[upload.token]))
+        self.assertNotContains(response, 'base64')
+        response = self.client.get(response.context['image_url'])
+        self.assertEquals(b''.join(response.streaming_content)[:2], b'\xff\xd8')
+
+        response = self.client.post(reverse('student_card:upload'), {
+            'x': 10, 'y': 20, 'width': 200, 'height': 300, 'token': upload.token})
+        self.assertEquals(response.status_code, 302)
+
+        # the crop is left to the worker, the page shows that it's being processed
+        card_info = CardInfo.objects.get(user=self.user)
+        self.assertEquals(card_info.photo_status, PHOTO_PROCESSING)
+        self.assertFalse(card_info.photo)
+        self.assertEquals(self.client.get(reverse('student_card:photo_status')).json(), {'status': PHOTO_PROCESSING})
+
+        process_photo(upload.id)
+        card_info.refresh_from_db()
+        self.assertEquals(card_info.photo_status, PHOTO_READY)
+        self.assertIsNotNone(card_info.photo_processing_ms)
+        with card_info.photo.open('rb') as file:
+            self.assertEquals(Image.open(file).size, (200, 300))
+        with card_info.thumbnail.open('rb') as file:
+            self.assertEquals(Image.open(file).size, THUMBNAIL_SIZE)
+
+        # the temporary upload is deleted once it's cropped
+        self.assertFalse(TemporaryUpload.objects.exists())
+        self.assertFalse(default_storage.exists(upload.file.name))
+
+    def test_webcam_upload(self):
+        response = self.client.post(reverse('student_card:photo_upload'), {'file': get_photo('webcam.jpg')})
+        upload = TemporaryUpload.objects.get(user=self.user)
+        self.assertEquals(response.json()['token'], upload.token)
+
+        response = self.client.post(reverse('student_card:photo_upload'), {
+            'file': SimpleUploadedFile('webcam.jpg', b'not an image')})
+        self.assertEquals(response.status_code, 400)
+
+    def test_rejected_webcam_upload_passes_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='candidate', password='secret')
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+
+        # the upload is stopped at the file, the token the page sends in the header is still checked
+        response = client.post(reverse('student_card:photo_upload'), {'file': SimpleUploadedFile('webcam.png', b'png')},
+                               HTTP_X_CSRFTOKEN='a' * 32)
+        self.assertEquals(response.status_code, 400)
+        self.assertTrue(response.json()['errors'])
+
+    def test_other_users_token(self):
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        upload = TemporaryUpload.objects.get(user=self.user)
+
+        get_user_model().objects.create_user(username='other', password='secret')
+        self.client.login(username='other', password='secret')
+        self.assertEquals(self.client.get(reverse('student_card:photo', args=[upload.token])).status_code, 404)
+        self.client.post(reverse('student_card:upload'), {
+            'x': 0, 'y': 0, 'width': 200, 'height': 300, 'token': upload.token})
+        self.assertFalse(CardInfo.objects.filter(photo__isnull=False).exclude(photo='').exists())
+
+    def test_expired_uploads(self):
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        upload = TemporaryUpload.objects.get(user=self.user)
+        TemporaryUpload.objects.update(expires_at=timezone.now())
+
+        # an expired photo can't be cropped
+        self.client.post(reverse('student_card:upload'), {
+            'x': 0, 'y': 0, 'width': 200, 'height': 300, 'token': upload.token})
+        self.assertFalse(CardInfo.objects.exclude(photo='').exists())
+
+        self.assertEquals(delete_expired_uploads(), 1)
+        self.assertFalse(default_storage.exists(upload.file.name))
+
+    def test_new_upload_replaces_the_previous(self):
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        first = TemporaryUpload.objects.get(user=self.user)
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+
+        self.assertEquals(TemporaryUpload.objects.count(), 1)
+        self.assertFalse(default_storage.exists(first.file.name))
+
+    def test_new_upload_keeps_the_queued_one(self):
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        queued = TemporaryUpload.objects.get(user=self.user)
+        self.client.post(reverse('student_card:upload'), {
+            'x': 0, 'y': 0, 'width': 200, 'height': 300, 'token': queued.token})
+
+        # the worker still has to crop the first one
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        self.assertEquals(TemporaryUpload.objects.count(), 2)
+        self.assertTrue(default_storage.exists(queued.file.name))
+
+        process_photo(queued.id, self.user.id)
+        self.assertEquals(CardInfo.objects.get(user=self.user).photo_status, PHOTO_READY)
+
+    def test_lost_upload_fails_the_photo(self):
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        upload = TemporaryUpload.objects.get(user=self.user)
+        self.client.post(reverse('student_card:upload'), {
+            'x': 0, 'y': 0, 'width': 200, 'height': 300, 'token': upload.token})
+        self.assertEquals(CardInfo.objects.get(user=self.user).photo_status, PHOTO_PROCESSING)
+
+        # the worker gets to it after it expired
+        TemporaryUpload.objects.update(expires_at=timezone.now())
+        process_photo(upload.id, self.user.id)
+        self.assertEquals(CardInfo.objects.get(user=self.user).photo_status, PHOTO_FAILED)
+
+        # or it expires before the worker gets to it
+        CardInfo.objects.update(photo_status=PHOTO_PROCESSING)
+        self.assertEquals(delete_expired_uploads(), 1)
+        self.assertEquals(CardInfo.objects.get(user=self.user).photo_status, PHOTO_FAILED)
+
+        # or it's gone
+        CardInfo.objects.update(photo_status=PHOTO_PROCESSING)
+        process_photo(upload.id, self.user.id)
+        self.assertEquals(CardInfo.objects.get(user=self.user).photo_status, PHOTO_FAILED)
+
+    def test_failed_processing(self):
+        self.client.post(reverse('student_card:crop'), {'file': get_photo()})
+        upload = TemporaryUpload.objects.get(user=self.user)
+        self.client.post(reverse('student_card:upload'), {
+            'x': 0, 'y': 0, 'width': 200, 'height': 300, 'token': upload.token})
+
+        upload.refresh_from_db()
+        with default_storage.open(upload.file.name, 'wb') as file:
+            file.write(b'not an image anymore')
+        card_info = process_temporary_upload(upload)
+
+        self.assertEquals(card_info.photo_status, PHOTO_FAILED)
+        self.assertFalse(TemporaryUpload.objects.exists())
+
+    def test_crop_big_photo(self):
+        # a jpeg much bigger than the result is decoded at a smaller scale, the crop covers the same region
+        blob = io.BytesIO()
+        image = Image.new('RGB', (4000, 6000), 'white')
+        image.paste((255, 0, 0), (0, 0, 2000, 6000))
+        image.save(blob, 'JPEG')
+        blob.seek(0)
+
+        cropped = crop_image(blob, (1000, 0, 2000, 3000), (200, 300))
+        self.assertEquals(cropped.size, (200, 300))
+        red, green, _ = cropped.getpixel((10, 150))
+        self.assertGreater(red, 200)
+        self.assertLess(green, 50)
+        self.assertGreater(cropped.getpixel((190, 150))[1], 200)
@@ -1,6 +1,7 @@
 from django.urls import path
 
-from student_card.views import StudentCardHomeView, StudentCardUploadView, StudentInfoUpdateView, StudentCardCropView
+from student_card.views import StudentCardHomeView, StudentCardUploadView, StudentInfoUpdateView, StudentCardCropView, \
+    StudentCardPhotoView, StudentCardPhotoStatusView
 
 app_name = 'student_card'
 urlpatterns = [
@@ -8,4 +9,7 @@ urlpatterns = [
     path('upload', StudentCardUploadView.as_view(), name='upload'),
     path('update', StudentInfoUpdateView.as_view(), name='update'),
     path('crop', StudentCardCropView.as_view(), name='crop'),
+    path('photo', StudentCardPhotoView.as_view(), name='photo_upload'),
+    path('photo/status', StudentCardPhotoStatusView.as_view(), name='photo_status'),
+    path('photo/<str:token>', StudentCardPhotoView.as_view(), name='photo'),
 ]
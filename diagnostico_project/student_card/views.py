@@ -1,13 +1,40 @@
+import os
+
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.views.generic.base import View
 
 from student_card.forms import CardInfoForm, StudentCardEmergencyForm, PhotoCropForm, PhotoUploadForm
 from student_card.models import CardInfo
-from student_card.messages import get_photo_upload_failure_message, get_photo_upload_success_message, \
+from student_card.messages import get_photo_upload_failure_message, get_photo_processing_message, \
     get_info_updated_message
-from utils.images import convert_to_base64
+from student_card.services import create_temporary_upload, get_temporary_upload
+from utils.images import is_image
+from utils.uploads import get_upload_errors
+
+
+def validate_photo(request):
+    """Returns the errors of the photo uploaded in a request, a rejected upload has the error of its handler"""
+    file = request.FILES.get('file')
+    if 'file' in get_upload_errors(request):
+        return [get_upload_errors(request)['file']]
+    if not file:
+        return ['Selecciona una imagen.']
+
+    errors = []
+    if not file.name.lower().endswith('.jpg') and not file.name.lower().endswith('.jpeg'):
+        errors.append('El archivo debe ser una imagen jpeg.')
+
+    if len(file) > (2 * 1024 * 1024):
+        errors.append('El archivo debe ocupar menos de 2Mb')
+
+    if not errors and not is_image(file):
+        errors.append('Sucedió un error desconocido al leer la imagen.')
+
+    return errors
 
 
 class StudentCardHomeView(LoginRequiredMixin, View):
@@ -30,12 +57,12 @@ class StudentCardUploadView(LoginRequiredMixin, View):
         return redirect('student_card:home')
 
     def post(self, request, *args, **kwargs):
-        form = PhotoCropForm(request.POST)
+        form = PhotoCropForm(request.POST, user=request.user)
         if form.is_valid():
             form.save(request.user)
-            messages.success(request, get_photo_upload_success_message())
+            messages.success(request, get_photo_processing_message())
         else:
-            messages.error(request, get_photo_upload_failure_message())
+            messages.error(request, form.errors.get('token', [get_photo_upload_failure_message()])[0])
 
         return redirect('student_card:home')
 
@@ -45,30 +72,50 @@ class StudentCardCropView(LoginRequiredMixin, View):
         return redirect('student_card:home')
 
     def post(self, request, *args, **kwargs):
-        errors = False
-        file = request.FILES['file']
+        file = request.FILES.get('file')
+        errors = validate_photo(request)
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            return redirect('student_card:home')
+
+        # the photo is kept as it was uploaded, the crop form only sends back its token
+        upload = create_temporary_upload(request.user, file)
+        return render(request, 'student_card_crop.html', {
+            'image_url': reverse('student_card:photo', args=[upload.token]),
+            'photo_crop_form': PhotoCropForm(initial={'token': upload.token})
+        })
+
 
-        if not file.name.endswith('.jpg') and not file.name.endswith('.jpeg'):
-            messages.error(request, 'El archivo debe ser una imagen jpeg.')
-            errors = True
+class StudentCardPhotoView(LoginRequiredMixin, View):
+    """
+    Temporary photos. The webcam uploads the photo it took here and gets its token, and the crop pages load the photo
+    from here.
+    """
+    def get(self, request, token=None, *args, **kwargs):
+        upload = get_temporary_upload(request.user, token) if token else None
+        if upload is None:
+            raise Http404
 
-        if len(file) > (2 * 1024 * 1024):
-            messages.error(request, 'El archivo debe ocupar menos de 2Mb')
-            errors = True
+        return FileResponse(upload.file.open('rb'), filename=os.path.basename(upload.file.name))
 
+    def post(self, request, *args, **kwargs):
+        file = request.FILES.get('file')
+        errors = validate_photo(request)
         if errors:
-            return redirect('student_card:home')
+            return JsonResponse({'errors': errors}, status=400)
 
-        try:
-            image_data = convert_to_base64(request.FILES['file'])
-        except Exception:
-            messages.error(request, 'Sucedió un error desconocido al leer la imagen.')
-            return redirect('student_card:home')
+        upload = create_temporary_upload(request.user, file)
+        return JsonResponse({'token': upload.token, 'url': reverse('student_card:photo', args=[upload.token])})
 
-        return render(request, 'student_card_crop.html', {
-            'image_data': image_data,
-            'photo_crop_form': PhotoCropForm(initial={'data': image_data})
-        })
+
+class StudentCardPhotoStatusView(LoginRequiredMixin, View):
+    """
+    Photo status. The home page asks for it while the photo is being processed.
+    """
+    def get(self, request, *args, **kwargs):
+        card_info = CardInfo.objects.filter(user=request.user).last()
+        return JsonResponse({'status': card_info.photo_status if card_info else None})
 
 
 class StudentInfoUpdateView(LoginRequiredMixin, View):
@@ -1,9 +1,10 @@
 from django import forms
 
 from support.models import Comment, Ticket
+from utils.uploads import UploadErrorsFormMixin
 
 
-class CommentForm(forms.ModelForm):
+class CommentForm(UploadErrorsFormMixin, forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text', 'file')
@@ -20,7 +21,7 @@ class CommentForm(forms.ModelForm):
         }
 
 
-class TicketForm(forms.ModelForm):
+class TicketForm(UploadErrorsFormMixin, forms.ModelForm):
     class Meta:
         model = Ticket
         fields = ('title', 'task', 'description', 'file')
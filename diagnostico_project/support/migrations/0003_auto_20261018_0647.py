@@ -0,0 +1,25 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:47
+
+from django.db import migrations, models
+import support.models
+import utils.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0002_auto_20190430_1044'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='file',
+            field=models.FileField(blank=True, storage=utils.storage.ContentAddressedStorage(), upload_to=support.models.get_upload_path, validators=[support.models.validate_file_type]),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='file',
+            field=models.FileField(blank=True, storage=utils.storage.ContentAddressedStorage(), upload_to=support.models.get_upload_path, validators=[support.models.validate_file_type]),
+        ),
+    ]
@@ -7,6 +7,7 @@ from django.urls import reverse
 
 # constants:
 from support.managers import SupportBaseManager
+from utils.storage import content_addressed_storage
 
 PENDING = 'pending'
 WORKING = 'working'
@@ -67,7 +68,8 @@ class Ticket(SupportBaseModel):
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
     title = models.CharField(default='', null=False, blank=False, max_length=255)
     description = models.TextField(default='', blank=False)
-    file = models.FileField(upload_to=get_upload_path, validators=[validate_file_type], blank=True)
+    file = models.FileField(upload_to=get_upload_path, validators=[validate_file_type], blank=True,
+                            storage=content_addressed_storage)
     status = models.CharField(default=PENDING, choices=STATUS_CHOICES, blank=False, null=False, max_length=20)
 
     def __str__(self):
@@ -88,7 +90,8 @@ class Comment(SupportBaseModel):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='comments')
     text = models.TextField(default='', blank=False)
-    file = models.FileField(upload_to=get_upload_path, validators=[validate_file_type], blank=True)
+    file = models.FileField(upload_to=get_upload_path, validators=[validate_file_type], blank=True,
+                            storage=content_addressed_storage)
 
     def __str__(self):
         return '({}) {}: {}'.format(self.ticket.id, self.user, self.text[:50])
@@ -14,6 +14,7 @@ from support.messages import get_comment_success_message, get_send_email_success
 from support.models import Ticket
 from support.models import SOLVED, WORKING, PENDING
 from support.services import get_exam_results, action_reset_exam
+from utils.uploads import get_upload_errors
 
 
 def get_ticket_detail(pk):
@@ -67,6 +68,13 @@ class SupportTicketCreateView(LoginRequiredMixin, CreateView):
         send_new_ticket_posted(self.object)  # sends an email each time a ticket is created
         return super().get_success_url()
 
+    def get_form_kwargs(self):
+        """Passes the errors of a rejected file to the form"""
+        kwargs = super().get_form_kwargs()
+        if self.request.method == 'POST':
+            kwargs['upload_errors'] = get_upload_errors(self.request)
+        return kwargs
+
     def form_valid(self, form):
         """Form valid"""
         form.instance.user = self.request.user  # attaches the user to the form
@@ -105,7 +113,7 @@ class PostCommentActionView(LoginRequiredMixin, View):
 
         # check if the user can post a comment
         if ticket.status != SOLVED:
-            comment_form = CommentForm(request.POST, request.FILES)
+            comment_form = CommentForm(request.POST, request.FILES, upload_errors=get_upload_errors(request))
 
             # validate the form
             if comment_form.is_valid():
@@ -121,6 +129,8 @@ class PostCommentActionView(LoginRequiredMixin, View):
                     messages.info(request, get_send_email_success_message(ticket.user))
             else:
                 messages.error(request, get_comment_error_message())
+                if 'file' in comment_form.errors:
+                    messages.error(request, comment_form.errors['file'][0])
                 # for e in comment_form.errors:
                 #    messages.error(request, comment_form.errors[e])
 
@@ -1,70 +1,35 @@
-import csv
-import io
-import os
-import logging
-import glob
-from datetime import datetime
-
-from zipfile import ZipFile
-
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.forms import forms
-from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import path
 
-from documents.models import Category
-from exam.models import Result
-from users.email import send_welcome_email
+from exam.models import Result, ANSWERING, TIME_UP, FINISHED
+from jobs.admin import job_enqueued_message
+from jobs.models import GENERAL_REPORT, CANDIDATE_FILES, CANDIDATE_IMPORT, CANDIDATE_CREDENTIALS
+from jobs.services import enqueue_job, enqueue_file_job
 from users.forms import CandidateCreationForm, CandidateChangeForm
+from users.imports import import_candidates
 from users.models import Candidate
-from utils.services import documentation_is_finished, student_card_is_finished
+from users.reports import exam_status_label, status_label
+from utils.services import annotate_candidate_status, annotate_exam_status, annotate_documented_categories, \
+    annotate_student_card_finished
 
 
 class CsvImportForm(forms.Form):
     csv_file = forms.FileField()
 
 
-def zipdir(path, ziph):
-    # ziph is zipfile handle
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            ziph.write(os.path.join(root, file))
-
-
-def register_user_from_row(row):
-    user, created = Candidate.objects.get_or_create(username=row['cve_ni'])
-    if created:
-        user.email = row['email']
-        user.nombre = row['nombre']
-        user.apellido_paterno = row['apell_pat']
-        user.apellido_materno = row['apell_mat']
-
-        nacimiento = row['fechaNac'].split('/')
-        user.nacimiento = '{}-{}-{}'.format(nacimiento[2], nacimiento[1], nacimiento[0])
-
-        user.telefono = row['telefono']
-        user.celular = row['celular']
-        user.sexo = row['sexo']
-        user.sangre = row['tip_san']
-        user.curp = row['curp']
-        user.nss = row['NSS']
-        user.edo_civil = row['edoCivil']
-        user.nacionalidad = row['nacionalidad']
-
-        user.periodo = row['per_esc']
-        user.unidad = row['cve_ua']
-        user.folio = row['folio']
-        user.siglas = row['siglas']
-        user.save()
+def annotate_once(queryset, annotation, annotate):
+    """Annotates the queryset unless the annotation is already there (the changelist may have added it)"""
+    if annotation in queryset.query.annotations:
+        return queryset
 
-    # skip if the user is already created
-    return 0
+    return annotate(queryset)
 
 
 class ExamStatusFilter(admin.SimpleListFilter):
-    """Filters the Result Status"""
+    """Filters the status of the latest result"""
     title = 'examen'
     parameter_name = 'examen'
 
@@ -78,21 +43,24 @@ class ExamStatusFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
+        if value is None:
+            return queryset
 
+        queryset = annotate_once(queryset, 'exam_status', annotate_exam_status)
         if value == 'Terminado':
-            return queryset.filter(result__status=2, result__disabled=False)
+            return queryset.filter(exam_status=FINISHED)
         elif value == 'Fuera de tiempo':
-            return queryset.filter(result__status=1, result__disabled=False)
+            return queryset.filter(exam_status=TIME_UP)
         elif value == 'Contestando':
-            return queryset.filter(result__status=0, result__disabled=False)
+            return queryset.filter(exam_status=ANSWERING)
         elif value == 'Sin contestar':
-            return queryset.exclude(result__isnull=False, result__disabled=False)
+            return queryset.filter(exam_status__isnull=True)
 
         return queryset
 
 
 class DocumentsStatusFilter(admin.SimpleListFilter):
-    """Filters the Document Status"""
+    """Filters the candidates with a document in every category"""
     title = 'documentacion'
     parameter_name = 'documentacion'
 
@@ -104,22 +72,20 @@ class DocumentsStatusFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
-        categories = Category.objects.all()
+        if value is None:
+            return queryset
 
-        done_queryset = queryset
-        for category in categories:
-            done_queryset = queryset.filter(document__category_id=category.id,
-                                            document__disabled=False)
+        queryset = annotate_once(queryset, 'documentation_finished', annotate_documented_categories)
         if value == 'Pendiente':
-            return queryset.difference(done_queryset)
+            return queryset.filter(documentation_finished=False)
         elif value == 'Terminado':
-            return done_queryset
+            return queryset.filter(documentation_finished=True)
 
         return queryset
 
 
 class StudentCardStatusFilter(admin.SimpleListFilter):
-    """Filters the Student Card Status"""
+    """Filters the candidates with a complete student card"""
     title = 'credencial'
     parameter_name = 'credencial'
 
@@ -131,15 +97,14 @@ class StudentCardStatusFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         value = self.value()
-        done_queryset = queryset
-        for candidate in queryset:
-            if not student_card_is_finished(candidate):
-                done_queryset = done_queryset.exclude(id=candidate.id)
+        if value is None:
+            return queryset
 
+        queryset = annotate_once(queryset, 'student_card_finished', annotate_student_card_finished)
         if value == 'Pendiente':
-            return queryset.difference(done_queryset)
+            return queryset.filter(student_card_finished=False)
         elif value == 'Terminado':
-            return done_queryset
+            return queryset.filter(student_card_finished=True)
 
         return queryset
 
@@ -169,29 +134,15 @@ class CandidateAdmin(UserAdmin):
     actions = ['send_registration_email', 'download_candidate_files', 'reset_candidate_exam', 'generate_general_report']
 
     def send_registration_email(self, request, queryset):
-        for candidate in queryset:
-            password = Candidate.objects.make_random_password()
-            candidate.set_password(password)
-            candidate.email_sent = True
-            candidate.save()
-            send_welcome_email(candidate.email, candidate.nombre, candidate.username, password)
-
-        self.message_user(request, 'Se enviaron {} correos'.format(len(queryset)))
+        # the passwords are hashed and mailed in batches by the worker, the job records the candidates done
+        job = enqueue_job(CANDIDATE_CREDENTIALS, queryset, request.user)
+        self.message_user(request, job_enqueued_message(job))
         return redirect('.')
 
     def download_candidate_files(self, request, queryset):
-        response = HttpResponse(content_type='application/zip')
-        zip_file = ZipFile(response, 'w')
-
-        for candidate in queryset:
-            path = os.path.join('media', 'files', candidate.username)
-            dir_list = glob.glob(path)
-
-            for directory in dir_list:
-                zipdir(directory, zip_file)
-
-        zip_file.close()
-        return response
+        job = enqueue_job(CANDIDATE_FILES, queryset, request.user)
+        self.message_user(request, job_enqueued_message(job))
+        return redirect('.')
 
     def reset_candidate_exam(self, request, queryset):
         resets = 0
@@ -206,49 +157,9 @@ class CandidateAdmin(UserAdmin):
         return redirect('.')
 
     def generate_general_report(self, request, queryset):
-        field_names = ['clave_aspirante', 'periodo', 'siglas', 'apellido_paterno', 'apellido_materno', 'nombre', 'email',
-                       'examen_status', 'examen_puntuacion', 'documentacion', 'credencial']
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename={} ({}).csv'.format('Reporte de resultados',
-                                                                                    str(datetime.utcnow()))
-        writer = csv.writer(response)
-        writer.writerow(field_names)
-
-        for candidate in queryset:
-            row = []
-
-            result = Result.objects.filter(user_id=candidate.id, disabled=False).last()
-
-            for field in field_names:
-                if field == 'clave_aspirante':
-                    row.append(candidate.username)
-                elif field == 'periodo':
-                    row.append(candidate.periodo)
-                elif field == 'siglas':
-                    row.append(candidate.siglas)
-                elif field == 'apellido_paterno':
-                    row.append(candidate.apellido_paterno)
-                elif field == 'apellido_materno':
-                    row.append(candidate.apellido_materno)
-                elif field == 'nombre':
-                    row.append(candidate.nombre)
-                elif field == 'email':
-                    row.append(candidate.email)
-                elif field == 'examen_status':
-                    row.append(self.examen(candidate))
-                elif field == 'examen_puntuacion':
-                    if result:
-                        row.append(str(result.get_correct_answers_count()))
-                    else:
-                        row.append('0')
-                elif field == 'documentacion':
-                    row.append(self.documentacion(candidate))
-                elif field == 'credencial':
-                    row.append(self.credencial(candidate))
-
-            writer.writerow(row)
-        return response
+        job = enqueue_job(GENERAL_REPORT, queryset, request.user)
+        self.message_user(request, job_enqueued_message(job))
+        return redirect('.')
 
     def get_urls(self):
         urls = super().get_urls()
@@ -262,21 +173,31 @@ class CandidateAdmin(UserAdmin):
             csv_file = request.FILES["csv_file"]
 
             if not csv_file.name.endswith('.csv'):
-                self.message_user(request, 'El archivo no es un csv válido')
+                self.message_user(request, 'El archivo no es un csv válido', messages.ERROR)
                 return redirect('..')
 
+            # a big export is imported by the worker, which leaves a report of the rows with errors
             if csv_file.multiple_chunks():
-                self.message_user(request, 'El archivo es demasiado grande')
+                job = enqueue_file_job(CANDIDATE_IMPORT, csv_file, request.user)
+                self.message_user(request, job_enqueued_message(job))
                 return redirect('..')
 
-            file_data = csv_file.read().decode('utf-8')
-            reader = csv.DictReader(io.StringIO(file_data))
+            try:
+                summary = import_candidates(csv_file)
+            except UnicodeDecodeError:
+                self.message_user(request, 'El archivo no está en utf-8', messages.ERROR)
+                return redirect('..')
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                return redirect('..')
+
+            self.message_user(request, 'Importación terminada: {}'.format(summary),
+                              messages.WARNING if summary.errors else messages.SUCCESS)
+            if not summary.errors:
+                return redirect('..')
+
+            return render(request, "admin/csv_form.html", {"form": CsvImportForm(), "errors": summary.errors})
 
-            line_count = 0
-            for row in reader:
-                line_count += register_user_from_row(row)
-            self.message_user(request, 'Se importaron correctamente {} usuario(s)'.format(line_count - 1))
-            return redirect("..")
         form = CsvImportForm()
         payload = {"form": form}
 
@@ -284,25 +205,25 @@ class CandidateAdmin(UserAdmin):
             request, "admin/csv_form.html", payload
         )
 
+    def get_queryset(self, request):
+        # the status columns are computed by the query that loads the page
+        return annotate_candidate_status(super().get_queryset(request))
+
     def examen(self, obj):
         """Returns the exam status"""
-        result = Result.objects.filter(user_id=obj.id, disabled=False).last()
-        if not result:
-            return 'Sin contestar'
-        if result.status == 2:
-            return 'Terminado'
-        elif result.status == 1:
-            return 'Fuera de tiempo'
-        else:
-            return 'Contestando'
+        return exam_status_label(obj.exam_status)
 
     def documentacion(self, obj):
         """Returns the documentation status"""
-        return 'Terminado' if documentation_is_finished(obj) else 'Pendiente'
+        return status_label(obj.documentation_finished)
 
     def credencial(self, obj):
         """Returns the student card status"""
-        return 'Terminado' if student_card_is_finished(obj) else 'Pendiente'
+        return status_label(obj.student_card_finished)
+
+    examen.admin_order_field = 'exam_status'
+    documentacion.admin_order_field = 'documentation_finished'
+    credencial.admin_order_field = 'student_card_finished'
 
 
 admin.site.register(Candidate, CandidateAdmin)
@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from users.email import build_welcome_email
+from users.models import Candidate
+from utils.email import send_emails
+from utils.lists import chunks
+from utils.streaming import write_csv
+
+# candidates whose passwords are hashed, saved and mailed together
+CREDENTIALS_BATCH_SIZE = 100
+
+CREDENTIALS_REPORT_FIELD_NAMES = ['clave_aspirante', 'email', 'resultado']
+
+
+def hash_passwords(executor, passwords):
+    """
+    Hashes the passwords in parallel, the hashing releases the GIL so the threads use every core
+    :param executor: ThreadPoolExecutor
+    :param passwords: list of raw passwords
+    :return: list of hashes in the same order
+    """
+    return list(executor.map(make_password, passwords))
+
+
+def provision_batch(executor, candidates):
+    """
+    Gives a new password to each candidate of a batch with an email, saves them with one query and then sends the
+    welcome emails through one connection
+    :param executor: ThreadPoolExecutor to hash the passwords
+    :param candidates: list of candidates
+    :return: list of report rows
+    """
+    to_send = [candidate for candidate in candidates if candidate.email]
+    passwords = [Candidate.objects.make_random_password() for candidate in to_send]
+
+    for candidate, password in zip(to_send, hash_passwords(executor, passwords)):
+        candidate.password = password
+        candidate.email_sent = True
+
+    with transaction.atomic():
+        Candidate.objects.bulk_update(to_send, ['password', 'email_sent'])
+
+    # the passwords are only mailed once they are saved
+    send_emails([build_welcome_email(candidate.email, candidate.nombre, candidate.username, password)
+                 for candidate, password in zip(to_send, passwords)])
+
+    return [get_report_row(candidate) for candidate in candidates]
+
+
+def get_report_row(candidate):
+    """Returns the report row of a candidate whose batch was processed"""
+    return [candidate.username, candidate.email, 'Enviado' if candidate.email else 'Sin correo']
+
+
+def write_credentials_report(ids, file, progress=None, start=0, batch_size=CREDENTIALS_BATCH_SIZE):
+    """
+    Sends new credentials to the candidates and writes who got them, never the passwords. The candidates are
+    processed in order and the progress is reported after each batch, so a job that stopped can resume from the
+    first candidate that wasn't done. A resumed job lists the candidates done by the previous runs too, read back
+    from the database, so its report covers every candidate.
+    :param ids: list of candidate ids
+    :param file: binary file object
+    :param progress: optional function called with the number of candidates done after each batch
+    :param start: number of candidates done by a previous run
+    :param batch_size: candidates per batch
+    :return: number of candidates done, summary
+    """
+    counts = {'done': start, 'sent': 0, 'skipped': 0}
+
+    def rows():
+        yield CREDENTIALS_REPORT_FIELD_NAMES
+        for chunk in chunks(ids[:start], batch_size):
+            candidates = Candidate.objects.only('username', 'email').in_bulk(chunk)
+            for row in (get_report_row(candidates[pk]) for pk in chunk if pk in candidates):
+                counts['sent' if row[1] else 'skipped'] += 1
+                yield row
+
+        with ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS) as executor:
+            for chunk in chunks(ids[start:], batch_size):
+                candidates = Candidate.objects.in_bulk(chunk)
+                for row in provision_batch(executor, [candidates[pk] for pk in chunk if pk in candidates]):
+                    counts['sent' if row[1] else 'skipped'] += 1
+                    yield row
+
+                counts['done'] += len(chunk)
+                if progress:
+                    progress(counts['done'])
+
+    write_csv(file, rows())
+    return counts['done'], '{} enviado(s), {} sin correo'.format(counts['sent'], counts['skipped'])
@@ -1,16 +1,19 @@
 from diagnostico_project import settings
-from utils.email import send_non_threaded_email, send_mail
+from utils.email import build_email, send_mail
+
+
+def build_welcome_email(email, name, username, password):
+    return build_email(subject='Registro a Plataforma Diagnóstico',
+                       template='email/welcome.html',
+                       recipient_list=[email],
+                       ctx={
+                           'name': name,
+                           'email': email,
+                           'username': username,
+                           'password': password,
+                           'host': settings.CONFIGURED_HOST
+                       })
 
 
 def send_welcome_email(email, name, username, password):
-    send_non_threaded_email(subject='Registro a Plataforma Diagnóstico',
-                            template='email/welcome.html',
-                            recipient_list=[email],
-                            fail_silently=False,
-                            ctx={
-                                'name': name,
-                                'email': email,
-                                'username': username,
-                                'password': password,
-                                'host': settings.CONFIGURED_HOST
-                            })
+    build_welcome_email(email, name, username, password).send(fail_silently=False)
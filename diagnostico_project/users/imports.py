@@ -0,0 +1,195 @@
+import csv
+import io
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from core.services import rebuild_progress
+from users.models import Candidate
+from utils.streaming import STREAM_CHUNK_SIZE, write_csv
+
+# column of the registrar export -> field of the candidate
+IMPORT_FIELDS = (
+    ('cve_ni', 'username'),
+    ('email', 'email'),
+    ('nombre', 'nombre'),
+    ('apell_pat', 'apellido_paterno'),
+    ('apell_mat', 'apellido_materno'),
+    ('fechaNac', 'nacimiento'),
+    ('telefono', 'telefono'),
+    ('celular', 'celular'),
+    ('sexo', 'sexo'),
+    ('tip_san', 'sangre'),
+    ('curp', 'curp'),
+    ('NSS', 'nss'),
+    ('edoCivil', 'edo_civil'),
+    ('nacionalidad', 'nacionalidad'),
+    ('per_esc', 'periodo'),
+    ('cve_ua', 'unidad'),
+    ('folio', 'folio'),
+    ('siglas', 'siglas'),
+)
+
+# fields written when a candidate already exists, the username is the key
+UPDATE_FIELDS = [field for column, field in IMPORT_FIELDS if field != 'username']
+
+IMPORT_REPORT_FIELD_NAMES = ['linea', 'cve_ni', 'error']
+
+
+class ImportSummary:
+    """
+    The counts of an import and the rows that couldn't be imported
+    """
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []  # list of (line, username, message)
+
+    def __str__(self):
+        return '{} nuevo(s), {} actualizado(s), {} sin cambios, {} con errores'.format(
+            self.inserted, self.updated, self.skipped, len(self.errors))
+
+
+def parse_row(row):
+    """
+    Validates a row of the registrar export
+    :param row: dict from the csv reader
+    :return: dict of candidate field -> value, list of errors
+    """
+    values, errors = {}, []
+    for column, field in IMPORT_FIELDS:
+        value = (row.get(column) or '').strip()
+
+        if field == 'nacimiento':
+            try:
+                value = datetime.strptime(value, '%d/%m/%Y').date() if value else None
+            except ValueError:
+                errors.append('{}: fecha inválida, se espera dd/mm/aaaa'.format(column))
+        else:
+            max_length = Candidate._meta.get_field(field).max_length
+            if len(value) > max_length:
+                errors.append('{}: máximo {} caracteres'.format(column, max_length))
+
+        values[field] = value
+
+    if not values['username']:
+        errors.append('cve_ni: es obligatorio')
+
+    if values['email']:
+        try:
+            validate_email(values['email'])
+        except ValidationError:
+            errors.append('email: correo inválido')
+
+    return values, errors
+
+
+def _import_batch(batch, summary):
+    """
+    Inserts the new candidates of a batch and updates the ones that changed, with one query to find them and one bulk
+    query for each. The blank cells of an existing candidate are left as they are.
+    :param batch: list of (line, values)
+    :param summary: ImportSummary to update
+    """
+    existing = Candidate.objects.only('pk', *UPDATE_FIELDS) \
+        .in_bulk([values['username'] for line, values in batch], field_name='username')
+
+    # the candidates inserted by this batch are told apart from the ones registered meanwhile by their date_joined
+    joined = timezone.now()
+    to_create, to_update = [], []
+    for line, values in batch:
+        candidate = existing.get(values['username'])
+        if candidate is None:
+            to_create.append(Candidate(date_joined=joined, **values))
+            continue
+
+        changed = {field: values[field] for field in UPDATE_FIELDS
+                   if values[field] not in ('', None) and getattr(candidate, field) != values[field]}
+        if changed:
+            for field, value in changed.items():
+                setattr(candidate, field, value)
+            to_update.append(candidate)
+        else:
+            summary.skipped += 1
+
+    inserted = []
+    with transaction.atomic():
+        # a candidate registered meanwhile is kept as it is
+        Candidate.objects.bulk_create(to_create, ignore_conflicts=True)
+        Candidate.objects.bulk_update(to_update, UPDATE_FIELDS)
+
+        if to_create:
+            inserted = list(Candidate.objects.filter(username__in=[candidate.username for candidate in to_create],
+                                                     date_joined=joined).values_list('pk', flat=True))
+            # bulk_create doesn't send the signals that create the progress
+            rebuild_progress(inserted)
+
+    summary.inserted += len(inserted)
+    summary.updated += len(to_update)
+    summary.skipped += len(to_create) - len(inserted)
+
+
+def import_candidates(file, progress=None, batch_size=STREAM_CHUNK_SIZE):
+    """
+    Imports the candidates of a registrar export, the file is read row by row and the candidates are written in
+    batches, so its size doesn't matter. New candidates are inserted, the existing ones (by username) are updated if
+    anything changed, and the invalid rows are skipped and reported.
+    :param file: binary file of the utf-8 csv
+    :param progress: optional function called with the number of rows read after each batch
+    :param batch_size: rows per batch
+    :return: ImportSummary
+    """
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    missing = [column for column, field in IMPORT_FIELDS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError('Faltan las columnas: {}'.format(', '.join(missing)))
+
+    summary = ImportSummary()
+    seen = {}
+    batch = []
+    for row in reader:
+        summary.rows += 1
+        line = reader.line_num
+        values, errors = parse_row(row)
+
+        if not errors and values['username'] in seen:
+            errors.append('cve_ni: repetida en la línea {}'.format(seen[values['username']]))
+
+        if errors:
+            summary.errors.append((line, values['username'], '; '.join(errors)))
+            continue
+
+        seen[values['username']] = line
+        batch.append((line, values))
+        if len(batch) == batch_size:
+            _import_batch(batch, summary)
+            batch = []
+            if progress:
+                progress(summary.rows)
+
+    if batch:
+        _import_batch(batch, summary)
+
+    return summary
+
+
+def write_import_report(path, file, progress=None, batch_size=STREAM_CHUNK_SIZE):
+    """
+    Imports an uploaded registrar export and writes the rows that couldn't be imported to a csv
+    :param path: path of the export in the storage
+    :param file: binary file object to write to
+    :param progress: optional function called with the number of rows read
+    :param batch_size: rows per batch
+    :return: number of rows read, summary
+    """
+    with default_storage.open(path, 'rb') as source:
+        summary = import_candidates(source, progress, batch_size)
+
+    write_csv(file, [IMPORT_REPORT_FIELD_NAMES] + [list(error) for error in summary.errors])
+    return summary.rows, str(summary)
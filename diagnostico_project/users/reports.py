@@ -0,0 +1,145 @@
+import io
+from functools import partial
+from itertools import chain
+
+from django.core.files.storage import default_storage
+
+from core.models import CandidateArchive
+from core.services import get_candidate_files, schedule_archive
+from exam.models import FINISHED, TIME_UP
+from users.models import Candidate
+from utils.lists import chunks
+from utils.services import annotate_candidate_status
+from utils.streaming import STREAM_CHUNK_SIZE, iterate_in_chunks, iterate_zip, iterate_zip_members, write_csv
+
+# name of the list of the files that weren't found, added at the end of the candidate files zip
+MISSING_FILES_MANIFEST = 'faltantes.csv'
+MISSING_FILES_FIELD_NAMES = ['clave_aspirante', 'archivo']
+
+GENERAL_REPORT_FIELD_NAMES = ['clave_aspirante', 'periodo', 'siglas', 'apellido_paterno', 'apellido_materno', 'nombre',
+                              'email', 'examen_status', 'examen_puntuacion', 'documentacion', 'credencial']
+
+
+def exam_status_label(status):
+    """Returns the label of a result status, None means there is no result"""
+    if status is None:
+        return 'Sin contestar'
+    if status == FINISHED:
+        return 'Terminado'
+    elif status == TIME_UP:
+        return 'Fuera de tiempo'
+    else:
+        return 'Contestando'
+
+
+def status_label(finished):
+    """Returns the label of the documentation and student card status"""
+    return 'Terminado' if finished else 'Pendiente'
+
+
+def get_general_report_row(candidate):
+    """
+    Returns the csv row of a candidate annotated with annotate_candidate_status
+    :param candidate: candidate instance
+    :return: list
+    """
+    row = []
+    for field in GENERAL_REPORT_FIELD_NAMES:
+        if field == 'clave_aspirante':
+            row.append(candidate.username)
+        elif field == 'periodo':
+            row.append(candidate.periodo)
+        elif field == 'siglas':
+            row.append(candidate.siglas)
+        elif field == 'apellido_paterno':
+            row.append(candidate.apellido_paterno)
+        elif field == 'apellido_materno':
+            row.append(candidate.apellido_materno)
+        elif field == 'nombre':
+            row.append(candidate.nombre)
+        elif field == 'email':
+            row.append(candidate.email)
+        elif field == 'examen_status':
+            row.append(exam_status_label(candidate.exam_status))
+        elif field == 'examen_puntuacion':
+            row.append(str(candidate.exam_score or 0))
+        elif field == 'documentacion':
+            row.append(status_label(candidate.documentation_finished))
+        elif field == 'credencial':
+            row.append(status_label(candidate.student_card_finished))
+    return row
+
+
+def write_general_report(ids, file, progress=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Writes the general csv report, every status is computed by the query that loads each chunk of candidates
+    :param ids: ids of the candidates
+    :param file: binary file object
+    :param progress: optional function called with the rows written so far
+    :param chunk_size: rows loaded per query
+    :return: number of rows written
+    """
+    candidates = iterate_in_chunks(annotate_candidate_status(Candidate.objects.all()), ids, chunk_size)
+    rows = (get_general_report_row(candidate) for candidate in candidates)
+    return write_csv(file, chain([GENERAL_REPORT_FIELD_NAMES], rows), progress, chunk_size)
+
+
+def write_candidate_files(ids, file, progress=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Writes a zip with the uploaded files of the candidates, named as in the storage (files/<username>/...). The members
+    of each candidate's archive are copied without being decompressed. The files of a candidate whose archive is missing
+    or stale are read from the storage instead, and the archive is rebuilt by the worker for the next download (see
+    core.services.schedule_archive). The zip is written as it's produced, and the files that weren't found are listed
+    in a manifest at the end.
+    :param ids: ids of the candidates
+    :param file: binary file object
+    :param progress: optional function called with the candidates added so far
+    :param chunk_size: candidates loaded per query
+    :return: number of candidates added
+    """
+    counts = {'candidates': 0}
+    missing = []
+
+    def candidate_entries(candidate, names):
+        for name in names:
+            if default_storage.exists(name):
+                yield name, partial(default_storage.open, name, 'rb')
+            else:
+                missing.append([candidate.username, name])
+
+    def entries():
+        for chunk in chunks(ids, chunk_size):
+            candidates = Candidate.objects.only('id', 'username').in_bulk(chunk)
+            archives = {archive.user_id: archive for archive in CandidateArchive.objects.filter(user_id__in=chunk)}
+            stale = [pk for pk in chunk if pk in candidates and not archive_is_usable(archives.get(pk))]
+            files = get_candidate_files(stale) if stale else {}
+
+            for pk in chunk:
+                if pk not in candidates:
+                    continue
+
+                if pk in stale:
+                    yield from candidate_entries(candidates[pk], files.get(pk, []))
+                    schedule_archive(pk)
+                else:
+                    with archives[pk].file.open('rb') as archive_file:
+                        yield from iterate_zip_members(archive_file)
+                    missing.extend([candidates[pk].username, name] for name in archives[pk].get_missing())
+
+                counts['candidates'] += 1
+                if progress:
+                    progress(counts['candidates'])
+
+        manifest = io.BytesIO()
+        write_csv(manifest, [MISSING_FILES_FIELD_NAMES] + missing)
+        manifest.seek(0)
+        yield MISSING_FILES_MANIFEST, lambda: manifest
+
+    for data in iterate_zip(entries()):
+        file.write(data)
+    return counts['candidates']
+
+
+def archive_is_usable(archive):
+    """The archive can be copied: it has the current files of the candidate and its zip is in the storage"""
+    return archive is not None and archive.is_fresh() and default_storage.exists(archive.file.name)
@@ -1,3 +1,493 @@
-from django.test import TestCase
+import datetime
+import io
+import re
+from functools import partial
+from tempfile import TemporaryFile
+from unittest import mock
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import CandidateProgress, CandidateArchive
+from core.services import build_archive
+from core.tasks import refresh_archive
+from documents.models import Category, Document
+from exam.models import Exam, Subject, Section, Question, Answer, Result, Response, ANSWERING, FINISHED
+from jobs.models import Job, GENERAL_REPORT, CANDIDATE_IMPORT, CANDIDATE_CREDENTIALS, DONE, FAILED
+from jobs.services import run_job, resume_job
+from student_card.models import CardInfo
+from users import credentials
+from users.imports import import_candidates
+from users.reports import write_general_report, write_candidate_files
+from utils.services import documentation_is_finished, student_card_is_finished, annotate_candidate_status
+
+
+class CandidateBaseTest(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(username='admin', email='admin@ues.mx',
+                                                               password='secret')
+        self.client.login(username='admin', password='secret')
+
+        exam = Exam.objects.create(title='Exam')
+        question = Question.objects.create(section=Section.objects.create(
+            subject=Subject.objects.create(exam=exam, title='Math'), title='Arithmetic'), text='1 + 1')
+        answer = Answer.objects.create(question=question, text='2', is_correct=True)
+        self.categories = [Category.objects.create(name='Acta'), Category.objects.create(name='Foto')]
+
+        # everything done
+        self.done = get_user_model().objects.create_user(username='done', nombre='Ana')
+        result = Result.objects.create(user=self.done, exam=exam, status=FINISHED)
+        Response.objects.create(result=result, answer=answer)
+        for category in self.categories:
+            Document.objects.create(user=self.done, category=category, file='files/done/document.pdf')
+        CardInfo.objects.create(user=self.done, photo='files/done/foto/photo.jpg',
+                                emergency_contact_name='Juan', emergency_phone_number='6621234567')
+
+        # a reset exam, one category and a card without phone
+        self.pending = get_user_model().objects.create_user(username='pending', nombre='Luis')
+        Result.objects.create(user=self.pending, exam=exam, status=FINISHED, disabled=True)
+        Document.objects.create(user=self.pending, category=self.categories[0], file='files/pending/document.pdf')
+        CardInfo.objects.create(user=self.pending, photo='files/pending/foto/photo.jpg',
+                                emergency_contact_name='Juan')
+
+        # finished an exam, then it was reset and is being answered again; a complete card was replaced
+        self.answering = get_user_model().objects.create_user(username='answering', nombre='Eva')
+        Result.objects.create(user=self.answering, exam=exam, status=FINISHED)
+        Result.objects.create(user=self.answering, exam=exam, status=ANSWERING)
+        Document.objects.create(user=self.answering, category=self.categories[1], file='files/answering/foto.jpg')
+        Document.objects.create(user=self.answering, category=self.categories[1], file='files/answering/foto2.jpg')
+        CardInfo.objects.create(user=self.answering, photo='files/answering/foto/photo.jpg',
+                                emergency_contact_name='Juan', emergency_phone_number='6621234567')
+        CardInfo.objects.create(user=self.answering)
+
+
+class CandidateReportTest(CandidateBaseTest):
+    def get_report(self, candidates):
+        response = self.client.post(reverse('admin:users_candidate_changelist'), {
+            'action': 'generate_general_report',
+            '_selected_action': [candidate.id for candidate in candidates],
+        })
+        self.assertEquals(response.status_code, 302)
+
+        # the report is left to the worker
+        job = run_job(Job.objects.get(kind=GENERAL_REPORT))
+        with job.file.open('rb') as file:
+            lines = file.read().decode('utf-8').splitlines()
+        job.file.delete(save=False)
+        return lines
+
+    def test_annotate_candidate_status(self):
+        candidates = {candidate.username: candidate for candidate in
+                      annotate_candidate_status(get_user_model().objects.filter(is_staff=False))}
+
+        for candidate in candidates.values():
+            self.assertEquals(candidate.documentation_finished, documentation_is_finished(candidate))
+            self.assertEquals(candidate.student_card_finished, student_card_is_finished(candidate))
+
+        self.assertEquals((candidates['done'].exam_status, candidates['done'].exam_score), (FINISHED, 1))
+        self.assertEquals((candidates['pending'].exam_status, candidates['pending'].exam_score), (None, None))
+        self.assertEquals(candidates['answering'].exam_status, ANSWERING)
+
+    def test_generate_general_report(self):
+        lines = self.get_report([self.done, self.pending])
+
+        self.assertEquals(lines[0], 'clave_aspirante,periodo,siglas,apellido_paterno,apellido_materno,nombre,email,'
+                                    'examen_status,examen_puntuacion,documentacion,credencial')
+        self.assertIn('done,,,,,Ana,,Terminado,1,Terminado,Terminado', lines)
+        self.assertIn('pending,,,,,Luis,,Sin contestar,0,Pendiente,Pendiente', lines)
+
+    def test_write_general_report_query_count(self):
+        candidates = [get_user_model().objects.create_user(username='candidate{}'.format(i)) for i in range(10)]
+        ids = [candidate.id for candidate in candidates + [self.done, self.pending, self.answering]]
+
+        # one query per chunk of candidates, whatever the number of candidates
+        with self.assertNumQueries(2):
+            with TemporaryFile() as file:
+                self.assertEquals(write_general_report(ids, file, chunk_size=10), 13)
+                file.seek(0)
+                self.assertEquals(file.read().decode('utf-8').splitlines()[1].split(',')[0], 'candidate0')
+
+
+class CandidateFiltersTest(CandidateBaseTest):
+    def get_usernames(self, **params):
+        response = self.client.get(reverse('admin:users_candidate_changelist'), params)
+        return sorted(candidate.username for candidate in response.context['cl'].result_list
+                      if not candidate.is_staff)
+
+    def test_exam_status_filter(self):
+        self.assertEquals(self.get_usernames(examen='Terminado'), ['done'])
+        self.assertEquals(self.get_usernames(examen='Contestando'), ['answering'])
+        self.assertEquals(self.get_usernames(examen='Fuera de tiempo'), [])
+        self.assertEquals(self.get_usernames(examen='Sin contestar'), ['pending'])
+
+    def test_documents_status_filter(self):
+        # a category with two documents still counts once
+        self.assertEquals(self.get_usernames(documentacion='Terminado'), ['done'])
+        self.assertEquals(self.get_usernames(documentacion='Pendiente'), ['answering', 'pending'])
+
+        # a disabled category is no longer required
+        self.categories[0].disabled = True
+        self.categories[0].save()
+        self.assertEquals(self.get_usernames(documentacion='Terminado'), ['answering', 'done'])
+
+    def test_student_card_status_filter(self):
+        self.assertEquals(self.get_usernames(credencial='Terminado'), ['done'])
+        self.assertEquals(self.get_usernames(credencial='Pendiente'), ['answering', 'pending'])
+
+    def test_documents_status_without_categories(self):
+        Category.objects.update(disabled=True)
+        self.assertEquals(self.get_usernames(documentacion='Pendiente'), [])
+
+    def test_combined_filters(self):
+        self.assertEquals(self.get_usernames(examen='Terminado', documentacion='Terminado', credencial='Terminado'),
+                          ['done'])
+        self.assertEquals(self.get_usernames(examen='Sin contestar', credencial='Terminado'), [])
+
+
+class CandidateChangelistTest(CandidateBaseTest):
+    def test_status_columns(self):
+        response = self.client.get(reverse('admin:users_candidate_changelist'), {'q': 'done'})
+        self.assertContains(response, '<td class="field-examen">Terminado</td>', html=True)
+        self.assertContains(response, '<td class="field-documentacion">Terminado</td>', html=True)
+        self.assertContains(response, '<td class="field-credencial">Terminado</td>', html=True)
+
+    def test_changelist_query_count(self):
+        url = reverse('admin:users_candidate_changelist')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+
+        for i in range(10):
+            user = get_user_model().objects.create_user(username='candidate{}'.format(i))
+            Document.objects.create(user=user, category=self.categories[0], file='files/candidate/document.pdf')
+            CardInfo.objects.create(user=user)
+
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url)
+        self.assertEquals(response.context['cl'].result_count, 14)
+
+    def test_sort_by_status(self):
+        # documentacion is the column 9, the checkbox is the 0; ties are sorted by newest first
+        response = self.client.get(reverse('admin:users_candidate_changelist'), {'o': '-9', 'is_staff__exact': '0'})
+        self.assertEquals([candidate.username for candidate in response.context['cl'].result_list],
+                          ['done', 'answering', 'pending'])
+
+
+IMPORT_HEADER = 'cve_ni,email,nombre,apell_pat,apell_mat,fechaNac,telefono,celular,sexo,tip_san,curp,NSS,edoCivil,' \
+                'nacionalidad,per_esc,cve_ua,folio,siglas'
+
+
+def import_row(username, nombre='Ana', nacimiento='01/02/2000', email='ana@ues.mx'):
+    return '{},{},{},Lopez,Diaz,{},,,F,O+,,,,Mexicana,2020-1,0101,1,ISI'.format(username, email, nombre, nacimiento)
+
+
+class CandidateImportTest(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(username='admin', email='admin@ues.mx',
+                                                               password='secret')
+        self.client.login(username='admin', password='secret')
+        self.url = reverse('admin:users_candidate_changelist') + 'import-csv/'
+
+    def get_file(self, rows):
+        return io.BytesIO('\n'.join([IMPORT_HEADER] + rows).encode('utf-8'))
+
+    def test_import_candidates(self):
+        import_candidates(self.get_file([import_row('unchanged'), import_row('changed')]))
+        summary = import_candidates(self.get_file([
+            import_row('unchanged'),
+            import_row('changed', nombre='Eva'),
+            import_row('new'),
+            import_row('bad_date', nacimiento='2000-02-01'),
+            import_row('', email='wrong'),
+            import_row('new', nombre='Luis'),
+        ]))
+
+        self.assertEquals((summary.rows, summary.inserted, summary.updated, summary.skipped), (6, 1, 1, 1))
+        self.assertEquals(summary.errors, [
+            (5, 'bad_date', 'fechaNac: fecha inválida, se espera dd/mm/aaaa'),
+            (6, '', 'cve_ni: es obligatorio; email: correo inválido'),
+            (7, 'new', 'cve_ni: repetida en la línea 4'),
+        ])
+
+        candidate = get_user_model().objects.get(username='new')
+        self.assertEquals((candidate.nombre, candidate.nacimiento, candidate.periodo),
+                          ('Ana', datetime.date(2000, 2, 1), '2020-1'))
+        self.assertEquals(get_user_model().objects.get(username='changed').nombre, 'Eva')
+        self.assertTrue(CandidateProgress.objects.filter(user=candidate).exists())
+
+    def test_import_keeps_existing_values_of_blank_cells(self):
+        import_candidates(self.get_file([import_row('candidate')]))
+        summary = import_candidates(self.get_file([import_row('candidate', nombre='', nacimiento='', email='')]))
+
+        self.assertEquals((summary.inserted, summary.updated, summary.skipped), (0, 0, 1))
+        candidate = get_user_model().objects.get(username='candidate')
+        self.assertEquals((candidate.nombre, candidate.nacimiento, candidate.email),
+                          ('Ana', datetime.date(2000, 2, 1), 'ana@ues.mx'))
+
+    def test_import_counts_conflicts_as_skipped(self):
+        registered = get_user_model().objects.create_user(username='registered', nombre='Eva')
+
+        # the candidate registers after the batch looked for the existing ones
+        with mock.patch('django.db.models.query.QuerySet.in_bulk', return_value={}):
+            summary = import_candidates(self.get_file([import_row('registered'), import_row('new')]))
+
+        self.assertEquals((summary.inserted, summary.updated, summary.skipped), (1, 0, 1))
+        self.assertEquals(get_user_model().objects.get(pk=registered.pk).nombre, 'Eva')
+
+    def test_import_candidates_in_batches(self):
+        def count_queries(usernames):
+            with CaptureQueriesContext(connection) as context:
+                import_candidates(self.get_file([import_row(username) for username in usernames]), batch_size=100)
+            return len(context.captured_queries)
+
+        # the same queries for any number of rows in a batch (sqlite splits bigger inserts)
+        self.assertEquals(count_queries(['a{}'.format(i) for i in range(5)]),
+                          count_queries(['b{}'.format(i) for i in range(30)]))
+        self.assertEquals(get_user_model().objects.filter(is_staff=False).count(), 35)
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            import_candidates(io.BytesIO(b'cve_ni,email\nuser,user@ues.mx'))
+
+    def test_import_csv(self):
+        response = self.client.post(self.url, {'csv_file': SimpleUploadedFile(
+            'aspirantes.csv', self.get_file([import_row('new'), import_row('bad', nacimiento='x')]).read())})
+
+        self.assertContains(response, '1 nuevo(s), 0 actualizado(s), 0 sin cambios, 1 con errores')
+        self.assertContains(response, 'fechaNac: fecha inválida')
+        self.assertTrue(get_user_model().objects.filter(username='new').exists())
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_import_big_csv(self):
+        # files that are uploaded to disk and don't fit in a chunk are imported by the worker
+        rows = [import_row('candidate{}'.format(i), nombre='N' * 200) for i in range(300)]
+        response = self.client.post(self.url, {'csv_file': SimpleUploadedFile(
+            'aspirantes.csv', self.get_file(rows + [import_row('bad', nacimiento='x')]).read())})
+        self.assertEquals(response.status_code, 302)
+        self.assertFalse(get_user_model().objects.filter(username='candidate0').exists())
+
+        job = Job.objects.get(kind=CANDIDATE_IMPORT)
+        source = job.get_params()['path']
+        job = run_job(job)
+        self.assertEquals((job.status, job.rows_done), (DONE, 301))
+        self.assertEquals(job.summary, '300 nuevo(s), 0 actualizado(s), 0 sin cambios, 1 con errores')
+        self.assertEquals(get_user_model().objects.filter(username__startswith='candidate').count(), 300)
+
+        with job.file.open('rb') as file:
+            self.assertEquals(file.read().decode('utf-8').splitlines(),
+                              ['linea,cve_ni,error', '302,bad,"fechaNac: fecha inválida, se espera dd/mm/aaaa"'])
+        job.file.delete(save=False)
+        default_storage.delete(source)
+
+
+class CandidateCredentialsTest(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(username='admin', email='admin@ues.mx',
+                                                               password='secret')
+        self.client.login(username='admin', password='secret')
+        self.candidates = [get_user_model().objects.create_user(username='candidate{}'.format(i),
+                                                                email='candidate{}@ues.mx'.format(i))
+                           for i in range(5)]
+        self.no_email = get_user_model().objects.create_user(username='no_email')
+
+    def send_credentials(self, candidates):
+        response = self.client.post(reverse('admin:users_candidate_changelist'), {
+            'action': 'send_registration_email',
+            '_selected_action': [candidate.id for candidate in candidates],
+        })
+        self.assertEquals(response.status_code, 302)
+        return Job.objects.get(kind=CANDIDATE_CREDENTIALS)
+
+    def test_send_registration_email(self):
+        job = self.send_credentials(self.candidates + [self.no_email])
+
+        # nothing is sent until the worker runs the job
+        self.assertEquals(len(mail.outbox), 0)
+        job = run_job(job)
+        self.assertEquals((job.status, job.rows_done), (DONE, 6))
+        self.assertEquals(job.summary, '5 enviado(s), 1 sin correo')
+        with job.file.open('rb') as file:
+            self.assertIn('no_email,,Sin correo', file.read().decode('utf-8').splitlines())
+        job.file.delete(save=False)
+
+        # the mailed password is the saved one
+        self.assertEquals(len(mail.outbox), 5)
+        for message in mail.outbox:
+            candidate = get_user_model().objects.get(email=message.to[0])
+            password = re.search(r'Contraseña:</strong> (\S+)</li>', message.body).group(1)
+            self.assertTrue(candidate.check_password(password))
+            self.assertTrue(candidate.email_sent)
+
+        self.assertFalse(get_user_model().objects.get(pk=self.no_email.pk).email_sent)
+
+    def test_resume_credentials(self):
+        job = self.send_credentials(self.candidates)
+
+        # the first 3 candidates were done before the job stopped
+        Job.objects.filter(pk=job.pk).update(status=FAILED, rows_done=3)
+        self.assertTrue(resume_job(Job.objects.get(pk=job.pk)))
+        job = run_job(Job.objects.get(pk=job.pk))
+
+        # the report lists the candidates of the previous run too
+        with job.file.open('rb') as file:
+            lines = file.read().decode('utf-8').splitlines()
+        job.file.delete(save=False)
+        self.assertEquals(lines[1:], ['candidate{0},candidate{0}@ues.mx,Enviado'.format(i) for i in range(5)])
+        self.assertEquals(job.summary, '5 enviado(s), 0 sin correo')
+
+        self.assertEquals((job.status, job.rows_done), (DONE, 5))
+        self.assertEquals(sorted(message.to[0] for message in mail.outbox),
+                          ['candidate3@ues.mx', 'candidate4@ues.mx'])
+        self.assertFalse(resume_job(job))
+
+    def test_resume_failed_credentials(self):
+        job = self.send_credentials(self.candidates)
+        send_emails = credentials.send_emails
+
+        def fail_third_batch(messages):
+            if mail_batches.call_count == 3:
+                raise ConnectionError('SMTP caído')
+            send_emails(messages)
+
+        # one candidate per batch, the third batch fails after the first two were mailed
+        with mock.patch('users.credentials.write_credentials_report',
+                        partial(credentials.write_credentials_report, batch_size=1)), \
+                mock.patch('users.credentials.send_emails', side_effect=fail_third_batch) as mail_batches:
+            job = run_job(Job.objects.get(pk=job.pk))
+
+        self.assertEquals((job.status, job.error), (FAILED, 'SMTP caído'))
+        self.assertEquals(Job.objects.get(pk=job.pk).rows_done, 2)
+
+        self.assertTrue(resume_job(job))
+        job = run_job(Job.objects.get(pk=job.pk))
+
+        # every candidate got exactly one email
+        self.assertEquals((job.status, job.rows_done), (DONE, 5))
+        self.assertEquals(sorted(message.to[0] for message in mail.outbox),
+                          ['candidate{}@ues.mx'.format(i) for i in range(5)])
+
+
+class CandidateFilesTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Acta')
+        self.candidates = [get_user_model().objects.create_user(username='candidate{}'.format(i)) for i in range(3)]
+        self.files = []
+
+    def tearDown(self):
+        for name in self.files:
+            default_storage.delete(name)
+        for archive in CandidateArchive.objects.all():
+            archive.delete()
+
+    def add_file(self, name, content):
+        name = default_storage.save(name, ContentFile(content))
+        self.files.append(name)
+        return name
+
+    def get_zip(self, ids, **kwargs):
+        with TemporaryFile() as file:
+            count = write_candidate_files(ids, file, **kwargs)
+            file.seek(0)
+            zip_file = ZipFile(io.BytesIO(file.read()))
+        return count, zip_file
+
+    def test_write_candidate_files(self):
+        first, second, third = self.candidates
+        acta = self.add_file('files/candidate0/acta/acta.pdf', b'%PDF-1.4' + b'0' * 1000)
+        notes = self.add_file('files/candidate0/acta/notas.txt', b'texto ' * 1000)
+        photo = self.add_file('files/candidate1/foto/photo.jpg', b'\xff\xd8\xff')
+        Document.objects.create(user=first, category=self.category, file=acta)
+        Document.objects.create(user=first, category=self.category, file=notes)
+        Document.objects.create(user=second, category=self.category, file='files/candidate1/acta/missing.pdf')
+        CardInfo.objects.create(user=second, photo=photo)
+        CardInfo.objects.create(user=second, photo=photo)
+        CardInfo.objects.create(user=third)
+
+        progress = []
+        count, zip_file = self.get_zip([third.id, first.id, second.id], progress=progress.append, chunk_size=2)
+
+        self.assertEquals((count, progress), (3, [1, 2, 3]))
+        self.assertEquals(zip_file.namelist(), [acta, notes, photo, 'faltantes.csv'])
+        self.assertEquals(zip_file.read(notes), b'texto ' * 1000)
+
+        # the already compressed files are stored as they are
+        self.assertEquals(zip_file.getinfo(acta).compress_type, ZIP_STORED)
+        self.assertEquals(zip_file.getinfo(notes).compress_type, ZIP_DEFLATED)
+
+        self.assertEquals(zip_file.read('faltantes.csv').decode('utf-8').splitlines(),
+                          ['clave_aspirante,archivo', 'candidate1,files/candidate1/acta/missing.pdf'])
+
+    def test_write_candidate_files_query_count(self):
+        for candidate in self.candidates:
+            Document.objects.create(user=candidate, category=self.category,
+                                    file=self.add_file('files/{}/acta/acta.pdf'.format(candidate.username), b'%PDF'))
+            build_archive(candidate.id)
+        ids = [candidate.id for candidate in self.candidates]
+
+        # once the archives are built, the candidates and their archives once per chunk
+        with self.assertNumQueries(2):
+            count, zip_file = self.get_zip(ids)
+        self.assertEquals(len(zip_file.namelist()), 4)
+
+    def test_archive_members_are_copied_compressed(self):
+        candidate = self.candidates[0]
+        notes = self.add_file('files/candidate0/acta/notas.txt', b'texto ' * 1000)
+        acta = self.add_file('files/candidate0/acta/acta.pdf', b'%PDF-1.4')
+        Document.objects.create(user=candidate, category=self.category, file=notes)
+        Document.objects.create(user=candidate, category=self.category, file=acta)
+        archive = build_archive(candidate.id)
+
+        # the archive is the only file read, and its members aren't decompressed
+        with mock.patch('zlib.decompressobj', side_effect=AssertionError('decompressed')), \
+                mock.patch.object(default_storage, 'open', wraps=default_storage.open) as storage_open:
+            self.assertEquals(self.get_zip([candidate.id])[1].namelist(), [notes, acta, 'faltantes.csv'])
+        self.assertEquals([call[0][0] for call in storage_open.call_args_list], [archive.file.name])
+
+        count, zip_file = self.get_zip([candidate.id])
+        self.assertEquals(zip_file.getinfo(notes).compress_type, ZIP_DEFLATED)
+        self.assertEquals(zip_file.read(notes), b'texto ' * 1000)
+        self.assertEquals(zip_file.read(acta), b'%PDF-1.4')
+        self.assertIsNone(zip_file.testzip())
+
+    def test_candidate_archive(self):
+        candidate = self.candidates[0]
+        acta = self.add_file('files/candidate0/acta/acta.pdf', b'%PDF-1.4')
+        document = Document.objects.create(user=candidate, category=self.category, file=acta)
+
+        # without an archive the files are read from the storage, and the archive is requested for the next download
+        self.assertEquals(self.get_zip([candidate.id])[1].namelist(), [acta, 'faltantes.csv'])
+        self.assertFalse(CandidateArchive.objects.get(user=candidate).is_fresh())
+        refresh_archive(candidate.id)
+        archive = CandidateArchive.objects.get(user=candidate)
+        self.assertTrue(archive.is_fresh())
+
+        # a fresh archive is reused
+        self.get_zip([candidate.id])
+        self.assertEquals(CandidateArchive.objects.get(user=candidate).file.name, archive.file.name)
+
+        # a new document or a disabled one makes it stale, the download has the current files anyway
+        photo = self.add_file('files/candidate0/foto/photo.jpg', b'\xff\xd8\xff')
+        CardInfo.objects.create(user=candidate, photo=photo)
+        self.assertFalse(CandidateArchive.objects.get(user=candidate).is_fresh())
+        self.assertEquals(self.get_zip([candidate.id])[1].namelist(), [acta, photo, 'faltantes.csv'])
+
+        document.disabled = True
+        document.save()
+        self.assertEquals(self.get_zip([candidate.id])[1].namelist(), [photo, 'faltantes.csv'])
+        refresh_archive(candidate.id)
+        self.assertEquals(self.get_zip([candidate.id])[1].namelist(), [photo, 'faltantes.csv'])
+
+        # the replaced zips are deleted
+        self.assertFalse(default_storage.exists(archive.file.name))
+        archive = CandidateArchive.objects.get(user=candidate)
+        self.assertTrue(archive.is_fresh())
+        name = archive.file.name
+        archive.delete()
+        self.assertFalse(default_storage.exists(name))
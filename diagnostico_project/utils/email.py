@@ -1,50 +1,90 @@
-import threading
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from celery import Task
 
 from diagnostico_project import settings
 
 from django.contrib.auth import get_user_model
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
 from django.template.loader import get_template
 
 from utils.lists import list_remove_duplicates
 
+logger = logging.getLogger(__name__)
+
+# bounded pool that hands the emails to the backend out of the request, instead of a thread per email
+executor = ThreadPoolExecutor(max_workers=settings.EMAIL_SEND_WORKERS)
+
 
-class EmailThread(threading.Thread):
+class EmailTask(Task):
     """
-    Email Thread.
+    Base of the celery task that sends each chunk of emails (see CELERY_EMAIL_TASK_CONFIG). The task sends the chunk
+    through one SMTP connection and retries each email that failed on its own; the retries wait exponentially longer,
+    with some jitter so the emails of a failed chunk don't all come back at once.
     """
-    def __init__(self, subject, body, from_email, recipient_list, fail_silently):
-        self.subject = subject
-        self.body = body
-        self.recipient_list = recipient_list
-        self.from_email = from_email
-        self.fail_silently = fail_silently
-        threading.Thread.__init__(self)
+    max_retries = settings.EMAIL_MAX_RETRIES
+
+    def retry(self, args=None, kwargs=None, exc=None, throw=True, eta=None, countdown=None, **options):
+        if eta is None and countdown is None:
+            countdown = get_retry_countdown(self.request.retries)
+        return super().retry(args, kwargs, exc, throw, eta, countdown, **options)
+
 
-    def run(self):
-        msg = EmailMessage(self.subject, self.body, self.from_email, self.recipient_list)
-        msg.content_subtype = 'html'
-        msg.send(self.fail_silently)
+def get_retry_countdown(retries):
+    """Seconds to wait before the next retry of an email"""
+    countdown = min(settings.EMAIL_RETRY_BACKOFF * 2 ** retries, settings.EMAIL_RETRY_BACKOFF_MAX)
+    return random.uniform(countdown / 2, countdown)
+
+
+@lru_cache(maxsize=None)
+def get_email_template(template):
+    """Compiles an email template once per process"""
+    return get_template(template)
 
 
 def get_staff_emails():
     """Gets a list with all the admin emails"""
-    return list(map(lambda x: x.email, get_user_model().objects.filter(is_staff=True).all()))
+    return list(get_user_model().objects.filter(is_staff=True).exclude(email='').values_list('email', flat=True))
 
 
 def send_mail(subject, template, ctx, recipient_list, fail_silently=False, *args, **kwargs):
-    """Sends an email using a thread"""
+    """Sends an email from the email pool, returns the future of the sending"""
     ctx['host'] = settings.CONFIGURED_HOST
-    body = get_template(template).render(ctx)
-    from_email = settings.EMAIL_FROM
-    recipient_list = list_remove_duplicates(recipient_list)
+    msg = build_email(subject, template, ctx, list_remove_duplicates(recipient_list))
 
-    EmailThread(subject, body, from_email, recipient_list, fail_silently).start()
+    future = executor.submit(send_emails, [msg], fail_silently)
+    future.add_done_callback(log_send_error)
+    return future
 
 
-def send_non_threaded_email(subject, template, ctx, recipient_list, fail_silently=False, *args, **kwargs):
-    body = get_template(template).render(ctx)
+def log_send_error(future):
+    """Logs the error of an email sent from the pool, nobody is waiting for it"""
+    if future.exception():
+        logger.error('Could not send an email', exc_info=future.exception())
+
+
+def build_email(subject, template, ctx, recipient_list):
+    """Renders an html email without sending it"""
+    body = get_email_template(template).render(ctx)
     from_email = settings.EMAIL_FROM
     msg = EmailMessage(subject, body, from_email, recipient_list)
     msg.content_subtype = 'html'
-    msg.send(fail_silently=fail_silently)
+    return msg
+
+
+def send_emails(messages, fail_silently=False):
+    """
+    Sends a batch of emails through one connection, the celery backend queues them in chunks of
+    CELERY_EMAIL_CHUNK_SIZE and each chunk is sent through one SMTP connection
+    """
+    if not messages:
+        return 0
+
+    return get_connection(fail_silently=fail_silently).send_messages(messages)
+
+
+def send_non_threaded_email(subject, template, ctx, recipient_list, fail_silently=False, *args, **kwargs):
+    build_email(subject, template, ctx, recipient_list).send(fail_silently=fail_silently)
@@ -1,15 +1,77 @@
-import base64
 import io
+import math
 
-from PIL import Image
+from PIL import Image, ImageDraw
 
 
-def convert_to_base64(request_file):
-    image = Image.open(request_file)
+def crop_image(file, box, size):
+    """
+    Crops an image and resizes it. A jpeg is decoded at the smallest scale that still covers the size of the result
+    (draft mode), so a big photo isn't decoded at full resolution to end up as a small one.
+    :param file: file object of the image
+    :param box: (x, y, width, height) of the crop, in pixels of the full image
+    :param size: (width, height) of the result
+    :return: RGB image
+    """
+    x, y, w, h = box
+    image = Image.open(file)
+    full_width = image.size[0]
+
+    # the scale needed for the crop to still have the size of the result
+    image.draft('RGB', (math.ceil(full_width * size[0] / w), math.ceil(image.size[1] * size[1] / h)))
+    scale = image.size[0] / full_width
+
+    cropped_image = image.crop((int(x * scale), int(y * scale), int((x + w) * scale), int((y + h) * scale)))
+    return cropped_image.convert('RGB').resize(size, Image.LANCZOS)
+
+
+def thumbnail_image(file, size):
+    """
+    Returns a thumbnail of an image that fits in a size, a jpeg is decoded at the smallest scale that still covers it
+    :param file: file object of the image
+    :param size: (width, height) the thumbnail fits in
+    :return: RGB image
+    """
+    image = Image.open(file)
+    image.draft('RGB', size)
+    image = image.convert('RGB')
+    image.thumbnail(size, Image.LANCZOS)
+    return image
+
+
+def placeholder_image(size, text):
+    """
+    Returns a grey image with a text in the middle
+    :param size: (width, height) of the image
+    :param text: short text, like the type of a file
+    :return: RGB image
+    """
+    image = Image.new('RGB', size, (233, 236, 239))
+    draw = ImageDraw.Draw(image)
+    # newer versions of Pillow replaced textsize with textbbox
+    width, height = draw.textsize(text) if hasattr(draw, 'textsize') else draw.textbbox((0, 0), text)[2:]
+    draw.text(((size[0] - width) / 2, (size[1] - height) / 2), text, fill=(108, 117, 125))
+    return image
+
+
+def to_jpeg(image):
+    """
+    Encodes an image as a jpeg
+    :param image: PIL image
+    :return: BytesIO with the jpeg
+    """
     blob = io.BytesIO()
     image.save(blob, 'JPEG')
-    contents = blob.getvalue()
-    contents_base64 = base64.b64encode(contents)
-    blob.close()
-    image_data = 'data:image/webp;base64,' + contents_base64.decode('utf-8')
-    return image_data
+    blob.seek(0)
+    return blob
+
+
+def is_image(file):
+    """Checks that a file can be read as an image, without decoding the whole image"""
+    try:
+        Image.open(file).verify()
+        return True
+    except Exception:
+        return False
+    finally:
+        file.seek(0)
@@ -1,3 +1,9 @@
 def list_remove_duplicates(l):
     """Remove duplicates from a list"""
     return list(dict.fromkeys(l))
+
+
+def chunks(l, size):
+    """Splits a list in lists of at most size items"""
+    for i in range(0, len(l), size):
+        yield l[i:i + size]
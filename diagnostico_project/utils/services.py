@@ -1,5 +1,9 @@
+from django.db.models import Count, OuterRef, Subquery, Case, When, Q, BooleanField, IntegerField
+from django.db.models.functions import Coalesce
+
 from documents.models import Category, Document
 from exam.models import Result, FINISHED, TIME_UP
+from exam.services import annotate_score
 from student_card.models import CardInfo
 
 
@@ -33,3 +37,78 @@ def student_card_is_finished(user):
 
     return True
 
+
+def annotate_exam_status(queryset):
+    """
+    Annotates a candidate queryset with exam_status and exam_score: the status and correct answers of the latest
+    result, None if there is no result
+    :param queryset: Candidate queryset
+    :return: annotated queryset
+    """
+    latest_result = Result.objects.filter(user_id=OuterRef('pk')).order_by('-id')
+    return queryset.annotate(
+        exam_status=Subquery(latest_result.values('status')[:1], output_field=IntegerField()),
+        exam_score=Subquery(annotate_score(latest_result).values('correct_count')[:1], output_field=IntegerField()),
+    )
+
+
+def annotate_documented_categories(queryset):
+    """
+    Annotates a candidate queryset with documented_categories, the number of categories with at least one document,
+    and documentation_finished, if every category has a document
+    :param queryset: Candidate queryset
+    :return: annotated queryset
+    """
+    documented_categories = Document.objects.filter(user_id=OuterRef('pk'),
+                                                    category__in=Category.objects.all()) \
+        .order_by() \
+        .values('user_id') \
+        .annotate(count=Count('category_id', distinct=True)) \
+        .values('count')
+    categories_count = Category.objects.order_by() \
+        .values('disabled') \
+        .annotate(count=Count('id')) \
+        .values('count')
+
+    return queryset.annotate(
+        documented_categories=Coalesce(Subquery(documented_categories, output_field=IntegerField()), 0),
+    ).annotate(
+        documentation_finished=Case(
+            When(documented_categories__gte=Coalesce(Subquery(categories_count, output_field=IntegerField()), 0),
+                 then=True),
+            default=False,
+            output_field=BooleanField()
+        ),
+    )
+
+
+def annotate_student_card_finished(queryset):
+    """
+    Annotates a candidate queryset with student_card_finished: the latest card has a photo and an emergency contact
+    :param queryset: Candidate queryset
+    :return: annotated queryset
+    """
+    latest_card_finished = CardInfo.objects.filter(user_id=OuterRef('pk')) \
+        .order_by('-id') \
+        .annotate(finished=Case(
+            When(Q(photo='') | Q(photo__isnull=True), then=False),
+            When(Q(emergency_contact_name='') | Q(emergency_contact_name__isnull=True), then=False),
+            When(Q(emergency_phone_number='') | Q(emergency_phone_number__isnull=True), then=False),
+            default=True,
+            output_field=BooleanField()
+        )) \
+        .values('finished')[:1]
+    return queryset.annotate(
+        student_card_finished=Coalesce(Subquery(latest_card_finished, output_field=BooleanField()), False),
+    )
+
+
+def annotate_candidate_status(queryset):
+    """
+    Annotates a candidate queryset with the same checks as the functions above, computed by the database in the query
+    that loads the candidates: exam_status, exam_score, documented_categories, documentation_finished and
+    student_card_finished
+    :param queryset: Candidate queryset
+    :return: annotated queryset
+    """
+    return annotate_student_card_finished(annotate_documented_categories(annotate_exam_status(queryset)))
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# bytes read at a time while hashing a file
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_file(file):
+    """
+    Returns the sha256 of a file
+    :param file: binary file object, read from its current position
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    for data in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(data)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps each content once. The content is stored as a blob named by its sha256 in
+    settings.CONTENT_STORE_DIR and every file with that content is a hard link to the blob, so the files keep their
+    names and urls, and the link count of the blob is its reference count. Deleting a file only removes its link,
+    collect_blobs deletes the blobs nothing links to.
+    """
+    def blob_path(self, digest):
+        """Returns the path of the blob of a sha256"""
+        return self.path(os.path.join(settings.CONTENT_STORE_DIR, digest[:2], digest[2:4], digest))
+
+    def store_blob(self, content):
+        """
+        Stores a content as a blob, unless it's already stored. It's written to a temporary file while it's hashed and
+        then linked as the blob, so a blob is always complete.
+        :param content: file object
+        :return: sha256 of the content
+        """
+        directory = self.path(settings.CONTENT_STORE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temporary_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for data in content.chunks():
+                    digest.update(data)
+                    file.write(data)
+
+            path = self.blob_path(digest.hexdigest())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(temporary_path, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(temporary_path)
+
+        return digest.hexdigest()
+
+    def link(self, digest, name):
+        """
+        Links a stored blob as a file, with the next available name if the name is taken
+        :return: the name of the file
+        """
+        while True:
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(self.blob_path(digest), path)
+                return name
+            except FileExistsError:
+                name = self.get_available_name(name)
+
+    def _save(self, name, content):
+        # the upload handler hashes the uploads, those already stored aren't written again
+        digest = getattr(content, 'sha256', None)
+        if digest is None or not os.path.exists(self.blob_path(digest)):
+            digest = self.store_blob(content)
+
+        try:
+            name = self.link(digest, name)
+        except FileNotFoundError:
+            # the blob was collected meanwhile
+            content.seek(0)
+            name = self.link(self.store_blob(content), name)
+
+        return name.replace('\\', '/')
+
+    def deduplicate(self, name):
+        """
+        Turns an existing file into a link to the blob of its content, storing the blob if it's the first file with it
+        :param name: name of the file
+        :return: the bytes freed
+        """
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            digest = hash_file(file)
+
+        blob_path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.link(path, blob_path)
+            return 0
+        except FileExistsError:
+            pass
+
+        if os.path.samefile(path, blob_path):
+            return 0
+
+        # the file is replaced at once, it's never missing
+        size = os.path.getsize(path)
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        os.link(blob_path, temporary_path)
+        os.replace(temporary_path, path)
+        return size
+
+    def collect_blobs(self, min_age=0):
+        """
+        Deletes the blobs no file links to anymore
+        :param min_age: seconds since the blob was last changed, so a blob that's about to be linked isn't deleted
+        :return: number of blobs deleted, bytes freed
+        """
+        deleted, freed = 0, 0
+        for directory, _, file_names in os.walk(self.path(settings.CONTENT_STORE_DIR)):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                stat = os.stat(path)
+                if stat.st_nlink == 1 and time.time() - stat.st_ctime >= min_age:
+                    os.remove(path)
+                    deleted += 1
+                    freed += stat.st_size
+        return deleted, freed
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,162 @@
+import csv
+import io
+import struct
+import time
+from functools import partial
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED, ZIP64_LIMIT, sizeFileHeader, structFileHeader
+
+from utils.lists import chunks
+
+# rows fetched from the database per round trip while streaming
+STREAM_CHUNK_SIZE = 500
+
+# bytes read from each file and yielded from a zip at a time
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# files that are already compressed, deflating them again only costs time
+COMPRESSED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip', '.gz')
+
+
+def iterate_in_chunks(queryset, ids, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the objects of a queryset in the order of the given ids, loading them with one query per chunk of ids, so
+    only one chunk is in memory at a time
+    :param queryset: queryset of the objects, with its annotations and select_related
+    :param ids: list of primary keys
+    :param chunk_size: ids per query
+    :return: generator of objects, the ids that are no longer in the queryset are skipped
+    """
+    for chunk in chunks(ids, chunk_size):
+        objects = queryset.in_bulk(chunk)
+        for pk in chunk:
+            if pk in objects:
+                yield objects[pk]
+
+
+def write_csv(file, rows, progress=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Writes rows to a binary file as an utf-8 csv
+    :param file: binary file object
+    :param rows: iterable of lists, the first one should be the header
+    :param progress: optional function called with the number of rows written after each chunk of rows
+    :param chunk_size: rows between progress calls
+    :return: number of rows written, without the header
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    count = -1
+
+    for count, row in enumerate(rows):
+        writer.writerow(row)
+        if progress and count and count % chunk_size == 0:
+            progress(count)
+
+    text.flush()
+    text.detach()  # the file is still needed by the caller
+    return max(count, 0)
+
+
+class ZipBuffer(io.RawIOBase):
+    """
+    Unseekable file a zip is written to, the written bytes are taken out as they are produced
+    """
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def pop(self):
+        """Returns the bytes written since the last call"""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+def iterate_zip_members(file, chunk_size=ZIP_CHUNK_SIZE):
+    """
+    Yields the members of a zip as they are stored, so they can be copied to another zip without being decompressed
+    :param file: seekable binary file of the zip, it has to stay open while the members are read
+    :param chunk_size: bytes read at a time
+    :return: generator of (ZipInfo, function that returns an iterable of the compressed bytes of the member)
+    """
+    def read_compressed(info):
+        # the data starts after the local header, its name and its extra field, which may differ from the one in the
+        # central directory (fields 10 and 11 of the header are their lengths)
+        file.seek(info.header_offset)
+        header = struct.unpack(structFileHeader, file.read(sizeFileHeader))
+        file.seek(header[10] + header[11], io.SEEK_CUR)
+
+        remaining = info.compress_size
+        while remaining > 0:
+            data = file.read(min(chunk_size, remaining))
+            if not data:
+                raise EOFError('The zip member {} is truncated'.format(info.filename))
+            remaining -= len(data)
+            yield data
+
+    for info in ZipFile(file).infolist():
+        yield info, partial(read_compressed, info)
+
+
+def _write_compressed_member(zip_file, info, data):
+    """
+    Writes a member of another zip with its compressed bytes, CRC and sizes as they are. ZipFile can only write members
+    it compresses itself, so this does what ZipFile.write() does for a directory, with the data after the header.
+    """
+    member = ZipInfo(info.filename, date_time=info.date_time)
+    member.compress_type = info.compress_type
+    member.CRC = info.CRC
+    member.compress_size = info.compress_size
+    member.file_size = info.file_size
+    member.external_attr = info.external_attr
+    member.header_offset = zip_file.fp.tell()
+
+    zip_file.fp.write(member.FileHeader(member.file_size > ZIP64_LIMIT or member.compress_size > ZIP64_LIMIT))
+    for chunk in data:
+        zip_file.fp.write(chunk)
+        yield
+
+    zip_file.filelist.append(member)
+    zip_file.NameToInfo[member.filename] = member
+    zip_file.start_dir = zip_file.fp.tell()
+    zip_file._didModify = True
+
+
+def iterate_zip(entries, chunk_size=ZIP_CHUNK_SIZE):
+    """
+    Yields a zip as it's written, so only a chunk of it is in memory at a time. The compressed file types are stored
+    as they are and the rest are deflated. The members of another zip (see iterate_zip_members) are copied without
+    being decompressed or compressed again.
+    :param entries: iterable of (name in the zip, function that opens the file to add in binary mode), or of (ZipInfo,
+    function that returns the compressed bytes of the member)
+    :param chunk_size: bytes read from the files at a time
+    :return: generator of bytes
+    """
+    buffer = ZipBuffer()
+    with ZipFile(buffer, 'w') as zip_file:
+        for name, open_file in entries:
+            if isinstance(name, ZipInfo):
+                for _ in _write_compressed_member(zip_file, name, open_file()):
+                    if buffer.size >= chunk_size:
+                        yield buffer.pop()
+                continue
+
+            info = ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = ZIP_STORED if name.lower().endswith(COMPRESSED_EXTENSIONS) else ZIP_DEFLATED
+
+            with open_file() as source, zip_file.open(info, 'w') as target:
+                for data in iter(lambda: source.read(chunk_size), b''):
+                    target.write(data)
+                    if buffer.size >= chunk_size:
+                        yield buffer.pop()
+
+    yield buffer.pop()
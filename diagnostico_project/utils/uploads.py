@@ -0,0 +1,127 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+# first bytes of each file type that can be uploaded
+MAGIC_NUMBERS = {
+    'pdf': (b'%PDF-',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+}
+
+FILE_TYPE_NAMES = {
+    'pdf': 'un pdf',
+    'jpeg': 'una imagen jpeg',
+    'png': 'una imagen png',
+}
+
+
+def sniff_file_type(data):
+    """
+    Returns the type of a file from its first bytes
+    :param data: first bytes of the file
+    :return: a key of MAGIC_NUMBERS, None if it's none of them
+    """
+    for file_type, magic_numbers in MAGIC_NUMBERS.items():
+        if data.startswith(magic_numbers):
+            return file_type
+    return None
+
+
+def get_upload_errors(request):
+    """
+    Returns the errors of the files rejected while the request was received, the request files have to be read before
+    :param request: the request
+    :return: dict of field name -> error message
+    """
+    return getattr(request, 'upload_errors', {})
+
+
+class CheckedUploadHandler(FileUploadHandler):
+    """
+    Checks the files uploaded to the apps in settings.UPLOAD_RULES while they are received: the type is sniffed from
+    the first chunk and the upload stops as soon as a file is of another type or crosses the size limit, without
+    reading the rest of the request. The content is hashed as it's written, the file gets a sha256 attribute.
+    The uploads to any other app are left to the next handlers.
+    """
+    def __init__(self, request=None):
+        super().__init__(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        self.rules = settings.UPLOAD_RULES.get(resolver_match.namespace) if resolver_match else None
+        self.in_memory = False
+        self.size = 0
+        self.hash = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # small requests are kept in memory like the default handlers do
+        self.in_memory = content_length <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+
+    def new_file(self, *args, **kwargs):
+        if not self.rules:
+            return
+
+        super().new_file(*args, **kwargs)
+        self.size = 0
+        self.hash = hashlib.sha256()
+        if self.in_memory:
+            self.file = InMemoryUploadedFile(BytesIO(), self.field_name, self.file_name, self.content_type, 0,
+                                             self.charset, self.content_type_extra)
+        else:
+            self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset,
+                                              self.content_type_extra)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.rules:
+            return raw_data
+
+        if start == 0 and sniff_file_type(raw_data) not in self.rules['types']:
+            self.reject('El archivo debe ser {}.'.format(
+                ' o '.join(FILE_TYPE_NAMES[file_type] for file_type in self.rules['types'])))
+
+        self.size += len(raw_data)
+        if self.size > self.rules['max_size']:
+            self.reject('El archivo debe de ocupar menos de {}Mb'.format(self.rules['max_size'] // (1024 * 1024)))
+
+        self.hash.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if not self.rules:
+            return None
+
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.hash.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if self.rules and hasattr(self, 'file'):
+            self.file.close()
+
+    def reject(self, message):
+        """Stops the upload, the rest of the request isn't read"""
+        self.request.upload_errors = dict(get_upload_errors(self.request), **{self.field_name: message})
+        self.file.close()
+        raise StopUpload(connection_reset=True)
+
+
+class UploadErrorsFormMixin:
+    """
+    Adds the errors of the files rejected by the upload handler to a form, pass them as upload_errors
+    """
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            if field in self.fields:
+                # the rejected file isn't in the form, the error replaces the one about the missing file
+                self._errors.pop(field, None)
+                self.add_error(field, message)
+        return cleaned_data